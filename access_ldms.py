@@ -1,7 +1,24 @@
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
 import psycopg
 import yaml
+import atexit
+import datetime
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 STANDARD_COLS = ['txtpid',
  'drawdm',
@@ -14,21 +31,364 @@ STANDARD_COLS = ['txtpid',
  'addstr',
  'dervstr']
 
-# grab my password
-yaml_path = "/home/bhaddock/repos/config.yaml"
-with open(yaml_path, 'r') as file:
-    config = yaml.safe_load(file)
+# dtypes every pull is returned with; columns not listed keep their inferred dtype
+# - date parts are nullable ints, so a missing part doesn't turn the column into floats
+# - low-cardinality columns are categories, which are much smaller and faster to merge / sort
+LDMS_DTYPES = {
+    'drawdm': 'Int64',
+    'drawdd': 'Int64',
+    'drawdy': 'Int64',
+    'vidval': 'float64',
+    'lstudy': 'category',
+    'primstr': 'category',
+    'addstr': 'category',
+    'dervstr': 'category',
+    'drawdt': 'datetime64[ns]',
+}
+
+## backends ----------------------------------------------------------------- ##
+# everything below talks to the database through the active backend:
+# - PostgresBackend: the real datamart (default)
+# - SQLiteBackend: a local stand-in with the same {schema}.imported_fstrf_specimen_aliquot
+#   layout, for profiling / benchmarking off-site (see synthetic_ldms.py)
+# set LDMS_SQLITE_DIR to use a local backend by default, or call set_backend()
+
+class PostgresBackend:
+    """
+    datamart, via psycopg
+    """
+    name = 'postgres'
+    supports_copy = True
+
+    def __init__(self, host="datamart.scharp.org", dbname="datamart02_realtime",
+                 user="bhaddock", config_path="/home/bhaddock/repos/config.yaml"):
+        self.host = host
+        self.dbname = dbname
+        self.user = user
+        self.config_path = config_path
+        self.cache_dir = LDMS_CACHE_DIR
+
+    def cache_id(self) -> str:
+        """
+        return what this backend's pulls are cached under (see _cache_path)
+        """
+        return f"{self.name}:{self.host}/{self.dbname}"
+
+    def connect(self):
+        # grab my password (only when we actually need a connection)
+        with open(self.config_path, 'r') as file:
+            config = yaml.safe_load(file)
+        return psycopg.connect(host=self.host,
+                               dbname=self.dbname,
+                               user=self.user,
+                               password=config['password'])
+
+    def is_broken(self, conn) -> bool:
+        return conn.closed or conn.broken
+
+    def prepare_schema(self, conn, schema: str) -> None:
+        pass
+
+    def list_aliquot_schemas(self, conn) -> list:
+        """
+        return every schema with an imported_fstrf_specimen_aliquot table
+        """
+        with conn.cursor() as cursor:
+            cursor.execute("""SELECT table_schema,table_name FROM information_schema.tables where table_name like 'imported_fstrf_specimen_aliquot'""")
+            return [i[0] for i in cursor.fetchall()]
+
+    def md5_int(self, expression: str, n_hex: int) -> str:
+        """
+        return SQL for the first n_hex hex digits of md5(expression), as a bigint
+        """
+        return f"('x' || substr(md5({expression}), 1, {n_hex}))::bit({4 * n_hex})::bigint"
+
+    def streaming_cursor(self, conn):
+        """
+        return a server-side (named) cursor, so rows are only sent as they're fetched
+        """
+        return conn.cursor(name=f"ldms_cursor_{next(_cursor_ids)}")
+
+    def in_values(self, conn, expression: str, values: list, name: str) -> tuple:
+        """
+        return (condition, params) restricting expression to values
+        - up to ANY_FILTER_LIMIT values are sent as `expression = ANY(%s)`
+        - longer lists are copied into a temp table and joined against;
+          the table goes away when the connection is returned to the pool
+        """
+        if len(values) <= ANY_FILTER_LIMIT:
+            return f"{expression} = ANY(%s)", [values]
+        table = f"ldms_filter_{name}"
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (value text PRIMARY KEY) ON COMMIT DROP")
+        conn.execute(f"TRUNCATE {table}")
+        with conn.cursor() as cursor:
+            with cursor.copy(f"COPY {table} (value) FROM STDIN") as copy:
+                for v in values:
+                    copy.write_row((v,))
+        return f"{expression} IN (SELECT value FROM {table})", []
+
+def _sqlite_make_date(year, month, day):
+    if year is None or month is None or day is None:
+        return None
+    return datetime.date(int(year), int(month), int(day)).isoformat()
+
+def _sqlite_regexp_replace(value, pattern, replacement):
+    if value is None:
+        return None
+    # postgres replaces the first match only, unless the 'g' flag is passed
+    return re.sub(pattern, replacement, value, count=1)
+
+def _sqlite_md5_int(value, n_hex):
+    if value is None:
+        return None
+    return int(hashlib.md5(value.encode()).hexdigest()[:n_hex], 16)
+
+class SQLiteBackend:
+    """
+    a local stand-in for datamart: a directory holding one sqlite file per schema,
+    e.g. {directory}/hvtn302.sqlite, each with an imported_fstrf_specimen_aliquot table.
+    schemas are ATTACHed on demand, so queries can use the same
+    {schema}.imported_fstrf_specimen_aliquot names as datamart.
+    """
+    name = 'sqlite'
+    supports_copy = False
+    # sqlite allows 10 attached databases by default
+    MAX_ATTACHED = 9
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.cache_dir = os.path.join(directory, ".cache")
+
+    def cache_id(self) -> str:
+        """
+        return what this backend's pulls are cached under (see _cache_path)
+        """
+        return f"{self.name}:{os.path.abspath(self.directory)}"
+
+    def connect(self):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.create_function("make_date", 3, _sqlite_make_date, deterministic=True)
+        conn.create_function("regexp_replace", 3, _sqlite_regexp_replace, deterministic=True)
+        conn.create_function("ldms_md5_int", 2, _sqlite_md5_int, deterministic=True)
+        return conn
+
+    def is_broken(self, conn) -> bool:
+        try:
+            conn.total_changes
+            return False
+        except sqlite3.ProgrammingError:
+            return True
+
+    def prepare_schema(self, conn, schema: str) -> None:
+        """
+        attach {directory}/{schema}.sqlite as schema, if it isn't already
+        """
+        attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+        if schema in attached:
+            return
+        extra = [i for i in attached if i not in ['main', 'temp']]
+        for old in extra[:max(0, len(extra) - self.MAX_ATTACHED + 1)]:
+            conn.execute(f"DETACH DATABASE {old}")
+        path = os.path.join(self.directory, f"{schema}.sqlite")
+        if not os.path.exists(path):
+            raise Exception(f"No local LDMS file for schema {schema}: {path}")
+        conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+
+    def md5_int(self, expression: str, n_hex: int) -> str:
+        return f"ldms_md5_int({expression}, {n_hex})"
+
+    def list_aliquot_schemas(self, conn) -> list:
+        return sorted([f[:-len(".sqlite")] for f in os.listdir(self.directory) if f.endswith(".sqlite")])
+
+    def streaming_cursor(self, conn):
+        # sqlite cursors already step through results as they're fetched
+        return conn.cursor()
+
+    def in_values(self, conn, expression: str, values: list, name: str) -> tuple:
+        # sqlite caps the number of bound parameters, so use a temp table past that
+        if len(values) <= 900:
+            return f"{expression} IN ({', '.join(['?'] * len(values))})", list(values)
+        table = f"ldms_filter_{name}"
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (value text PRIMARY KEY)")
+        conn.execute(f"DELETE FROM {table}")
+        conn.executemany(f"INSERT INTO {table} (value) VALUES (?)", [(v,) for v in values])
+        return f"{expression} IN (SELECT value FROM temp.{table})", []
+
+# whole-protocol pulls are cached on disk here for the postgres backend (see on-disk cache below)
+LDMS_CACHE_DIR = os.environ.get("LDMS_CACHE_DIR", os.path.expanduser("~/.cache/sdmc_ldms"))
+
+if os.environ.get("LDMS_SQLITE_DIR"):
+    _backend = SQLiteBackend(os.environ["LDMS_SQLITE_DIR"])
+else:
+    _backend = PostgresBackend()
+
+def get_backend():
+    """
+    Return the backend pulls currently go through
+    """
+    return _backend
+
+def set_backend(backend) -> None:
+    """
+    Point every pull at a different backend, e.g.
+        set_backend(SQLiteBackend('/tmp/synthetic_ldms'))
+    -----
+    pooled connections and the cached protocol map belong to the old backend,
+    so both are dropped
+    """
+    global _backend
+    close_pool()
+    invalidate_schema_map()
+    _backend = backend
+
+# errors raised by either backend's driver
+_DB_ERRORS = (psycopg.Error, sqlite3.Error)
+
+## connection pool ---------------------------------------------------------- ##
+# connections to datamart are expensive to open (tls + auth), so we keep a small
+# pool of them around for the life of the process instead of opening one per pull
+POOL_MAX_SIZE = 4
+# an idle connection is pinged before reuse if it's been sitting this long (sec)
+POOL_CHECK_AFTER = 60
+
+_pool_idle = queue.LifoQueue()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+_pool_lock = threading.Lock()
+_pool_stats = {'opened': 0, 'reused': 0, 'discarded': 0, 'checkouts': 0}
+
+def _open_connection():
+    """
+    Open a brand new connection through the active backend
+    """
+    conn = get_backend().connect()
+    with _pool_lock:
+        _pool_stats['opened'] += 1
+    return conn
+
+def _is_healthy(conn, idle_since) -> bool:
+    """
+    given a pooled connection and when it was returned to the pool,
+    return True if it's safe to hand out again
+    """
+    if get_backend().is_broken(conn):
+        return False
+    if time.monotonic() - idle_since < POOL_CHECK_AFTER:
+        return True
+    try:
+        conn.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except _DB_ERRORS:
+        return False
+
+def _discard(conn) -> None:
+    with _pool_lock:
+        _pool_stats['discarded'] += 1
+    try:
+        conn.close()
+    except _DB_ERRORS:
+        pass
+
+@contextmanager
+def get_connection():
+    """
+    Check a connection out of the pool for the duration of a with block, e.g.,
+        with get_connection() as conn:
+            cursor = conn.cursor()
+    -----
+    - at most POOL_MAX_SIZE connections are checked out at once; extra callers wait
+    - idle connections are health-checked before reuse, and dead ones replaced
+    - on return, any open transaction is rolled back so the next user starts clean
+    """
+    _pool_slots.acquire()
+    conn = None
+    try:
+        while conn is None:
+            try:
+                candidate, idle_since = _pool_idle.get_nowait()
+            except queue.Empty:
+                conn = _open_connection()
+                break
+            if _is_healthy(candidate, idle_since):
+                conn = candidate
+                with _pool_lock:
+                    _pool_stats['reused'] += 1
+            else:
+                _discard(candidate)
+        with _pool_lock:
+            _pool_stats['checkouts'] += 1
+        yield conn
+    finally:
+        if conn is not None:
+            _return_connection(conn)
+        _pool_slots.release()
+
+def _return_connection(conn) -> None:
+    if get_backend().is_broken(conn):
+        _discard(conn)
+        return
+    try:
+        conn.rollback()
+    except _DB_ERRORS:
+        _discard(conn)
+        return
+    _pool_idle.put((conn, time.monotonic()))
+
+def get_pool_stats() -> dict:
+    """
+    Return counters for the connection pool:
+    - opened: new connections made to datamart
+    - reused: checkouts served by an already-open connection
+    - discarded: connections dropped because they failed a health check
+    - checkouts: total number of times a connection was handed out
+    - idle: connections currently sitting in the pool
+    """
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    stats['idle'] = _pool_idle.qsize()
+    return stats
+
+def close_pool() -> None:
+    """
+    Close every idle connection in the pool
+    """
+    while True:
+        try:
+            conn, _ = _pool_idle.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            conn.close()
+        except _DB_ERRORS:
+            pass
+
+atexit.register(close_pool)
 
 def get_cursor():
     """
     Get cursor into datamart
+    -----
+    the cursor has a connection of its own, outside the pool; pooled_cursor
+    hands back a connection when done
     """
-    conn = psycopg.connect(host="datamart.scharp.org",
-                            dbname="datamart02_realtime",
-                            user="bhaddock",
-                            password=config['password'])
+    return get_backend().connect().cursor()
 
-    return conn.cursor()
+@contextmanager
+def pooled_cursor():
+    """
+    Get cursor into datamart for the duration of a with block, e.g.,
+        with pooled_cursor() as cursor:
+            cursor.execute(...)
+    -----
+    the cursor's connection is checked out of the pool (see get_connection)
+    and goes back to it when the block ends
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
 
 def pull_protocol_map() -> dict:
     """
@@ -47,11 +407,8 @@ def pull_protocol_map() -> dict:
         - EXCEPT: 'unmapped' and 'hvtn_unmapped' map to the unmapped hvtn protocol schema
     """
     # pull all schemas that have an imported_fstrf_specimen_aliquot table---------------------------------------##
-    cursor = get_cursor()
-    cursor.execute("""SELECT table_schema,table_name FROM information_schema.tables where table_name like 'imported_fstrf_specimen_aliquot'""")
-    tables = cursor.fetchall()
-
-    schemas = np.array(tables)[:,0]
+    with get_connection() as conn:
+        schemas = get_backend().list_aliquot_schemas(conn)
 
     schema_usemap = {}
     for s in schemas:
@@ -73,7 +430,7 @@ def pull_protocol_map() -> dict:
 
     which_to_use = pd.DataFrame([i for j in multiples.values() for i in j], columns=['schema'])
     which_to_use['use'] = False
-    which_to_use = pd.concat([which_to_use.schema.str.split("_", expand=True)[0], which_to_use], axis=1)
+    which_to_use = pd.concat([which_to_use.schema.str.split("_").str[0], which_to_use], axis=1)
     which_to_use.columns = ['network_protocol', 'Schema', 'Use']
 
     which_to_use.loc[which_to_use.Schema=="hvtn144_dummy_arm", 'Use'] = True
@@ -112,142 +469,736 @@ def pull_protocol_map() -> dict:
     # convert to dictionary, add unmapped back in
     # WILL NEED TO UPDATE IF THEY ADD A COVPN UNMAPPED
     which_to_use = which_to_use.loc[which_to_use.Use].set_index('key')['Schema'].to_dict()
-    which_to_use['unmapped'] = 'hvtn_unmapped'
-    which_to_use['hvtn_unmapped'] = 'hvtn_unmapped'
-    which_to_use['hvtn503.1'] = 'hvtn503_01'
-    which_to_use['hvtn503_1'] = 'hvtn503_01'
+    # (only those the backend has; e.g. a local sqlite stand-in may not)
+    extra = {
+        'unmapped': 'hvtn_unmapped',
+        'hvtn_unmapped': 'hvtn_unmapped',
+        'hvtn503.1': 'hvtn503_01',
+        'hvtn503_1': 'hvtn503_01',
+    }
+    which_to_use.update({k: v for (k, v) in extra.items() if v in schemas})
 
     return which_to_use
 
-def pull_one_protocol(network, protocol, usecols=STANDARD_COLS):
-    """
-    ----
-    INPUT
-    network: network name. one of 'hvtn' or 'covpn'
+## protocol -> schema resolution -------------------------------------------- ##
+# how long (sec) a pulled protocol map is trusted before re-querying datamart
+SCHEMA_MAP_TTL = 60 * 60
 
-    usecols
+_schema_map = None
+_schema_map_pulled_at = 0.
+_schema_map_lock = threading.Lock()
+
+def get_schema_map(refresh: bool = False) -> dict:
+    """
+    Return the output of pull_protocol_map(), querying datamart at most
+    once per SCHEMA_MAP_TTL seconds (or when refresh=True)
     -----
-    TODO: look into proper way to call conn.close()
+    the map is also kept in today's on-disk cache, so a new process whose pulls are
+    all cached doesn't connect just to look up schemas
+    """
+    global _schema_map, _schema_map_pulled_at
+    with _schema_map_lock:
+        stale = _schema_map is None or time.monotonic() - _schema_map_pulled_at > SCHEMA_MAP_TTL
+        if refresh or stale:
+            path = _schema_map_cache_path()
+            _schema_map = None if refresh else _read_schema_map_cache(path)
+            if _schema_map is None:
+                _schema_map = pull_protocol_map()
+                _write_schema_map_cache(path, _schema_map)
+            _schema_map_pulled_at = time.monotonic()
+        return _schema_map
+
+def _schema_map_cache_path(day: datetime.date = None) -> str:
+    """
+    return where today's protocol map is cached for the active backend (see on-disk cache below)
+    """
+    backend = get_backend()
+    day = (day or datetime.date.today()).strftime("%Y%m%d")
+    key = hashlib.md5(backend.cache_id().encode()).hexdigest()[:12]
+    return os.path.join(backend.cache_dir, day, f"schema_map.{backend.name}.{key}.json")
+
+def _read_schema_map_cache(path: str, max_age=None):
+    """
+    return the protocol map cached at path, or None if it's missing, too old (DEFAULT_CACHE_MAX_AGE) or unreadable
+    """
+    max_age = DEFAULT_CACHE_MAX_AGE if max_age is None else max_age
+    if not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age.total_seconds():
+        return None
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_schema_map_cache(path: str, schema_map: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as file:
+            json.dump(schema_map, file)
+        os.replace(tmp_path, path)
+    except OSError as error:
+        print(f"Couldn't write LDMS cache file {path}: {error}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def invalidate_schema_map() -> None:
+    """
+    Drop the cached protocol map so the next lookup re-queries datamart
+    """
+    global _schema_map
+    with _schema_map_lock:
+        _schema_map = None
+
+def normalize_network_protocol(network, protocol) -> str:
+    """
+    given a network and protocol in any of the forms we get them in,
+    e.g. ('HVTN', 302), ('hvtn', '302'), ('CoVPN', 3008.0),
+    return the corresponding pull_protocol_map() key, e.g. 'hvtn302'
     """
     if protocol=='unmapped':
-        network_protocol = 'hvtn_unmapped'
-    elif protocol in ['503.1', '503_1', 503.1, '503_01', '503.01', 503.01]:
-        network_protocol = 'hvtn503_01'
-    else:
-        if isinstance(protocol, str):
-            protocol = protocol.lower().replace(" ","")
-        network = network.lower().replace(" ","").replace("_","")
-        pmap = pull_protocol_map()
-        schemas = pd.DataFrame({'network_protocol':pmap.keys(), 'schema_name':pmap.values()})
-        schemas['network'] = ['hvtn' if 'hvtn' in i else 'covpn' for i in schemas.network_protocol]
-        schemas['protocol'] = [i[4:] if i[:4]=='hvtn' else i[5:] for i in schemas.network_protocol]
-        schemas.loc[schemas.schema_name.str.contains("unmapped"), 'protocol'] = np.nan
-        schemas['protocol'] = schemas.protocol.astype(float)
-
-        schema = schemas.loc[(
-            (schemas.network==network) &
-            (schemas.protocol==float(protocol))
-        )]
-        if len(schema) > 1:
-            raise Warning("ERROR: Network/Protocol combo returned more than one table")
-
-        network_protocol = f"{network}{int(protocol)}"
-        network_protocol = pmap[network_protocol]
+        return 'hvtn_unmapped'
+    if protocol in ['503.1', '503_1', 503.1, '503_01', '503.01', 503.01]:
+        return 'hvtn503.1'
+    if isinstance(protocol, str):
+        protocol = protocol.lower().replace(" ","")
+    network = network.lower().replace(" ","").replace("_","")
+    return f"{network}{int(float(protocol))}"
+
+def resolve_schema(network, protocol) -> str:
+    """
+    given a network and protocol, return the schema its LDMS is stored in
+    """
+    key = normalize_network_protocol(network, protocol)
+    schema_map = get_schema_map()
+    if key not in schema_map:
+        # the protocol may have been added to datamart since we last looked
+        schema_map = get_schema_map(refresh=True)
+    if key not in schema_map:
+        raise Exception(f"No LDMS schema found for {network}/{protocol} (looked up '{key}')")
+    return schema_map[key]
 
+## pull ldms ---------------------------------------------------------------- ##
+# rows per chunk when streaming a protocol out of datamart
+DEFAULT_CHUNKSIZE = 50000
+
+_cursor_ids = itertools.count()
+
+def _columns_to_pull(usecols) -> str:
+    """
+    given usecols (list of columns, a single column name, or 'all'),
+    return the select list to put in a query
+    """
     # stringify columns to pull
     if isinstance(usecols, list):
-        columns_to_pull = ', '.join(usecols)
+        return ', '.join(usecols)
     # pull all if user passes 'all'
     elif usecols == 'all':
-        columns_to_pull = "*"
+        return "*"
     else:
-        columns_to_pull = usecols
+        return usecols
 
-    # get db cursor
-    cursor = get_cursor()
+# columns datamart can compute for us, so we don't rebuild them row by row in python
+DERIVED_COLUMNS = {
+    'drawdt': "make_date(CAST(drawdy AS integer), CAST(drawdm AS integer), CAST(drawdd AS integer))",
+    'guspec_core': "regexp_replace(guspec, '-[^-]*$', '')",
+}
 
-    # pull data
-    cursor.execute(f"""SELECT {columns_to_pull} FROM {network_protocol}.imported_fstrf_specimen_aliquot""")
-    data = cursor.fetchall()
+def _protocol_query(network_protocol: str, usecols=STANDARD_COLS, derived=None, distinct_core=False) -> str:
+    """
+    given a schema, build the SELECT for its imported_fstrf_specimen_aliquot table
+    -----
+    derived: list of DERIVED_COLUMNS names to add, e.g. ['drawdt', 'guspec_core']
+    distinct_core: replace guspec with guspec_core and return distinct rows
+        (i.e. one row per guspec core rather than per aliquot)
+    """
+    derived = list(derived or [])
+    select = _columns_to_pull(usecols)
+    distinct = ""
+    if distinct_core:
+        if usecols == 'all':
+            raise Exception("distinct_core=True needs an explicit list of usecols, not 'all'")
+        cols = usecols if isinstance(usecols, list) else [usecols]
+        select = ', '.join([c for c in cols if c != 'guspec'])
+        derived = derived if 'guspec_core' in derived else derived + ['guspec_core']
+        distinct = "DISTINCT "
+    unknown = set(derived).difference(DERIVED_COLUMNS)
+    if len(unknown) > 0:
+        raise Exception(f"Unknown derived columns {unknown}. Must be in {list(DERIVED_COLUMNS)}")
+    select = ', '.join([i for i in [select] if i] + [f"{DERIVED_COLUMNS[d]} AS {d}" for d in derived])
+    return f"""SELECT {distinct}{select} FROM {network_protocol}.imported_fstrf_specimen_aliquot"""
 
-    # if pulled all columns, get them as a list
-    if usecols == 'all':
-        cursor.execute(f"""select column_name from information_schema.columns where table_schema='{network_protocol}' AND table_name like 'imported_fstrf_specimen_aliquot' order by ordinal_position;""")
-        usecols = cursor.fetchall()
-        usecols = [i[0] for i in usecols]
-    if not isinstance(usecols, list):
-        usecols = [usecols]
+# filter lists longer than this are loaded into a temp table and joined against,
+# rather than sent inline as an array parameter
+ANY_FILTER_LIMIT = 10000
 
-    # close connection
-    cursor.close()
+# what each pull filter is matched against in imported_fstrf_specimen_aliquot
+_FILTER_EXPRESSIONS = {
+    'guspecs': "guspec",
+    'guspec_cores': DERIVED_COLUMNS['guspec_core'],
+    'ptids': "CAST(txtpid AS text)",
+}
 
-    return pd.DataFrame(data, columns=usecols)
+def _normalize_filter_values(name: str, values) -> list:
+    """
+    given a filter name and its values (list, set, Series, ...),
+    return the unique non-null values as strings, e.g. ptid 108000123.0 -> '108000123'
+    """
+    cleaned = set()
+    for v in values:
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            continue
+        if name in ['ptids', 'buckets'] and isinstance(v, float) and v.is_integer():
+            v = int(v)
+        cleaned.add(str(v).strip())
+    return sorted(cleaned)
 
-def pull_multiple_protocols(network, protocols, usecols=STANDARD_COLS):
+def _filter_clause(conn, guspecs=None, guspec_cores=None, ptids=None, buckets=None) -> tuple:
+    """
+    given the filters passed to a pull, return (WHERE clause, query params or None)
+    -----
+    - filters left as None aren't applied; an empty list matches nothing
+    - buckets: guspec fingerprint buckets (see change fingerprints below)
+    - how the values are sent (inline array, IN list, temp table) is up to the
+      backend; see PostgresBackend.in_values
+    """
+    expressions = dict(_FILTER_EXPRESSIONS, buckets=f"CAST({_bucket_expression()} AS text)")
+    conditions, params = [], []
+    filters = [('guspecs', guspecs), ('guspec_cores', guspec_cores), ('ptids', ptids), ('buckets', buckets)]
+    for name, values in filters:
+        if values is None:
+            continue
+        values = _normalize_filter_values(name, values)
+        condition, condition_params = get_backend().in_values(conn, expressions[name], values, name)
+        conditions += [condition]
+        params += condition_params
 
-    # stringify columns to pull
-    if isinstance(usecols, list):
-        columns_to_pull = ', '.join(usecols)
-    # pull all if user passes 'all'
-    elif usecols == 'all':
-        columns_to_pull = "*"
+    if len(conditions) == 0:
+        return "", None
+    return " WHERE " + " AND ".join(conditions), (params if len(params) > 0 else None)
+
+def apply_ldms_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    given a pulled LDMS DataFrame, cast its columns to LDMS_DTYPES (in place)
+    and return it
+    """
+    for col, dtype in LDMS_DTYPES.items():
+        if col not in data.columns:
+            continue
+        if dtype == 'Int64':
+            data[col] = pd.to_numeric(data[col]).astype('Int64')
+        elif dtype == 'datetime64[ns]':
+            data[col] = pd.to_datetime(data[col])
+        elif dtype == 'float64':
+            data[col] = pd.to_numeric(data[col]).astype('float64')
+        else:
+            data[col] = data[col].astype(dtype)
+    return data
+
+def _concat_chunks(chunks) -> pd.DataFrame:
+    """
+    concatenate typed DataFrames, keeping categorical columns categorical
+    -----
+    pd.concat falls back to object dtype when chunks have different categories,
+    so the categories are unioned across chunks first
+    """
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    for col in chunks[0].columns:
+        if all(col in chunk.columns and isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+            categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+def _iter_query(conn, query: str, params=None, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    given an open connection and a query, stream the results through a
+    server-side (named) cursor, yielding DataFrames of at most chunksize rows
+    """
+    cursor = get_backend().streaming_cursor(conn)
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        columns = [c[0] for c in cursor.description]
+        n_chunks = 0
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            n_chunks += 1
+            yield apply_ldms_dtypes(pd.DataFrame.from_records(rows, columns=columns, coerce_float=True))
+        if n_chunks == 0:
+            yield apply_ldms_dtypes(pd.DataFrame(columns=columns))
+    finally:
+        cursor.close()
+
+# postgres types we keep as strings / parse as dates when reading COPY output
+_COPY_TEXT_TYPES = ['text', 'varchar', 'bpchar', 'name']
+_COPY_DATE_TYPES = ['date', 'timestamp', 'timestamptz']
+
+def _copy_query(conn, query: str, params=None) -> pd.DataFrame:
+    """
+    given an open connection and a query, run it through
+    COPY (...) TO STDOUT and parse the csv stream into a DataFrame
+    -----
+    - the query is described first (LIMIT 0) so text columns stay text
+      (e.g. txtpid isn't turned into an int) and date columns are parsed
+    - NULLs are written as \\N so they come back as NaN while empty strings stay ''
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0", params)
+        types = {c.name: conn.adapters.types.get(c.type_code) for c in cursor.description}
+        types = {k: (v.name if v is not None else None) for (k, v) in types.items()}
+
+        buffer = io.BytesIO()
+        with cursor.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')", params) as copy:
+            for block in copy:
+                buffer.write(block)
+
+    buffer.seek(0)
+    data = pd.read_csv(
+        buffer,
+        dtype={k: str for (k, v) in types.items() if v in _COPY_TEXT_TYPES},
+        parse_dates=[k for (k, v) in types.items() if v in _COPY_DATE_TYPES],
+        na_values=['\\N'],
+        keep_default_na=False,
+    )
+    return apply_ldms_dtypes(data)
+
+def iter_protocol(network, protocol, usecols=STANDARD_COLS, chunksize=DEFAULT_CHUNKSIZE,
+                  guspecs=None, guspec_cores=None, ptids=None, derived=None, distinct_core=False):
+    """
+    given a network and protocol, yield its LDMS as DataFrames of at most chunksize rows
+    -----
+    - rows are streamed through a server-side (named) cursor, so only one chunk
+      is held client-side at a time
+    - chunks are cast to LDMS_DTYPES
+    - if the protocol has no rows, a single empty DataFrame with the pulled columns is yielded
+    - guspecs / guspec_cores / ptids: optional lists; only matching rows leave the server
+    - derived / distinct_core: see pull_one_protocol
+    """
+    network_protocol = resolve_schema(network, protocol)
+    with get_connection() as conn:
+        get_backend().prepare_schema(conn, network_protocol)
+        where, params = _filter_clause(conn, guspecs=guspecs, guspec_cores=guspec_cores, ptids=ptids)
+        query = _protocol_query(network_protocol, usecols, derived=derived, distinct_core=distinct_core) + where
+        yield from _iter_query(conn, query, params=params, chunksize=chunksize)
+
+## on-disk cache ------------------------------------------------------------- ##
+# whole-protocol pulls are cached as parquet, one directory per day:
+#   {cache dir}/{YYYYMMDD}/{schema}.{column set}.parquet
+# so scripts pulling the same protocol on the same day only hit datamart once.
+# each backend has its own cache dir (LDMS_CACHE_DIR for datamart), so local
+# stand-in data never leaks into real pulls
+# cached pulls older than this are ignored (and overwritten by a fresh pull)
+DEFAULT_CACHE_MAX_AGE = datetime.timedelta(hours=12)
+# day directories older than this are deleted whenever the cache is written to
+CACHE_KEEP_DAYS = 7
+
+# parquet needs pyarrow; without it the cache is skipped and every pull hits datamart
+_CACHE_ENABLED = importlib.util.find_spec("pyarrow") is not None
+
+def _cache_path(network_protocol: str, usecols=STANDARD_COLS, derived=None, distinct_core=False,
+                day: datetime.date = None) -> str:
+    """
+    given a schema, column set and day (default today), return the cache file path
+    -----
+    the key includes the active backend, so e.g. a pull from a local sqlite stand-in
+    is never served to a datamart run sharing the same cache dir
+    """
+    backend = get_backend()
+    day = (day or datetime.date.today()).strftime("%Y%m%d")
+    if usecols == 'all' and not derived:
+        cols = ['all']
     else:
-        columns_to_pull = usecols
+        cols = usecols if isinstance(usecols, list) else [usecols]
+        cols = sorted(cols) + [f"derived:{d}" for d in sorted(derived or [])]
+        cols += ["distinct_core"] if distinct_core else []
+    cols_key = hashlib.md5(",".join([backend.cache_id()] + cols).encode()).hexdigest()[:12]
+    return os.path.join(backend.cache_dir, day, f"{network_protocol}.{backend.name}.{cols_key}.parquet")
+
+def _read_cache(path: str, max_age=DEFAULT_CACHE_MAX_AGE):
+    """
+    return the cached DataFrame at path, or None if it's missing, too old or unreadable
+    -----
+    max_age: timedelta or seconds; None means any age from today's partition is fine
+    """
+    if not _CACHE_ENABLED or not os.path.exists(path):
+        return None
+    if max_age is not None:
+        if isinstance(max_age, datetime.timedelta):
+            max_age = max_age.total_seconds()
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+    try:
+        return apply_ldms_dtypes(pd.read_parquet(path))
+    except Exception as error:
+        print(f"Ignoring unreadable LDMS cache file {path}: {error}")
+        return None
+
+def _write_cache(path: str, data: pd.DataFrame) -> None:
+    """
+    atomically write data to the cache file at path, then prune old day directories
+    """
+    if not _CACHE_ENABLED:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as error:
+        print(f"Couldn't write LDMS cache file {path}: {error}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _prune_cache()
+
+def _prune_cache(keep_days: int = CACHE_KEEP_DAYS) -> None:
+    cache_dir = get_backend().cache_dir
+    cutoff = (datetime.date.today() - datetime.timedelta(days=keep_days)).strftime("%Y%m%d")
+    for day in os.listdir(cache_dir):
+        if day.isdigit() and day < cutoff:
+            shutil.rmtree(os.path.join(cache_dir, day), ignore_errors=True)
+
+def clear_cache() -> None:
+    """
+    Delete every cached pull for the active backend
+    """
+    shutil.rmtree(get_backend().cache_dir, ignore_errors=True)
+
+def _apply_filters(data: pd.DataFrame, guspecs=None, guspec_cores=None, ptids=None, buckets=None):
+    """
+    given a cached whole-protocol pull, apply pull filters locally
+    return None if the filters need a column that wasn't pulled
+    """
+    filters = {'guspecs': guspecs, 'guspec_cores': guspec_cores, 'ptids': ptids, 'buckets': buckets}
+    filters = {k: v for (k, v) in filters.items() if v is not None}
+    available = {
+        'guspecs': 'guspec' in data.columns,
+        'guspec_cores': 'guspec' in data.columns or 'guspec_core' in data.columns,
+        'ptids': 'txtpid' in data.columns,
+        'buckets': 'guspec' in data.columns,
+    }
+    if not all(available[k] for k in filters):
+        return None
+
+    mask = pd.Series(True, index=data.index)
+    for name, values in filters.items():
+        values = _normalize_filter_values(name, values)
+        if name == 'guspecs':
+            mask &= data.guspec.isin(values)
+        elif name == 'guspec_cores' and 'guspec_core' in data.columns:
+            mask &= data.guspec_core.isin(values)
+        elif name == 'guspec_cores':
+            mask &= data.guspec.str.replace(r'-[^-]*$', '', regex=True).isin(values)
+        elif name == 'ptids':
+            mask &= data.txtpid.astype(str).isin(values)
+        elif name == 'buckets':
+            mask &= np.isin(guspec_buckets(data.guspec), [int(v) for v in values])
+    return data.loc[mask].reset_index(drop=True)
+
+def _pull_schema(network_protocol: str, usecols=STANDARD_COLS, engine='cursor',
+                 guspecs=None, guspec_cores=None, ptids=None, buckets=None, derived=None, distinct_core=False,
+                 cache=True, max_age=DEFAULT_CACHE_MAX_AGE, refresh=False) -> pd.DataFrame:
+    """
+    given a schema name, pull its imported_fstrf_specimen_aliquot table
+    -----
+    - with cache=True, today's cached copy is used if it's younger than max_age;
+      filters are then applied locally
+    - refresh=True always pulls from datamart, and overwrites the cached copy
+    - filtered pulls that miss the cache go to datamart and aren't cached themselves
+    """
+    filters = {'guspecs': guspecs, 'guspec_cores': guspec_cores, 'ptids': ptids, 'buckets': buckets}
+    filtered = any(v is not None for v in filters.values())
+    if engine not in ['cursor', 'copy']:
+        raise Exception(f"engine must be one of 'cursor' or 'copy'. Submitted {engine}")
+
+    path = _cache_path(network_protocol, usecols, derived=derived, distinct_core=distinct_core)
+    if cache and not refresh:
+        cached = _read_cache(path, max_age=max_age)
+        if cached is not None:
+            cached = _apply_filters(cached, **filters) if filtered else cached
+            if cached is not None:
+                return cached
+
+    with get_connection() as conn:
+        get_backend().prepare_schema(conn, network_protocol)
+        where, params = _filter_clause(conn, **filters)
+        query = _protocol_query(network_protocol, usecols, derived=derived, distinct_core=distinct_core) + where
+        if engine == 'copy' and get_backend().supports_copy:
+            data = _copy_query(conn, query, params=params)
+        else:
+            data = _concat_chunks(_iter_query(conn, query, params=params))
+
+    if cache and not filtered:
+        _write_cache(path, data)
+    return data
+
+def pull_one_protocol(network, protocol, usecols=STANDARD_COLS, engine='cursor',
+                      guspecs=None, guspec_cores=None, ptids=None, buckets=None, derived=None, distinct_core=False,
+                      cache=True, max_age=DEFAULT_CACHE_MAX_AGE, refresh=False):
+    """
+    ----
+    INPUT
+    network: network name. one of 'hvtn' or 'covpn'
+    protocol: protocol number (int or str), or 'unmapped'
+    usecols: list of columns, a single column name, or 'all'
+        (columns in LDMS_DTYPES come back with those dtypes)
+    engine: how rows are transferred out of datamart
+        - 'cursor': stream through a server-side cursor (see iter_protocol)
+        - 'copy': bulk export via COPY ... TO STDOUT; fastest for full-protocol pulls
+          (backends without COPY fall back to 'cursor')
+    guspecs / guspec_cores / ptids: optional lists to filter on. filtering happens
+        in datamart, so e.g. pull_one_protocol('hvtn', 805, guspecs=data.guspec)
+        replaces pulling everything and then doing ldms.loc[ldms.guspec.isin(data.guspec)]
+    buckets: optional list of guspec fingerprint buckets to pull (see guspec_buckets)
+    derived: list of columns computed by datamart (see DERIVED_COLUMNS)
+        - 'drawdt': date built from drawdy / drawdm / drawdd
+        - 'guspec_core': guspec with its final '-xxx' aliquot suffix removed
+    distinct_core: drop guspec, add guspec_core, and return distinct rows;
+        replaces guspec.str.rpartition('-') followed by drop_duplicates()
+    cache: read / write today's on-disk copy of the pull (see LDMS_CACHE_DIR)
+    max_age: ignore cached copies older than this (timedelta or seconds)
+    refresh: skip the cache read and re-pull from datamart, updating the cache
+    """
+    return _pull_schema(
+        resolve_schema(network, protocol), usecols=usecols, engine=engine,
+        guspecs=guspecs, guspec_cores=guspec_cores, ptids=ptids, buckets=buckets,
+        derived=derived, distinct_core=distinct_core,
+        cache=cache, max_age=max_age, refresh=refresh
+    )
+
+## concurrent pulls ---------------------------------------------------------- ##
+# default number of protocols pulled at once; each pull holds one pooled connection
+DEFAULT_MAX_WORKERS = POOL_MAX_SIZE
 
+def iter_concurrently(fn, items: list, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs):
+    """
+    given a function and a list of items, run fn(item, **kwargs) on a thread pool
+    and yield (item, result) in the order given
+    -----
+    at most max_workers calls are in flight (or finished but not yet consumed)
+    at once, so memory stays bounded even for a long list of big protocols
+    """
+    items = list(items)
+    if len(items) == 0:
+        return
+    max_workers = max(1, min(max_workers, len(items)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, item in enumerate(items[:max_workers]):
+            futures[i] = executor.submit(fn, item, **kwargs)
+        for i, item in enumerate(items):
+            result = futures.pop(i).result()
+            nxt = i + max_workers
+            if nxt < len(items):
+                futures[nxt] = executor.submit(fn, items[nxt], **kwargs)
+            yield item, result
+
+def _iter_schemas(network_protocols: list, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs):
+    """
+    given a list of schema names, pull them on a thread pool and
+    yield (schema, DataFrame) in the order given
+    """
+    return iter_concurrently(_pull_schema, network_protocols, max_workers=max_workers, **kwargs)
+
+def iter_protocols(network_protocols: list, usecols=STANDARD_COLS, engine='cursor',
+                   max_workers: int = DEFAULT_MAX_WORKERS, **kwargs):
+    """
+    given a list of (network, protocol) pairs, pull them concurrently and
+    yield ((network, protocol), DataFrame) in the order given
+    -----
+    - at most max_workers protocols are being pulled / waiting to be consumed at once,
+      so e.g. the monitoring loop can diff one protocol while the next ones download
+    - any other pull_one_protocol options (filters, derived, cache, ...)
+      are applied to every protocol
+    """
+    pairs = list(dict.fromkeys([tuple(p) for p in network_protocols]))
+    schemas = [resolve_schema(network, protocol) for (network, protocol) in pairs]
+    pulled = _iter_schemas(schemas, max_workers=max_workers, usecols=usecols, engine=engine, **kwargs)
+    for pair, (_, data) in zip(pairs, pulled):
+        yield pair, data
+
+def pull_protocols(network_protocols: list, usecols=STANDARD_COLS, engine='cursor',
+                   max_workers: int = DEFAULT_MAX_WORKERS, **kwargs) -> dict:
+    """
+    given a list of (network, protocol) pairs, pull them concurrently
+    return a dict {(network, protocol): DataFrame}
+    e.g. pull_protocols([('hvtn', 115), ('hvtn', 135)])
+    """
+    return dict(iter_protocols(
+        network_protocols, usecols=usecols, engine=engine, max_workers=max_workers, **kwargs
+    ))
+
+def pull_multiple_protocols(network, protocols, usecols=STANDARD_COLS,
+                            guspecs=None, guspec_cores=None, ptids=None, derived=None, distinct_core=False,
+                            max_workers: int = DEFAULT_MAX_WORKERS,
+                            cache=True, max_age=DEFAULT_CACHE_MAX_AGE, refresh=False):
+    """
+    ----
+    INPUT
+    network: network name. one of 'hvtn' or 'covpn'
+    protocols: list of protocols, or 'all' for every schema in the network
+    usecols: list of columns, a single column name, or 'all'
+    guspecs / guspec_cores / ptids: optional lists to filter on (see pull_one_protocol)
+    derived / distinct_core: columns computed by datamart (see pull_one_protocol)
+    max_workers: number of protocols pulled concurrently
+    cache / max_age / refresh: on-disk cache options (see pull_one_protocol)
+    -----
+    returns every protocol stacked into one DataFrame
+    """
     # format network_protocols correctly
-    network = network.lower().replace(" ","").replace("_","")
-    pmap = pull_protocol_map()
-    network_protocols = []
     if protocols=='all':
-        network_protocols = list(set(pmap.values()))
+        network = network.lower().replace(" ","").replace("_","")
+        network_protocols = list(set(get_schema_map().values()))
         network_protocols = [i for i in network_protocols if network in i]
     else:
-        for protocol in protocols:
-            if protocol=='unmapped':
-                network_protocols += ['hvtn_unmapped']
-            else:
-                if isinstance(protocol, str):
-                    protocol = protocol.lower().replace(" ","")
-                schemas = pd.DataFrame({'network_protocol':pmap.keys(), 'schema_name':pmap.values()})
-                schemas['network'] = ['hvtn' if 'hvtn' in i else 'covpn' for i in schemas.network_protocol]
-                schemas['protocol'] = [i[4:] if i[:4]=='hvtn' else i[5:] for i in schemas.network_protocol]
-                schemas.loc[schemas.schema_name.str.contains("unmapped"), 'protocol'] = np.nan
-                schemas['protocol'] = schemas.protocol.astype(float)
-
-                schema = schemas.loc[(
-                    (schemas.network==network) &
-                    (schemas.protocol==float(protocol))
-                )]
-                if len(schema) > 1:
-                    raise Warning(f"ERROR: {network}/{protocol} combo returned more than one table")
-
-                network_protocol = f"{network}{int(protocol)}"
-                network_protocol = pmap[network_protocol]
-                network_protocols += [network_protocol]
-
-    # connect to db
-    cursor = get_cursor()
-
-    # build query
-    query_string = ''
-    for p in network_protocols:
-        query_string += f' UNION ALL SELECT {columns_to_pull} FROM {p}.imported_fstrf_specimen_aliquot'
-
-    query_string = query_string[11:]
-
-    # pull data
-    cursor.execute(query_string)
-    data = cursor.fetchall()
-
-    # if pulled all columns, get them as a list
-    if usecols == 'all':
-        cursor.execute(f"""select column_name from information_schema.columns where table_schema='{network_protocols[0]}' AND table_name like 'imported_fstrf_specimen_aliquot' order by ordinal_position;""")
-        usecols = cursor.fetchall()
-        usecols = [i[0] for i in usecols]
-    if not isinstance(usecols, list):
-        usecols = [usecols]
-
-    # close connection
-    cursor.close()
-
-    return pd.DataFrame(data, columns=usecols)
+        network_protocols = list(dict.fromkeys([resolve_schema(network, protocol) for protocol in protocols]))
+
+    pulled = _iter_schemas(
+        network_protocols, max_workers=max_workers, usecols=usecols,
+        guspecs=guspecs, guspec_cores=guspec_cores, ptids=ptids,
+        derived=derived, distinct_core=distinct_core,
+        cache=cache, max_age=max_age, refresh=refresh
+    )
+    return _concat_chunks([data for (_, data) in pulled])
+
+## change fingerprints ------------------------------------------------------- ##
+# datamart can summarize a protocol without sending it: a row count plus the sum of
+# a hash of each row's STANDARD_COLS. the sum doesn't depend on row order, and any
+# added / removed / edited row changes it (barring a ~1 in 2**32 collision).
+# rows are also split into FINGERPRINT_BUCKETS buckets by a hash of their guspec, so
+# when a protocol's fingerprint changes only the buckets that differ are re-pulled.
+# fingerprints are only comparable within one backend (each casts floats to text its own way)
+# a guspec's bucket is the first _BUCKET_HEX_DIGITS hex digits of its md5
+_BUCKET_HEX_DIGITS = 2
+FINGERPRINT_BUCKETS = 16 ** _BUCKET_HEX_DIGITS
+# hex digits of md5 kept per row hash: 32 bit ints, so sums over a protocol can't overflow
+_HASH_HEX_DIGITS = 8
+
+def _row_hash_expression(columns=STANDARD_COLS) -> str:
+    row = " || '|' || ".join([f"coalesce(CAST({c} AS text), '\\N')" for c in columns])
+    return get_backend().md5_int(row, _HASH_HEX_DIGITS)
+
+def _bucket_expression() -> str:
+    return get_backend().md5_int("coalesce(guspec, '')", _BUCKET_HEX_DIGITS)
+
+def guspec_buckets(guspecs) -> np.ndarray:
+    """
+    given guspecs, return the fingerprint bucket of each (the same bucket datamart computes)
+    """
+    codes, uniques = pd.factorize(pd.Series(guspecs, dtype=object).fillna(""))
+    buckets = np.array(
+        [int(hashlib.md5(str(g).encode()).hexdigest()[:_BUCKET_HEX_DIGITS], 16) for g in uniques],
+        dtype=np.int64
+    )
+    return buckets[codes]
+
+def _fingerprint_query(network_protocol: str, group_by: str = None, **filters) -> pd.DataFrame:
+    """
+    given a schema, return n_rows and checksum (sum of row hashes),
+    optionally per group_by expression and restricted by pull filters
+    """
+    select = f"count(*) AS n_rows, coalesce(sum({_row_hash_expression()}), 0) AS checksum"
+    with get_connection() as conn:
+        get_backend().prepare_schema(conn, network_protocol)
+        where, params = _filter_clause(conn, **filters)
+        if group_by:
+            query = f"""SELECT {group_by} AS key, {select} FROM {network_protocol}.imported_fstrf_specimen_aliquot{where} GROUP BY 1"""
+        else:
+            query = f"""SELECT {select} FROM {network_protocol}.imported_fstrf_specimen_aliquot{where}"""
+        data = _concat_chunks(_iter_query(conn, query, params=params))
+    for col in ['n_rows', 'checksum']:
+        data[col] = data[col].astype('int64')
+    return data
+
+def protocol_fingerprint(network, protocol) -> dict:
+    """
+    given a network and protocol, return {'n_rows': ..., 'checksum': ...} for its LDMS,
+    computed in datamart; if this matches an earlier fingerprint, nothing has changed
+    """
+    data = _fingerprint_query(resolve_schema(network, protocol))
+    return {'n_rows': int(data.n_rows.iloc[0]), 'checksum': int(data.checksum.iloc[0])}
+
+def bucket_fingerprints(network, protocol) -> pd.DataFrame:
+    """
+    given a network and protocol, return n_rows / checksum per guspec bucket,
+    sorted by bucket. summing the columns gives protocol_fingerprint
+    """
+    data = _fingerprint_query(resolve_schema(network, protocol), group_by=_bucket_expression())
+    data = data.rename(columns={'key': 'bucket'})
+    data['bucket'] = data.bucket.astype('int64')
+    return data.sort_values(by='bucket', ignore_index=True)
+
+def guspec_hashes(network, protocol, guspecs=None) -> pd.DataFrame:
+    """
+    given a network and protocol, return n_rows / checksum per guspec,
+    optionally only for the guspecs passed
+    """
+    data = _fingerprint_query(resolve_schema(network, protocol), group_by="guspec", guspecs=guspecs)
+    return data.rename(columns={'key': 'guspec'}).sort_values(by='guspec', ignore_index=True)
+
+def changed_buckets(old: pd.DataFrame, new: pd.DataFrame) -> list:
+    """
+    given two bucket_fingerprints results, return the buckets that differ
+    (including buckets only present in one)
+    """
+    comp = old.merge(new, on='bucket', how='outer', suffixes=('_old', '_new'))
+    differs = (comp.n_rows_old != comp.n_rows_new) | (comp.checksum_old != comp.checksum_new)
+    return sorted(comp.loc[differs].bucket.astype(int).tolist())
+
+def pull_protocol_changes(network, protocol, previous=None, previous_buckets: pd.DataFrame = None,
+                          engine='copy') -> tuple:
+    """
+    given a network and protocol, plus an earlier pull of it (STANDARD_COLS) and
+    that pull's bucket_fingerprints, return (ldms, buckets, changed)
+    -----
+    - previous: a DataFrame, or an iterable of DataFrames (e.g. ldms_snapshot_store.iter_snapshot_chunks)
+      so the earlier pull is streamed, keeping only its unchanged buckets, rather than
+      held in full next to today's
+    - ldms: the protocol as it is now
+    - buckets: bucket_fingerprints for ldms, to pass in next time
+    - changed: the buckets that were re-pulled; [] if nothing changed, None if
+      everything was pulled (no usable previous pull, or most buckets changed)
+    only changed buckets leave datamart; the rest are reused from previous.
+    the result is written to today's on-disk cache, like a refresh=True pull
+    """
+    network_protocol = resolve_schema(network, protocol)
+    path = _cache_path(network_protocol)
+
+    def pull_everything():
+        # fingerprint first, so anything changing mid-pull shows up again next time
+        buckets = bucket_fingerprints(network, protocol)
+        return _pull_schema(network_protocol, engine=engine, refresh=True), buckets, None
+
+    if previous is None or previous_buckets is None:
+        return pull_everything()
+    if isinstance(previous, pd.DataFrame):
+        if 'guspec' not in previous.columns:
+            return pull_everything()
+        previous = [previous]
+
+    current = protocol_fingerprint(network, protocol)
+    if current['n_rows'] == previous_buckets.n_rows.sum() and current['checksum'] == previous_buckets.checksum.sum():
+        ldms = _concat_chunks(previous)
+        _write_cache(path, ldms)
+        return ldms, previous_buckets, []
+
+    buckets = bucket_fingerprints(network, protocol)
+    changed = changed_buckets(previous_buckets, buckets)
+    if len(changed) > FINGERPRINT_BUCKETS // 2:
+        return pull_everything()
+
+    fetched = _pull_schema(network_protocol, engine=engine, buckets=changed, cache=False)
+    kept = [
+        apply_ldms_dtypes(chunk.loc[~np.isin(guspec_buckets(chunk.guspec), changed)].reset_index(drop=True))
+        for chunk in previous
+    ]
+    ldms = _concat_chunks(kept + [fetched])
+    _write_cache(path, ldms)
+    return ldms, buckets, changed
@@ -0,0 +1,400 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Benchmarks for the LDMS pull / monitoring code paths
+#     - usage: python benchmark_ldms.py <benchmark> [args]
+## ---------------------------------------------------------------------------##
+import os
+import sys
+import time
+import inspect
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+import pandas as pd
+
+import access_ldms
+
+def best_of(fn, repeat: int = 3) -> tuple:
+    """
+    call fn() repeat times,
+    return (fastest wall time in seconds, result of the last call)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def report(title: str, rows: list) -> None:
+    """
+    print a list of (label, seconds, extra) tuples as a small table
+    """
+    print(f"\n{title}")
+    print("-" * len(title))
+    for label, seconds, extra in rows:
+        print(f"{label:<28}{seconds:>10.3f}s  {extra}")
+
+## fetch engines ------------------------------------------------------------- ##
+# {n_rows} is filled in with an int before executing: postgres doesn't take bind
+# parameters in CREATE TABLE ... AS
+SYNTHETIC_TABLE_SQL = """
+CREATE TEMP TABLE imported_fstrf_specimen_aliquot AS
+SELECT
+    (100000000 + (i % 5000))::text AS txtpid,
+    1 + (i % 12) AS drawdm,
+    1 + (i % 28) AS drawdd,
+    2020 + (i % 5) AS drawdy,
+    (i % 20)::numeric AS vidval,
+    302::numeric AS lstudy,
+    lpad((i / 100)::text, 4, '0') || '-' || upper(substr(md5(i::text), 1, 8)) || '-' || lpad((i % 100)::text, 3, '0') AS guspec,
+    (ARRAY['BLD', 'SAL', 'REC'])[1 + i % 3] AS primstr,
+    (ARRAY['EDT', 'N/A', 'HEP'])[1 + i % 3] AS addstr,
+    (ARRAY['PLS', 'SER', 'CEL', 'N/A'])[1 + i % 4] AS dervstr
+FROM generate_series(1, {n_rows}) AS i
+"""
+
+def bench_fetch_engines(n_rows: int = 1000000, repeat: int = 3) -> None:
+    """
+    time pulling a synthetic n_rows LDMS table out of datamart with
+    - the old fetchall + DataFrame path
+    - the server-side cursor (chunked) path
+    - the COPY ... TO STDOUT path
+    the table is a session temp table, so nothing is left behind in datamart
+    """
+    query = access_ldms._protocol_query("pg_temp")
+
+    def fetchall(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            data = cursor.fetchall()
+            columns = [c.name for c in cursor.description]
+        return pd.DataFrame(data, columns=columns)
+
+    def server_side(conn):
+        return pd.concat(access_ldms._iter_query(conn, query), ignore_index=True)
+
+    def copy(conn):
+        return access_ldms._copy_query(conn, query)
+
+    rows = []
+    with access_ldms.get_connection() as conn:
+        conn.execute(SYNTHETIC_TABLE_SQL.format(n_rows=int(n_rows)))
+        for label, fn in [('fetchall', fetchall), ('server-side cursor', server_side), ('copy', copy)]:
+            seconds, df = best_of(lambda: fn(conn), repeat=repeat)
+            rows.append((label, seconds, f"{len(df):,} rows"))
+
+    report(f"fetch engines, {n_rows:,} synthetic rows (best of {repeat})", rows)
+
+## typed frames -------------------------------------------------------------- ##
+def bench_dtypes(protocol: int = 302, network: str = 'hvtn', repeat: int = 3) -> None:
+    """
+    pull one protocol and compare the untyped (inferred / object) frame against
+    the same frame cast to access_ldms.LDMS_DTYPES: memory, sort and merge time
+    """
+    query = access_ldms._protocol_query(access_ldms.resolve_schema(network, protocol))
+    with access_ldms.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            data = cursor.fetchall()
+            columns = [c.name for c in cursor.description]
+    raw = pd.DataFrame(data, columns=columns)
+    typed = access_ldms.apply_ldms_dtypes(raw.copy())
+
+    sort_cols = ['lstudy', 'primstr', 'addstr', 'dervstr', 'drawdy', 'drawdm', 'drawdd']
+    merge_cols = ['primstr', 'addstr', 'dervstr']
+
+    rows = []
+    for label, df in [('untyped', raw), ('typed', typed)]:
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        sort_seconds, _ = best_of(lambda: df.sort_values(sort_cols), repeat=repeat)
+        lookup = df[merge_cols].drop_duplicates()
+        merge_seconds, _ = best_of(lambda: df.merge(lookup, on=merge_cols), repeat=repeat)
+        rows.append((f"{label} sort", sort_seconds, f"{mb:,.1f} MB"))
+        rows.append((f"{label} merge", merge_seconds, ""))
+
+    report(f"LDMS dtypes, {network}{protocol} ({len(raw):,} rows, best of {repeat})", rows)
+
+## snapshot formats ---------------------------------------------------------- ##
+def bench_snapshots(n_rows: int = 1000000, repeat: int = 3) -> None:
+    """
+    compare the old csv feed snapshots against ldms_snapshot_store's parquet
+    on a synthetic n_rows protocol: write time, full read, a two-column read
+    (e.g. just guspec / txtpid) and size on disk
+    """
+    import ldms_snapshot_store
+    import synthetic_ldms
+
+    ldms = access_ldms.apply_ldms_dtypes(synthetic_ldms.generate_n_rows(n_rows))
+    columns = ['guspec', 'txtpid']
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "hvtn.ldms302.20261017.csv")
+        parquet_path = os.path.join(tmp, "hvtn.ldms302.20261017.parquet")
+        writers = [
+            ('csv', csv_path, lambda: ldms.to_csv(csv_path, index=False)),
+            ('parquet (zstd)', parquet_path, lambda: ldms_snapshot_store._write_parquet(parquet_path, ldms, {})),
+        ]
+        for label, path, write in writers:
+            seconds, _ = best_of(write, repeat=repeat)
+            rows.append((f"{label} write", seconds, f"{os.path.getsize(path) / 1e6:,.1f} MB on disk"))
+            seconds, _ = best_of(lambda: ldms_snapshot_store.read_snapshot(path), repeat=repeat)
+            rows.append((f"{label} read", seconds, ""))
+            seconds, _ = best_of(lambda: ldms_snapshot_store.read_snapshot(path, columns=columns), repeat=repeat)
+            rows.append((f"{label} read 2 cols", seconds, ""))
+
+    report(f"snapshot formats, {n_rows:,} synthetic rows (best of {repeat})", rows)
+
+## snapshot history ---------------------------------------------------------- ##
+def _dir_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for (root, _, files) in os.walk(directory) for f in files)
+
+def bench_history(n_days: int = 90, n_rows: int = 200000, changes_per_day: int = 20) -> None:
+    """
+    save n_days of a synthetic n_rows protocol (changes_per_day guspecs touched per day)
+    through ldms_snapshot_store, in a temp dir, and compare base + delta history
+    against keeping every day in full: disk, save time, and rebuilding old days
+    """
+    import datetime
+    import ldms_snapshot_store
+    import synthetic_ldms
+
+    start = datetime.date(2026, 1, 1)
+    ldms = access_ldms.apply_ldms_dtypes(synthetic_ldms.generate_n_rows(n_rows))
+    studies_dir = ldms_snapshot_store.STUDIES_DIR
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ldms_snapshot_store.STUDIES_DIR = tmp + "/"
+        try:
+            save_seconds = 0.
+            for day in range(n_days):
+                ldms = access_ldms.apply_ldms_dtypes(synthetic_ldms.mutate_ldms(
+                    ldms, n_changed=changes_per_day, n_added=changes_per_day // 2,
+                    n_removed=changes_per_day // 4, seed=day
+                ))
+                t = time.perf_counter()
+                ldms_snapshot_store.save_snapshot('hvtn', 302, ldms, date=start + datetime.timedelta(days=day))
+                save_seconds += time.perf_counter() - t
+            history_bytes = _dir_size(tmp)
+            full_bytes = os.path.getsize(ldms_snapshot_store.find_snapshot('hvtn', 302)) * n_days
+            rows.append(("save (per day)", save_seconds / n_days, ""))
+            rows.append(("disk, base + deltas", 0., f"{history_bytes / 1e6:,.1f} MB"))
+            rows.append(("disk, every day in full", 0., f"{full_bytes / 1e6:,.1f} MB"))
+            for back in [1, 7, 30, n_days - 1]:
+                date = start + datetime.timedelta(days=n_days - 1 - back)
+                seconds, _ = best_of(lambda: ldms_snapshot_store.load_snapshot('hvtn', 302, date))
+                rows.append((f"load {back} days back", seconds, ""))
+            seconds, diff = best_of(lambda: ldms_snapshot_store.diff_snapshots('hvtn', 302, start, None))
+            rows.append(("diff first -> last day", seconds, f"{diff.guspec.nunique():,} guspecs"))
+        finally:
+            ldms_snapshot_store.STUDIES_DIR = studies_dir
+
+    report(f"snapshot history, {n_days} days of {n_rows:,} synthetic rows", rows)
+
+## diff engines ------------------------------------------------------------- ##
+def legacy_diff(old: pd.DataFrame, new: pd.DataFrame) -> set:
+    """
+    the guspec set / value_counts / sort / DataFrame.compare diff that
+    detect_ldms_diffs used before ldms_diff, minus the printing;
+    return every guspec it flags
+    """
+    import numpy as np
+    col_sort_order = ['guspec', 'txtpid', 'drawdm', 'drawdd', 'drawdy', 'vidval', 'lstudy',
+       'primstr', 'addstr', 'dervstr']
+    old, new = old.copy(), new.copy()
+    for df in [old, new]:
+        for col in df.select_dtypes('category').columns:
+            df[col] = df[col].astype(object)
+        for col in ['drawdm','drawdd','drawdy']:
+            df[col] = df[col].astype(int)
+        for col in ['vidval','lstudy']:
+            df[col] = df[col].astype(float)
+        df['txtpid'] = df.txtpid.astype(str)
+
+    flagged = set(old.guspec).symmetric_difference(new.guspec)
+    shared_guspecs = set(old.guspec).intersection(new.guspec)
+    new = new.loc[new.guspec.isin(shared_guspecs)].drop_duplicates()
+    old = old.loc[old.guspec.isin(shared_guspecs)].drop_duplicates()
+    comp = new.guspec.value_counts().to_frame().merge(
+        old.guspec.value_counts().to_frame(), how='outer', left_index=True, right_index=True
+    )
+    flagged.update(comp.loc[comp.count_x!=comp.count_y].index)
+    matches = list(comp.loc[comp.count_x==comp.count_y].index)
+    new = new.loc[new.guspec.isin(matches)].sort_values(by=col_sort_order, ignore_index=True)
+    old = old.loc[old.guspec.isin(matches)].sort_values(by=col_sort_order, ignore_index=True)
+    diff = new.replace("N/A", np.nan).compare(old.replace("N/A", np.nan))
+    flagged.update(new.iloc[diff.index].guspec.unique())
+    return flagged
+
+def bench_diff(n_rows: int = 1000000, n_changes: int = 200, repeat: int = 3) -> None:
+    """
+    diff a synthetic n_rows protocol against a copy with n_changes changed guspecs
+    (plus some added / removed ones), with the legacy diff and ldms_diff.diff_ldms
+    """
+    import ldms_diff
+    import synthetic_ldms
+
+    old = access_ldms.apply_ldms_dtypes(synthetic_ldms.generate_n_rows(n_rows))
+    new = access_ldms.apply_ldms_dtypes(synthetic_ldms.mutate_ldms(
+        old, n_changed=n_changes, n_added=n_changes // 2, n_removed=n_changes // 4
+    ))
+    rows = []
+    seconds, flagged = best_of(lambda: legacy_diff(old, new), repeat=repeat)
+    rows.append(("legacy (sort + compare)", seconds, f"{len(flagged):,} guspecs flagged"))
+    seconds, diff = best_of(lambda: ldms_diff.diff_ldms(old, new), repeat=repeat)
+    rows.append(("hashed (diff_ldms)", seconds, ldms_diff.summarize_diff(diff)))
+
+    report(f"diff engines, {n_rows:,} synthetic rows (best of {repeat})", rows)
+
+def _peak_memory(fn) -> tuple:
+    """
+    call fn(), return (seconds, peak MB allocated while it ran (as seen by tracemalloc), result)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return time.perf_counter() - start, peak / 1e6, result
+
+def bench_partitioned_diff(n_rows: int = 2000000, n_partitions: int = 16, n_changes: int = 200) -> None:
+    """
+    diff two days of a synthetic n_rows protocol, saved as snapshots in a temp dir,
+    with both days in memory (diff_ldms) and bucketed on disk (diff_ldms_partitioned);
+    compare time, peak memory and check the results are identical
+    """
+    import datetime
+    import ldms_diff
+    import ldms_snapshot_store
+    import synthetic_ldms
+
+    old = access_ldms.apply_ldms_dtypes(synthetic_ldms.generate_n_rows(n_rows))
+    new = access_ldms.apply_ldms_dtypes(synthetic_ldms.mutate_ldms(
+        old, n_changed=n_changes, n_added=n_changes // 2, n_removed=n_changes // 4
+    ))
+    days = [datetime.date(2026, 1, 1), datetime.date(2026, 1, 2)]
+    studies_dir = ldms_snapshot_store.STUDIES_DIR
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ldms_snapshot_store.STUDIES_DIR = tmp + "/"
+        try:
+            ldms_snapshot_store._write_full('hvtn', 302, old, days[0])
+            ldms_snapshot_store._write_full('hvtn', 302, new, days[1])
+            del old, new
+
+            seconds, peak, in_memory = _peak_memory(lambda: ldms_diff.diff_ldms(
+                ldms_snapshot_store.load_snapshot('hvtn', 302, days[0]),
+                ldms_snapshot_store.load_snapshot('hvtn', 302, days[1]),
+            ))
+            rows.append(("in memory", seconds, f"peak {peak:,.0f} MB"))
+            seconds, peak, partitioned = _peak_memory(lambda: ldms_diff.diff_ldms_partitioned(
+                ldms_snapshot_store.iter_snapshot_chunks('hvtn', 302, days[0]),
+                ldms_snapshot_store.iter_snapshot_chunks('hvtn', 302, days[1]),
+                n_partitions=n_partitions, tmp_dir=tmp,
+            ))
+            rows.append((f"{n_partitions} partitions", seconds, f"peak {peak:,.0f} MB"))
+        finally:
+            ldms_snapshot_store.STUDIES_DIR = studies_dir
+
+    identical = all([in_memory[k] == partitioned[k] for k in ['inserted', 'deleted', 'changed']]) and all([
+        in_memory[k].astype(object).equals(partitioned[k].astype(object)) for k in ['added', 'removed']
+    ])
+    report(f"diff of two days, {n_rows:,} synthetic rows (results identical: {identical})", rows)
+
+## config loading ----------------------------------------------------------- ##
+def _time_import(module: str, cache_dir: str) -> float:
+    """
+    return the wall time of importing module in a fresh interpreter,
+    with the yaml cache in cache_dir
+    """
+    env = dict(os.environ, SDMC_CONFIG_CACHE_DIR=cache_dir)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True, env=env,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - start
+
+def bench_config_load(repeat: int = 5) -> None:
+    """
+    time reading constants.yaml with the pure-Python loader, libyaml and the
+    config_loader cache (cold = empty cache, warm = cached, in a new process),
+    then a full cold / warm `import ldms_monitoring`
+    """
+    import yaml
+    import config_loader
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "constants.yaml")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        original = config_loader.CACHE_DIR
+        config_loader.CACHE_DIR = tmp
+        try:
+            def parse_with(loader):
+                with open(path, 'r') as file:
+                    return yaml.load(file, Loader=loader)
+            seconds, _ = best_of(lambda: parse_with(yaml.SafeLoader), repeat=repeat)
+            rows.append(("yaml.safe_load", seconds, "pure Python"))
+            if hasattr(yaml, "CSafeLoader"):
+                seconds, _ = best_of(lambda: parse_with(yaml.CSafeLoader), repeat=repeat)
+                rows.append(("CSafeLoader", seconds, "libyaml"))
+
+            def cold():
+                config_loader.clear_cache()
+                return config_loader.load_yaml(path)
+            seconds, _ = best_of(cold, repeat=repeat)
+            rows.append(("load_yaml, cold", seconds, f"parse + write cache ({config_loader.LOADER.__name__})"))
+
+            def warm():
+                config_loader._MEMORY.clear()
+                return config_loader.load_yaml(path)
+            seconds, _ = best_of(warm, repeat=repeat)
+            rows.append(("load_yaml, warm", seconds, "unpickle cache"))
+        finally:
+            config_loader.CACHE_DIR = original
+    report(f"reading constants.yaml ({os.path.getsize(path) / 1e6:.1f} MB, best of {repeat})", rows)
+
+    rows = []
+    cold_timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            cold_timings.append(_time_import("ldms_monitoring", tmp))
+    rows.append(("cold (empty cache)", min(cold_timings), ""))
+    with tempfile.TemporaryDirectory() as tmp:
+        _time_import("ldms_monitoring", tmp)
+        warm_timings = [_time_import("ldms_monitoring", tmp) for _ in range(repeat)]
+    rows.append(("warm (cached)", min(warm_timings), ""))
+    report(f"import ldms_monitoring in a new interpreter (best of {repeat})", rows)
+
+BENCHMARKS = {
+    'fetch_engines': bench_fetch_engines,
+    'dtypes': bench_dtypes,
+    'snapshots': bench_snapshots,
+    'history': bench_history,
+    'diff': bench_diff,
+    'config_load': bench_config_load,
+    'partitioned_diff': bench_partitioned_diff,
+}
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    return a parser with a subcommand per benchmark, whose optional positional
+    arguments are the benchmark's parameters, typed by their defaults
+    e.g. python benchmark_ldms.py dtypes 805 covpn
+    """
+    parser = argparse.ArgumentParser(description="benchmarks for the LDMS pull / monitoring code paths")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for name, fn in BENCHMARKS.items():
+        summary = " ".join([line.strip() for line in fn.__doc__.strip().split("-----")[0].splitlines()])
+        subparser = subparsers.add_parser(name, help=summary, description=summary)
+        for param in inspect.signature(fn).parameters.values():
+            subparser.add_argument(param.name, nargs="?", type=type(param.default), default=param.default,
+                                   help=f"(default: {param.default})")
+    return parser
+
+if __name__=="__main__":
+    args = vars(_parser().parse_args())
+    BENCHMARKS[args.pop("benchmark")](**args)
@@ -1,17 +1,15 @@
 import pandas as pd
 import numpy as np
-import datetime
-import yaml
 import os
 import sdmc_tools.constants as constants
 import smtplib
-from sdmc_tools.access_ldms import pull_one_protocol as get_ldms
+from access_ldms import pull_one_protocol as get_ldms, iter_concurrently, resolve_schema, DEFAULT_MAX_WORKERS
+from config_loader import load_yaml
 from email.message import EmailMessage
 
 # ---------------------------------------------------------------------------- #
 yamlpath = '/home/bhaddock/repos/sdmc-adhoc/constants.yaml'
-with open(yamlpath, 'r') as file:
-    yamldict = yaml.safe_load(file)
+yamldict = load_yaml(yamlpath)
 
 LDMS_ROWS_TO_IGNORE = [
     {'guspec':'0410-0SYFJA00-001', 'drawdt':'2024-11-25'}, #ldms has two dates for this guspec; confirmed this one incorrect
@@ -83,8 +81,11 @@ def main():
     ]
 
     # for each dataset, check against ldms
+    to_check = set(output_paths).difference(no_guspec).difference(DONT_ALERT_BUT_STILL_TO_HANDLE).union(olds)
+    # pull every protocol the datasets need once, up front, and share it across the checks
+    pull_shared_ldms(plan_ldms_pulls(to_check))
     results = {}
-    for o in set(output_paths).difference(no_guspec).difference(DONT_ALERT_BUT_STILL_TO_HANDLE).union(olds):
+    for o in to_check:
         try:
             results[o] = check_for_ldms_changes(o)
         except Exception as error:
@@ -149,12 +150,87 @@ def main():
         s.send_message(msg)
         s.quit()
 
+## shared ldms ---------------------------------------------------------------- ##
+# each protocol's ldms is pulled once per run and shared by every dataset that uses it,
+# keyed by (schema, distinct_core); see plan_ldms_pulls / pull_shared_ldms
+SHARED_LDMS = {}
+
+def _read_output(path, **kwargs) -> pd.DataFrame:
+    """
+    given an output path, read it (tab separated if .txt)
+    """
+    if '.txt' in path:
+        return pd.read_csv(path, sep="\t", **kwargs)
+    return pd.read_csv(path, **kwargs)
+
+def plan_ldms_pulls(paths) -> list:
+    """
+    given output paths, return the ldms pulls their checks need,
+    as a list of unique (network, protocol, distinct_core)
+    -----
+    only the header and network / protocol / specrole columns are read;
+    outputs that can't be read are skipped here (their check reports the error)
+    """
+    planned = {}
+    for path in sorted(paths):
+        try:
+            header = [c.lower() for c in _read_output(path, nrows=0).columns]
+            if 'guspec' in header or 'guspec1' in header:
+                distinct_core = False
+            elif 'guspec_core' in header:
+                distinct_core = True
+            else:
+                continue
+            df = _read_output(path, usecols=lambda c: c.lower() in ['network', 'protocol', 'specrole'])
+            df.columns = [i.lower() for i in df.columns]
+            if 'specrole' in df.columns:
+                df = df.loc[df.specrole=="Sample"]
+            for network, protocol in df[['network','protocol']].drop_duplicates().itertuples(index=False):
+                key = (resolve_schema(network, protocol), distinct_core)
+                planned.setdefault(key, (network, protocol, distinct_core))
+        except Exception:
+            continue
+    return list(planned.values())
+
+def _pull_for_check(pull: tuple):
+    """
+    given (network, protocol, distinct_core), return its ldms as the checks use it
+    (or the exception, if the pull failed)
+    """
+    network, protocol, distinct_core = pull
+    try:
+        if distinct_core:
+            # drawdt / guspec_core are built by datamart, one row per guspec core
+            return get_ldms(network, protocol, derived=['drawdt'], distinct_core=True)
+        return get_ldms(network, protocol, derived=['drawdt'])
+    except Exception as error:
+        return error
+
+def pull_shared_ldms(pulls: list, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+    """
+    given (network, protocol, distinct_core) pulls (see plan_ldms_pulls),
+    pull each once, concurrently, into SHARED_LDMS
+    """
+    for (network, protocol, distinct_core), data in iter_concurrently(_pull_for_check, pulls, max_workers=max_workers):
+        SHARED_LDMS[(resolve_schema(network, protocol), distinct_core)] = data
+
+def shared_ldms(network, protocol, distinct_core: bool = False) -> pd.DataFrame:
+    """
+    given a network and protocol, return its ldms from SHARED_LDMS,
+    pulling it (once) if it wasn't planned
+    -----
+    the frame is shared by every check; don't modify it in place
+    """
+    key = (resolve_schema(network, protocol), distinct_core)
+    if key not in SHARED_LDMS:
+        SHARED_LDMS[key] = _pull_for_check((network, protocol, distinct_core))
+    if isinstance(SHARED_LDMS[key], Exception):
+        raise SHARED_LDMS[key]
+    return SHARED_LDMS[key]
+
 # ---------------------------------------------------------------------------- #
 def check_for_ldms_changes(path):
-    if '.txt' in path:
-        df = pd.read_csv(path, sep="\t")
-    else:
-        df = pd.read_csv(path)
+    df = _read_output(path)
     df.columns = [i.lower() for i in df.columns]
     if 'specrole' in df.columns:
         df = df.loc[df.specrole=="Sample"]
@@ -171,16 +247,14 @@ def check_for_ldms_changes(path):
     return result
 
 def check_against_ldms_with_guspec_core(df):
-    ldms = pd.DataFrame()
+    frames = []
     for i, row in df[['network','protocol']].drop_duplicates().iterrows():
-        s = get_ldms(row.network, row.protocol)
-        ldms = pd.concat([ldms, s])
+        frames.append(shared_ldms(row.network, row.protocol, distinct_core=True))
+    # concat copies, so the shared frames aren't touched below
+    ldms = pd.concat(frames)
     ldms = ldms.rename(columns=constants.LDMS_RELABEL_DICT)
-    ldms["drawdt"] = ldms.apply(
-        lambda x: datetime.date(x.drawdy, x.drawdm, x.drawdd).isoformat(), axis=1
-    )
+    ldms["drawdt"] = ldms.drawdt.dt.strftime('%Y-%m-%d')
     ldms = ldms.drop(columns=["drawdy", "drawdm", "drawdd"])
-    ldms['guspec_core'] = ldms.guspec.str.rpartition("-")[0]
     ldms = ldms.loc[ldms.guspec_core.isin(df.guspec_core)]
     ldms = exclude_rows(ldms, LDMS_CORE_ROWS_TO_IGNORE) #drop specific rows that we know to be incorrect
 
@@ -199,8 +273,8 @@ def check_against_ldms_with_guspec_core(df):
     df.drawdt = pd.to_datetime(df['drawdt']).astype(str)
     for col in ['guspec_core','spec_primary','spec_additive','spec_derivative']:
         if col in df.columns:
-            df[col] = df[col].astype(str)
-            ldms[col] = ldms[col].astype(str)
+            df[col] = as_text(df[col])
+            ldms[col] = as_text(ldms[col])
 
 
     left = df[usecols].drop_duplicates().sort_values(usecols).reset_index(drop=True)
@@ -216,13 +290,12 @@ def check_against_ldms_with_guspec(df):
     df = df.copy()
     frames = []
     for _, row in df[['network','protocol']].drop_duplicates().iterrows():
-        frames.append(get_ldms(row.network, row.protocol))
+        frames.append(shared_ldms(row.network, row.protocol))
     
+    # concat copies, so the shared frames aren't touched below
     ldms = pd.concat(frames, ignore_index=True)
     ldms = ldms.rename(columns=constants.LDMS_RELABEL_DICT)
-    ldms["drawdt"] = ldms.apply(
-        lambda x: datetime.date(x.drawdy, x.drawdm, x.drawdd).isoformat(), axis=1
-    )
+    ldms["drawdt"] = ldms.drawdt.dt.strftime('%Y-%m-%d')
     ldms = ldms.drop(columns=["drawdy", "drawdm", "drawdd"])
     ldms = ldms.loc[ldms.guspec.isin(df.guspec)]
     ldms = exclude_rows(ldms, LDMS_ROWS_TO_IGNORE) #drop specific rows that we know to be incorrect
@@ -242,8 +315,8 @@ def check_against_ldms_with_guspec(df):
     df['drawdt'] = pd.to_datetime(df['drawdt']).dt.strftime('%Y-%m-%d')
     for col in ['guspec','spec_primary','spec_additive','spec_derivative']:
         if col in df.columns:
-            df[col] = df[col].fillna('').astype(str)
-            ldms[col] = ldms[col].fillna('').astype(str)
+            df[col] = as_text(df[col])
+            ldms[col] = as_text(ldms[col])
 
     left = df[usecols].drop_duplicates().sort_values(usecols).reset_index(drop=True)
     right = ldms[usecols].drop_duplicates().sort_values(usecols).reset_index(drop=True)
@@ -290,8 +363,7 @@ def read_yaml(yaml_path: str, add_path:bool = False) -> dict:
     optionally add yaml_path to yaml dict
     return yaml dict
     """
-    with open(yaml_path, 'r') as file:
-        yaml_dict = yaml.safe_load(file)
+    yaml_dict = load_yaml(yaml_path)
     if yaml_dict is None:
         # print(f"{yaml_path} is currently empty; please fill in")
         return {"yaml_path": yaml_path}
@@ -311,6 +383,13 @@ def get_output_path_from_yaml(yaml_dict: dict) -> list:
         output_path += "/"
     return [output_path + f for f in fnames]
 
+def as_text(s: pd.Series) -> pd.Series:
+    """
+    given a column (object or categorical), return it as strings, with nulls as ''
+    (categoricals can't be filled with a value that isn't one of their categories)
+    """
+    return s.astype(object).fillna('').astype(str)
+
 def exclude_rows(ldms, rules):
     mask = pd.Series(False, index=ldms.index)
 
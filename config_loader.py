@@ -0,0 +1,104 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - One place to read constants.yaml and the jobs' paths.yaml files
+#     - Parses with libyaml (yaml.CSafeLoader) when PyYAML was built with it,
+#       falling back to the pure-Python SafeLoader otherwise
+#     - Keeps a pickle of each parsed file, keyed on its path, size and mtime,
+#       so unchanged yamls aren't parsed again on the next run
+#     - the cache lives in .config_cache/ next to this file
+#       (or $SDMC_CONFIG_CACHE_DIR)
+## ---------------------------------------------------------------------------##
+import os
+import pickle
+import hashlib
+import yaml
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CACHE_DIR = os.environ.get(
+    "SDMC_CONFIG_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".config_cache")
+)
+
+# bumped whenever what's pickled changes shape
+_CACHE_VERSION = 1
+
+# pickled results already read in this process, {path: (size, mtime_ns, bytes)}
+_MEMORY = {}
+
+def _cache_path(path: str) -> str:
+    """
+    given a yaml path, return where its parsed copy is cached
+    """
+    name = os.path.basename(path)
+    digest = hashlib.md5(path.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{name}.{digest}.pickle")
+
+def parse_yaml(path: str):
+    """
+    given a yaml path, parse it (with libyaml if available), bypassing the cache
+    """
+    with open(path, 'r') as file:
+        return yaml.load(file, Loader=LOADER)
+
+def _read_cache(path: str, size: int, mtime_ns: int):
+    """
+    return the pickled contents of path's cache if it matches size / mtime_ns, else None
+    """
+    try:
+        with open(_cache_path(path), 'rb') as file:
+            version, cached_path, cached_size, cached_mtime_ns, data = pickle.load(file)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if (version, cached_path, cached_size, cached_mtime_ns) != (_CACHE_VERSION, path, size, mtime_ns):
+        return None
+    return data
+
+def _write_cache(path: str, size: int, mtime_ns: int, data: bytes) -> None:
+    """
+    cache data (the pickled contents of path); a cache that can't be written is skipped
+    """
+    cache_path = _cache_path(path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((_CACHE_VERSION, path, size, mtime_ns, data), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_yaml(path: str, use_cache: bool = True):
+    """
+    given a yaml path, return its contents (a fresh copy every call, so it's safe to modify)
+    -----
+    reuses the cached parse when the file's size and mtime haven't changed since
+    """
+    if not use_cache:
+        return parse_yaml(path)
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    size, mtime_ns = stat.st_size, stat.st_mtime_ns
+
+    memory = _MEMORY.get(path)
+    if memory is not None and memory[:2] == (size, mtime_ns):
+        return pickle.loads(memory[2])
+
+    data = _read_cache(path, size, mtime_ns)
+    if data is None:
+        data = pickle.dumps(parse_yaml(path), protocol=pickle.HIGHEST_PROTOCOL)
+        _write_cache(path, size, mtime_ns, data)
+    _MEMORY[path] = (size, mtime_ns, data)
+    return pickle.loads(data)
+
+def clear_cache() -> None:
+    """
+    remove every cached yaml (in memory and on disk)
+    """
+    _MEMORY.clear()
+    if os.path.isdir(CACHE_DIR):
+        for f in os.listdir(CACHE_DIR):
+            if f.endswith(".pickle"):
+                os.remove(os.path.join(CACHE_DIR, f))
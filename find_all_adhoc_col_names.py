@@ -4,11 +4,11 @@
 # Purpose: Pull a DataFrame each column name that's been in ad hoc processing,
 # and count of its frequency
 ## ---------------------------------------------------------------------------##
-import yaml
 import pandas as pd
 import numpy as np
 import os
 import sys
+from config_loader import load_yaml
 
 SAVEPATH = sys.argv[1]
 REMOVE_THESE = [
@@ -73,8 +73,7 @@ def read_yaml(yaml_path: str, add_path:bool = False) -> dict:
     optionally add yaml_path to yaml dict
     return yaml dict
     """
-    with open(yaml_path, 'r') as file:
-        yaml_dict = yaml.safe_load(file)
+    yaml_dict = load_yaml(yaml_path)
     if yaml_dict is None:
         print(f"{yaml_path} is currently empty; please fill in")
         return {"yaml_path": yaml_path}
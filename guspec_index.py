@@ -0,0 +1,197 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Keep a persistent guspec -> (job paths.yaml, output file) index for the
+#       2024+ processing_scripts jobs, in a small SQLite file
+#     - Only jobs whose paths.yaml or output file changed (by mtime) since the
+#       last run are re-read, so keeping it current is mostly a few stats
+#     - "which jobs use these guspecs" is one batched lookup however many
+#       guspecs are asked about
+#     - usage: python guspec_index.py [guspec ...]
+## ---------------------------------------------------------------------------##
+import pandas as pd
+import os
+import sys
+import json
+import sqlite3
+from yaml_handling import find_endpoints, read_yaml, get_output_path_from_yaml
+
+PROCESSING_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__)) + "/processing_scripts"
+INDEX_PATH = os.path.dirname(os.path.abspath(__file__)) + "/.guspec_index.sqlite"
+
+# seconds to wait on another process (e.g. a monitoring worker) holding the write lock
+_LOCK_TIMEOUT = 120
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    yaml_path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    savedir TEXT,
+    output_prefix TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    output_id INTEGER PRIMARY KEY,
+    yaml_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_yaml_idx ON outputs (yaml_path);
+CREATE TABLE IF NOT EXISTS guspecs (
+    guspec TEXT NOT NULL,
+    output_id INTEGER NOT NULL,
+    PRIMARY KEY (guspec, output_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS guspecs_output_idx ON guspecs (output_id);
+"""
+
+def _connect(db_path: str = INDEX_PATH) -> sqlite3.Connection:
+    """
+    open the index, creating its tables if needed
+    """
+    conn = sqlite3.connect(db_path, timeout=_LOCK_TIMEOUT)
+    conn.executescript(_SCHEMA)
+    return conn
+
+def find_job_yamls(root: str = PROCESSING_SCRIPTS_DIR) -> list:
+    """
+    return the paths.yaml of every job under root
+    """
+    return sorted([f for f in find_endpoints(root, l=[]) if f.split("/")[-1]=="paths.yaml"])
+
+def _mtime_ns(path: str) -> int:
+    """
+    given a path, return its mtime in ns (-1 if it doesn't exist)
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+def _job_outputs(yaml_dict: dict) -> list:
+    """
+    given a job's yaml dict, return the current output file(s) it points to,
+    or [] if they can't be found (no savedir, savedir not mounted, ...)
+    """
+    if yaml_dict.get('savedir') is None or yaml_dict.get('output_prefix') is None:
+        return []
+    try:
+        return get_output_path_from_yaml(dict(yaml_dict))
+    except (OSError, IndexError):
+        return []
+
+def _read_output_guspecs(output_path: str) -> list:
+    """
+    given an output file (csv / txt), return the guspecs in it
+    """
+    sep = "\t" if output_path[-3:]=="txt" else ","
+    try:
+        data = pd.read_csv(output_path, sep=sep, usecols=lambda c: c=='guspec', dtype=str)
+    except (OSError, ValueError) as e:
+        print(f"couldn't read guspecs from {output_path}: {e}")
+        return []
+    if 'guspec' not in data.columns:
+        return []
+    return data.guspec.dropna().unique().tolist()
+
+def _index_job(conn: sqlite3.Connection, yaml_path: str, yaml_dict: dict, outputs: dict) -> None:
+    """
+    replace everything indexed for one job with the guspecs of its current outputs
+    -----
+    outputs: {output_path: mtime_ns}. when the outputs can't be read (e.g. off-site),
+    the guspecs cached in the yaml itself are indexed under the yaml's savedir instead
+    """
+    conn.execute("DELETE FROM guspecs WHERE output_id IN (SELECT output_id FROM outputs WHERE yaml_path = ?)", (yaml_path,))
+    conn.execute("DELETE FROM outputs WHERE yaml_path = ?", (yaml_path,))
+    conn.execute(
+        "INSERT OR REPLACE INTO jobs (yaml_path, mtime_ns, savedir, output_prefix) VALUES (?, ?, ?, ?)",
+        (yaml_path, _mtime_ns(yaml_path), yaml_dict.get('savedir'), json.dumps(yaml_dict.get('output_prefix')))
+    )
+
+    sources = []
+    for output_path, mtime_ns in outputs.items():
+        sources += [(output_path, mtime_ns, _read_output_guspecs(output_path))]
+    if len(sources) == 0 and len(yaml_dict.get('guspecs') or []) > 0:
+        sources = [(yaml_dict.get('savedir', yaml_path), -1, yaml_dict['guspecs'])]
+
+    for output_path, mtime_ns, guspecs in sources:
+        output_id = conn.execute(
+            "INSERT INTO outputs (yaml_path, output_path, mtime_ns) VALUES (?, ?, ?)",
+            (yaml_path, output_path, mtime_ns)
+        ).lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO guspecs (guspec, output_id) VALUES (?, ?)",
+            [(str(g), output_id) for g in guspecs]
+        )
+
+def update_index(root: str = PROCESSING_SCRIPTS_DIR, db_path: str = INDEX_PATH, verbose: bool = False) -> int:
+    """
+    bring the index up to date with the jobs under root:
+    - jobs whose paths.yaml mtime, output file(s) or output mtimes changed are re-read
+    - jobs that no longer exist are dropped
+    return the number of jobs re-read
+    """
+    yaml_paths = find_job_yamls(root)
+    conn = _connect(db_path)
+    try:
+        indexed = {}
+        for yaml_path, mtime_ns, savedir, output_prefix in conn.execute("SELECT yaml_path, mtime_ns, savedir, output_prefix FROM jobs"):
+            indexed[yaml_path] = (mtime_ns, {'savedir': savedir, 'output_prefix': json.loads(output_prefix)})
+        indexed_outputs = {}
+        for yaml_path, output_path, mtime_ns in conn.execute("SELECT yaml_path, output_path, mtime_ns FROM outputs"):
+            indexed_outputs.setdefault(yaml_path, {})[output_path] = mtime_ns
+
+        n_updated = 0
+        for yaml_path in yaml_paths:
+            if yaml_path in indexed.keys() and indexed[yaml_path][0] == _mtime_ns(yaml_path):
+                # yaml unchanged (so no need to parse it);
+                # still re-read if the job has written a new / newer output since
+                outputs = {p: _mtime_ns(p) for p in _job_outputs(indexed[yaml_path][1])}
+                if len(outputs) == 0 or outputs == indexed_outputs.get(yaml_path, {}):
+                    continue
+            yaml_dict = read_yaml(yaml_path)
+            outputs = {p: _mtime_ns(p) for p in _job_outputs(yaml_dict)}
+            if verbose:
+                print(f"indexing {yaml_path}")
+            with conn:
+                _index_job(conn, yaml_path, yaml_dict, outputs)
+            n_updated += 1
+
+        gone = set(indexed.keys()).difference(yaml_paths)
+        if len(gone) > 0:
+            with conn:
+                for yaml_path in gone:
+                    conn.execute("DELETE FROM guspecs WHERE output_id IN (SELECT output_id FROM outputs WHERE yaml_path = ?)", (yaml_path,))
+                    conn.execute("DELETE FROM outputs WHERE yaml_path = ?", (yaml_path,))
+                    conn.execute("DELETE FROM jobs WHERE yaml_path = ?", (yaml_path,))
+    finally:
+        conn.close()
+    return n_updated
+
+def jobs_using_guspecs(guspecs: list, db_path: str = INDEX_PATH) -> pd.DataFrame:
+    """
+    given a list (or set) of guspecs, return a DataFrame of (guspec, yaml_path, output_path)
+    for every indexed job output that contains one of them
+    """
+    columns = ['guspec', 'yaml_path', 'output_path']
+    guspecs = pd.Series(list(guspecs), dtype=object).dropna().astype(str).unique()
+    if len(guspecs) == 0:
+        return pd.DataFrame(columns=columns)
+    conn = _connect(db_path)
+    try:
+        conn.execute("CREATE TEMP TABLE lookup (guspec TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.executemany("INSERT INTO lookup (guspec) VALUES (?)", [(g,) for g in guspecs])
+        rows = conn.execute(
+            "SELECT g.guspec, o.yaml_path, o.output_path "
+            "FROM lookup l JOIN guspecs g ON g.guspec = l.guspec "
+            "JOIN outputs o ON o.output_id = g.output_id "
+            "ORDER BY o.yaml_path, o.output_path, g.guspec"
+        ).fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=columns)
+
+if __name__=="__main__":
+    n = update_index(verbose=True)
+    print(f"re-indexed {n} jobs")
+    if len(sys.argv) > 1:
+        print(jobs_using_guspecs(sys.argv[1:]).to_string(index=False))
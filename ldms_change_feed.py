@@ -0,0 +1,178 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Append-only feed of what changed in LDMS, written by each monitoring run
+#     - one record per (run, protocol, guspec, change_type, column, old, new):
+#         inserted   guspec new to LDMS
+#         deleted    guspec gone from LDMS
+#         row_count  guspec in both, different number of rows (old / new = counts)
+#         changed    guspec in both, same number of rows; one record per column
+#                    whose values differ (old / new = the values, "|"-joined if several)
+#     - partitioned as {FEED_DIR}/date=YYYY-MM-DD/protocol=HVTN302/{run_id}.jsonl,
+#       so changes_since only opens the days / protocols asked for
+#     - usage: python ldms_change_feed.py <YYYYMMDD> [protocol]
+## ---------------------------------------------------------------------------##
+import pandas as pd
+import os
+import sys
+import datetime
+from ldms_snapshot_store import STUDIES_DIR, format_network, _as_date
+
+FEED_DIR = os.environ.get("LDMS_CHANGE_FEED_DIR", STUDIES_DIR + "ldms_change_feed/")
+
+FEED_COLUMNS = ['run_id', 'run_date', 'network', 'protocol', 'guspec', 'change_type', 'column', 'old', 'new']
+
+def new_run_id() -> str:
+    """
+    return an id for a monitoring run, e.g. 20261017T060002-4121
+    """
+    return f"{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+def _join_values(values) -> str:
+    """
+    given the values a column takes in a guspec's rows, return them as one string
+    """
+    values = sorted(set(["" if pd.isna(v) else str(v) for v in values]))
+    return "|".join(values)
+
+def diff_records(diff: dict, old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    given a diff_ldms result and the two frames it compared,
+    return its change records (guspec, change_type, column, old, new)
+    """
+    columns = ['guspec', 'change_type', 'column', 'old', 'new']
+    records = []
+    for guspec in diff['inserted']:
+        records += [(guspec, 'inserted', None, None, None)]
+    for guspec in diff['deleted']:
+        records += [(guspec, 'deleted', None, None, None)]
+
+    changed = pd.Index(diff['changed'])
+    if len(changed) > 0:
+        n_old = old.loc[old.guspec.isin(changed)].guspec.astype(object).value_counts()
+        n_new = new.loc[new.guspec.isin(changed)].guspec.astype(object).value_counts()
+        same_count = []
+        for guspec in changed:
+            if n_old.get(guspec, 0) != n_new.get(guspec, 0):
+                records += [(guspec, 'row_count', None, str(n_old.get(guspec, 0)), str(n_new.get(guspec, 0)))]
+            else:
+                same_count += [guspec]
+
+        # which columns differ between a guspec's removed and added rows
+        removed = diff['removed'].loc[diff['removed'].guspec.isin(same_count)]
+        added = diff['added'].loc[diff['added'].guspec.isin(same_count)]
+        for col in [c for c in removed.columns if c != 'guspec' and c in added.columns]:
+            before = removed.groupby(removed.guspec.astype(object))[col].agg(_join_values)
+            after = added.groupby(added.guspec.astype(object))[col].agg(_join_values)
+            before, after = before.align(after, fill_value="")
+            for guspec in before.index[(before != after).values]:
+                records += [(guspec, 'changed', col, before[guspec], after[guspec])]
+        # rows that only swapped values between them don't show up per column
+        described = set([r[0] for r in records if r[1] == 'changed'])
+        records += [(g, 'changed', None, None, None) for g in same_count if g not in described]
+    return pd.DataFrame(records, columns=columns)
+
+## writing ------------------------------------------------------------------ ##
+def partition_dir(date, network: str, protocol, feed_dir: str = None) -> str:
+    """
+    given a run date, network and protocol, return its partition of the feed
+    """
+    feed_dir = FEED_DIR if feed_dir is None else feed_dir
+    return os.path.join(feed_dir, f"date={_as_date(date).isoformat()}", f"protocol={format_network(network)}{int(protocol)}")
+
+def write_changes(network: str, protocol, records: pd.DataFrame, run_id: str = None,
+                  date=None, feed_dir: str = None) -> str:
+    """
+    given a protocol's change records (see diff_records), append them to the feed
+    as one new file in the (date, protocol) partition; return its path (None if no records)
+    """
+    if len(records) == 0:
+        return None
+    run_id = new_run_id() if run_id is None else run_id
+    date = datetime.date.today() if date is None else _as_date(date)
+    records = records.assign(
+        run_id=run_id,
+        run_date=date.isoformat(),
+        network=format_network(network),
+        protocol=int(protocol),
+    )[FEED_COLUMNS]
+
+    directory = partition_dir(date, network, protocol, feed_dir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{run_id}.jsonl")
+    tmp_path = f"{path}.tmp"
+    records.to_json(tmp_path, orient='records', lines=True)
+    os.replace(tmp_path, path)
+    return path
+
+## reading ------------------------------------------------------------------ ##
+def _partition_value(name: str, key: str) -> str:
+    """
+    given a partition dir name like 'date=2026-10-17', return its value ('' if it isn't key=...)
+    """
+    prefix = f"{key}="
+    return name[len(prefix):] if name.startswith(prefix) else ""
+
+def _matches_protocol(partition: str, protocol, network: str = None) -> bool:
+    """
+    given a partition value like 'HVTN302', return whether it's the protocol asked for
+    (protocol: e.g. 302 or 'HVTN302'; network narrows a bare number)
+    """
+    if protocol is None:
+        return network is None or partition.lower().startswith(network.lower())
+    protocol = str(protocol)
+    if not protocol.isdigit():
+        return partition.lower() == protocol.lower()
+    digits = partition.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")
+    if digits != str(int(protocol)):
+        return False
+    return network is None or partition.lower().startswith(network.lower())
+
+def changes_since(date, protocol=None, network: str = None, until=None, feed_dir: str = None) -> pd.DataFrame:
+    """
+    return every change record from runs on or after date (and on or before until, if given),
+    optionally for one protocol (e.g. 302, or 'HVTN302'), oldest first
+    -----
+    only the matching date / protocol partitions are read
+    """
+    feed_dir = FEED_DIR if feed_dir is None else feed_dir
+    start = _as_date(date)
+    end = None if until is None else _as_date(until)
+    files = []
+    if os.path.isdir(feed_dir):
+        for date_dir in sorted(os.listdir(feed_dir)):
+            value = _partition_value(date_dir, "date")
+            if value == "":
+                continue
+            day = datetime.date.fromisoformat(value)
+            if day < start or (end is not None and day > end):
+                continue
+            for protocol_dir in sorted(os.listdir(os.path.join(feed_dir, date_dir))):
+                value = _partition_value(protocol_dir, "protocol")
+                if value == "" or not _matches_protocol(value, protocol, network):
+                    continue
+                directory = os.path.join(feed_dir, date_dir, protocol_dir)
+                files += [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".jsonl")]
+    if len(files) == 0:
+        return pd.DataFrame(columns=FEED_COLUMNS)
+    # dtype=False: keep old / new (and guspecs) as the strings written
+    changes = pd.concat([pd.read_json(f, orient='records', lines=True, dtype=False) for f in files], ignore_index=True)
+    return changes[FEED_COLUMNS].sort_values(['run_date', 'run_id'], kind='stable').reset_index(drop=True)
+
+def summarize_changes(changes: pd.DataFrame) -> pd.DataFrame:
+    """
+    given change records, return the number of guspecs per (date, protocol, change type)
+    """
+    return (changes.assign(protocol=changes.network + changes.protocol.astype(str))
+                   .groupby(['run_date', 'protocol', 'change_type']).guspec.nunique()
+                   .rename('n_guspecs').reset_index())
+
+if __name__=="__main__":
+    if len(sys.argv) < 2:
+        print("usage: python ldms_change_feed.py <YYYYMMDD> [protocol]")
+        sys.exit(1)
+    protocol = sys.argv[2] if len(sys.argv) > 2 else None
+    changes = changes_since(sys.argv[1], protocol=protocol)
+    print(f"{len(changes):,} change records")
+    if len(changes) > 0:
+        print(summarize_changes(changes).to_string(index=False))
@@ -0,0 +1,231 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Diff two pulls / snapshots of a protocol's LDMS row by row
+#     - Every row is hashed once and matched against the other side through a
+#       hash table, so the diff is one linear pass (no sorting) and reports the
+#       exact rows added / removed for each guspec, even when a guspec's row
+#       count changed
+#     - diff_ldms_partitioned does the same diff in bounded memory for very large
+#       protocols: both sides are split by guspec hash into buckets on disk,
+#       then diffed a bucket at a time
+## ---------------------------------------------------------------------------##
+import pandas as pd, numpy as np
+import os
+import tempfile
+
+# treated as missing when comparing, as the old DataFrame.compare diff did
+NA_STRINGS = ['N/A']
+
+# odd 64 bit constant used to fold a row's occurrence number into its hash
+_OCCURRENCE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def _normalize(ldms: pd.DataFrame, columns: list, na_strings: list = NA_STRINGS) -> pd.DataFrame:
+    """
+    return ldms[columns] with na_strings as missing, txtpid as text and numbers as floats,
+    so e.g. a csv snapshot and a fresh pull hash the same
+    """
+    data = ldms[columns].copy()
+    for col in columns:
+        if len(na_strings) == 0:
+            break
+        if isinstance(data[col].dtype, pd.CategoricalDtype):
+            na = [v for v in na_strings if v in data[col].cat.categories]
+            if len(na) > 0:
+                data[col] = data[col].cat.remove_categories(na)
+        elif data[col].dtype == object:
+            data[col] = data[col].replace(na_strings, np.nan)
+    if 'txtpid' in columns:
+        if pd.api.types.is_numeric_dtype(data.txtpid):
+            data['txtpid'] = data.txtpid.astype('Int64')
+        data['txtpid'] = data.txtpid.astype(str)
+    for col in ['drawdm', 'drawdd', 'drawdy', 'vidval', 'lstudy']:
+        if col in columns:
+            data[col] = pd.to_numeric(data[col]).astype('float64')
+    return data
+
+def row_hashes(ldms: pd.DataFrame, columns: list = None, na_strings: list = NA_STRINGS) -> np.ndarray:
+    """
+    given an ldms frame, return a uint64 hash of each row over columns
+    (default: every column, in name order)
+    """
+    columns = sorted(ldms.columns) if columns is None else list(columns)
+    return pd.util.hash_pandas_object(_normalize(ldms, columns, na_strings), index=False).values
+
+def _occurrence_keys(hashes: np.ndarray) -> np.ndarray:
+    """
+    given row hashes, return keys that also tell repeated rows apart
+    (the nth copy of a row gets a different key than the first),
+    so rows are matched as a multiset
+    """
+    occurrence = pd.Series(hashes).groupby(hashes, sort=False).cumcount().values.astype(np.uint64)
+    return hashes + occurrence * _OCCURRENCE_MIX
+
+def diff_ldms(old: pd.DataFrame, new: pd.DataFrame, columns: list = None, na_strings: list = NA_STRINGS) -> dict:
+    """
+    given two versions of a protocol's ldms, return a dict with
+    - 'added': rows in new that aren't in old
+    - 'removed': rows in old that aren't in new
+    - 'inserted': guspecs only in new
+    - 'deleted': guspecs only in old
+    - 'changed': guspecs in both whose rows differ (added, removed or edited rows)
+    -----
+    - rows are compared over columns (default: the columns both share);
+      an edited row shows up as one removed and one added row
+    - duplicate rows count: two copies in old and one in new is one removed row
+    - values in na_strings compare equal to missing values (pass [] for an exact diff)
+    """
+    if columns is None:
+        columns = sorted(set(old.columns).intersection(new.columns))
+    old_keys = _occurrence_keys(row_hashes(old, columns, na_strings))
+    new_keys = _occurrence_keys(row_hashes(new, columns, na_strings))
+
+    removed = old.loc[~pd.Series(old_keys).isin(new_keys).values]
+    added = new.loc[~pd.Series(new_keys).isin(old_keys).values]
+
+    touched = pd.Index(pd.concat([removed.guspec, added.guspec]).astype(object).unique())
+    in_old = touched.isin(pd.Index(old.guspec.astype(object).unique()))
+    in_new = touched.isin(pd.Index(new.guspec.astype(object).unique()))
+    return {
+        'added': added.reset_index(drop=True),
+        'removed': removed.reset_index(drop=True),
+        'inserted': touched[~in_old].tolist(),
+        'deleted': touched[~in_new].tolist(),
+        'changed': touched[in_old & in_new].tolist(),
+    }
+
+## partitioned diff --------------------------------------------------------- ##
+# buckets a partitioned diff splits each side into
+DIFF_PARTITIONS = 16
+
+# a side is read (and spilled) about one bucket's worth of rows at a time, so that
+# no more than ~1/DIFF_PARTITIONS of it is in memory at once; CHUNK_ROWS is used
+# when the number of rows isn't known up front (e.g. csv snapshots)
+CHUNK_ROWS = 125000
+MIN_CHUNK_ROWS = 10000
+
+def chunk_rows_for(n_rows: int, n_partitions: int = DIFF_PARTITIONS) -> int:
+    """
+    given the number of rows on one side of a partitioned diff, return the rows per chunk to read it in
+    """
+    return max(MIN_CHUNK_ROWS, -(-int(n_rows) // n_partitions))
+
+def iter_frame_chunks(ldms: pd.DataFrame, chunk_rows: int = None):
+    """
+    given a frame, yield it chunk_rows rows at a time (default: see chunk_rows_for)
+    """
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for(len(ldms))
+    for start in range(0, max(len(ldms), 1), chunk_rows):
+        yield ldms.iloc[start:start + chunk_rows]
+
+def guspec_partitions(guspecs: pd.Series, n_partitions: int = DIFF_PARTITIONS) -> np.ndarray:
+    """
+    given guspecs, return the bucket (0 .. n_partitions-1) each one falls in
+    """
+    hashes = pd.util.hash_array(guspecs.astype(object).astype(str).values)
+    return (hashes % np.uint64(n_partitions)).astype(np.int64)
+
+def _spill(chunks, directory: str, side: str, n_partitions: int) -> tuple:
+    """
+    given an iterable of frames, split each by guspec bucket into pickles under directory,
+    tagging rows with their position (_row); return (n rows, empty frame with the columns)
+    """
+    n_rows, template = 0, None
+    for i, chunk in enumerate(chunks):
+        if template is None:
+            template = chunk.iloc[:0]
+        if len(chunk) == 0:
+            continue
+        chunk = chunk.assign(_row=np.arange(n_rows, n_rows + len(chunk)))
+        buckets = guspec_partitions(chunk.guspec, n_partitions)
+        for bucket in np.unique(buckets):
+            chunk.loc[buckets == bucket].to_pickle(os.path.join(directory, f"{side}.{bucket}.{i}.pkl"))
+        n_rows += len(chunk)
+    if template is None:
+        raise Exception(f"no {side} ldms to diff (the iterable yielded no frames)")
+    return n_rows, template
+
+def _concat(frames: list, template: pd.DataFrame) -> pd.DataFrame:
+    """
+    concatenate frames, keeping the columns that are categorical in template categorical
+    (pd.concat turns categories that differ between frames into objects)
+    """
+    frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    for col, dtype in template.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype('category')
+    return frame
+
+def _load_bucket(directory: str, side: str, bucket: int, template: pd.DataFrame) -> pd.DataFrame:
+    """
+    return every row of one side's bucket (template's columns if it's empty)
+    """
+    prefix = f"{side}.{bucket}."
+    pieces = [pd.read_pickle(os.path.join(directory, f)) for f in sorted(os.listdir(directory)) if f.startswith(prefix)]
+    if len(pieces) == 0:
+        return template.assign(_row=np.array([], dtype=np.int64))
+    return _concat(pieces, template)
+
+def diff_ldms_partitioned(old_chunks, new_chunks, n_partitions: int = DIFF_PARTITIONS, columns: list = None,
+                          na_strings: list = NA_STRINGS, tmp_dir: str = None) -> dict:
+    """
+    given two versions of a protocol's ldms, each as an iterable of frames
+    (e.g. ldms_snapshot_store.iter_snapshot_chunks, or iter_frame_chunks),
+    return the same diff as diff_ldms, holding only about 1/n_partitions of the data at once
+    -----
+    both sides are split by guspec hash into n_partitions buckets on disk (under tmp_dir),
+    then diffed bucket by bucket; a guspec's rows all land in one bucket, so this
+    matches diff_ldms exactly, row order included. the result also has
+    - 'old_touched' / 'new_touched': every row of the guspecs that changed, on each side
+    - 'n_old' / 'n_new': the number of rows on each side
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+        n_old, old_template = _spill(old_chunks, directory, "old", n_partitions)
+        n_new, new_template = _spill(new_chunks, directory, "new", n_partitions)
+        if columns is None:
+            columns = sorted(set(old_template.columns).intersection(new_template.columns))
+
+        parts = {'added': [], 'removed': [], 'old_touched': [], 'new_touched': []}
+        inserted, deleted, changed = set(), set(), set()
+        for bucket in range(n_partitions):
+            old = _load_bucket(directory, "old", bucket, old_template)
+            new = _load_bucket(directory, "new", bucket, new_template)
+            if len(old) == 0 and len(new) == 0:
+                continue
+            diff = diff_ldms(old, new, columns, na_strings)
+            touched = diff['inserted'] + diff['deleted'] + diff['changed']
+            inserted.update(diff['inserted'])
+            deleted.update(diff['deleted'])
+            changed.update(diff['changed'])
+            parts['added'] += [diff['added']]
+            parts['removed'] += [diff['removed']]
+            parts['old_touched'] += [old.loc[old.guspec.isin(touched)]]
+            parts['new_touched'] += [new.loc[new.guspec.isin(touched)]]
+            del old, new, diff
+
+    # back into each side's original row order
+    templates = {'added': new_template, 'removed': old_template, 'old_touched': old_template, 'new_touched': new_template}
+    result = {}
+    for key, frames in parts.items():
+        frames = [f for f in frames if len(f) > 0]
+        if len(frames) == 0:
+            result[key] = templates[key].copy()
+            continue
+        frame = _concat(frames, templates[key])
+        result[key] = frame.sort_values('_row', kind='stable').drop(columns='_row').reset_index(drop=True)
+
+    # same guspec order as diff_ldms: as they come up in removed, then added
+    touched = pd.concat([result['removed'].guspec, result['added'].guspec]).astype(object).unique().tolist()
+    result['inserted'] = [g for g in touched if g in inserted]
+    result['deleted'] = [g for g in touched if g in deleted]
+    result['changed'] = [g for g in touched if g in changed]
+    result['n_old'], result['n_new'] = n_old, n_new
+    return result
+
+def summarize_diff(diff: dict) -> str:
+    """
+    given a diff_ldms result, return a one line summary of it
+    """
+    return (f"{len(diff['inserted'])} guspecs inserted, {len(diff['deleted'])} deleted, "
+            f"{len(diff['changed'])} changed ({len(diff['added'])} rows added, {len(diff['removed'])} removed)")
@@ -0,0 +1,228 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Keep a per-protocol history table of LDMS rows, slowly-changing-dimension
+#       style: every version of every row with the day it appeared (valid_from)
+#       and the day it stopped being in LDMS (valid_to, empty while current)
+#     - It's a SQLite file next to the snapshots ({network}.ldms{protocol}.history.sqlite),
+#       indexed by guspec, so "what did LDMS say about guspec X on day D" and
+#       "when did its drawdt change" are index lookups however long the history is
+#     - Kept current from the snapshot store (each day's delta), see sync_history
+#     - usage: python ldms_history.py <network> <protocol> <guspec> [YYYYMMDD]
+## ---------------------------------------------------------------------------##
+import pandas as pd, numpy as np
+import os
+import sys
+import sqlite3
+import datetime
+from access_ldms import STANDARD_COLS, apply_ldms_dtypes
+from ldms_diff import row_hashes, _occurrence_keys
+from ldms_snapshot_store import (feed_dir, format_network, _as_date, list_snapshot_dates,
+                                 list_delta_dates, load_snapshot, load_delta)
+
+# sqlite types of the ldms columns kept
+HISTORY_COLUMN_TYPES = {
+    'txtpid': 'TEXT',
+    'drawdm': 'INTEGER',
+    'drawdd': 'INTEGER',
+    'drawdy': 'INTEGER',
+    'vidval': 'REAL',
+    'lstudy': 'REAL',
+    'guspec': 'TEXT',
+    'primstr': 'TEXT',
+    'addstr': 'TEXT',
+    'dervstr': 'TEXT',
+}
+
+def history_path(network: str, protocol) -> str:
+    """
+    given a network and protocol, return the path of its history table
+    """
+    return feed_dir(network, protocol) + f"{format_network(network).lower()}.ldms{int(protocol)}.history.sqlite"
+
+def _connect(path: str) -> sqlite3.Connection:
+    """
+    open a history table, creating it if needed
+    """
+    conn = sqlite3.connect(path)
+    columns = ",\n    ".join([f"{col} {kind}" for col, kind in HISTORY_COLUMN_TYPES.items()])
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS history (
+            {columns},
+            row_hash INTEGER NOT NULL,
+            valid_from TEXT NOT NULL,
+            valid_to TEXT
+        );
+        CREATE INDEX IF NOT EXISTS history_guspec_idx ON history (guspec, valid_from);
+        CREATE INDEX IF NOT EXISTS history_current_idx ON history (guspec) WHERE valid_to IS NULL;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return conn
+
+def _last_date(conn: sqlite3.Connection):
+    """
+    return the last day applied to a history table (None if it's empty)
+    """
+    row = conn.execute("SELECT value FROM meta WHERE key = 'last_date'").fetchone()
+    return None if row is None else datetime.date.fromisoformat(row[0])
+
+def _row_keys(ldms: pd.DataFrame) -> np.ndarray:
+    """
+    given ldms rows, return a key per row (its hash, with repeated rows told apart),
+    as int64 for sqlite
+    """
+    columns = [c for c in HISTORY_COLUMN_TYPES.keys() if c in ldms.columns]
+    return _occurrence_keys(row_hashes(ldms, columns, na_strings=[])).view(np.int64)
+
+def _with_lookup(conn: sqlite3.Connection, guspecs) -> None:
+    """
+    (re)fill the connection's temp lookup table with guspecs
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (guspec TEXT PRIMARY KEY) WITHOUT ROWID")
+    conn.execute("DELETE FROM lookup")
+    conn.executemany("INSERT OR IGNORE INTO lookup (guspec) VALUES (?)", [(str(g),) for g in guspecs])
+
+def _apply_day(conn: sqlite3.Connection, rows: pd.DataFrame, date: datetime.date, guspecs=None) -> tuple:
+    """
+    given a day's rows (all of them, or every row of just the guspecs given),
+    close the versions that are gone and open the ones that are new;
+    return (n closed, n opened)
+    """
+    keys = _row_keys(rows)
+    if guspecs is None:
+        current = pd.read_sql_query("SELECT rowid AS id, row_hash FROM history WHERE valid_to IS NULL", conn)
+    else:
+        _with_lookup(conn, guspecs)
+        current = pd.read_sql_query(
+            "SELECT h.rowid AS id, h.row_hash FROM history h JOIN lookup l ON h.guspec = l.guspec "
+            "WHERE h.valid_to IS NULL", conn
+        )
+    closed = current.id[~current.row_hash.isin(keys)]
+    opened = rows.loc[~pd.Series(keys).isin(current.row_hash).values].copy()
+    opened['row_hash'] = keys[~pd.Series(keys).isin(current.row_hash).values]
+
+    day = date.isoformat()
+    conn.executemany("UPDATE history SET valid_to = ? WHERE rowid = ?", [(day, int(i)) for i in closed])
+    columns = [c for c in HISTORY_COLUMN_TYPES.keys() if c in opened.columns] + ['row_hash']
+    values = opened[columns].astype(object).where(opened[columns].notna(), None)
+    # numpy scalars (e.g. from Int64 columns) are stored as the python values they hold
+    conn.executemany(
+        f"INSERT INTO history ({', '.join(columns)}, valid_from) VALUES ({', '.join(['?'] * len(columns))}, ?)",
+        [tuple(v.item() if isinstance(v, np.generic) else v for v in r) + (day,)
+         for r in values.itertuples(index=False)]
+    )
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_date', ?)", (day,))
+    return len(closed), len(opened)
+
+def sync_history(network: str, protocol, verbose: bool = False) -> int:
+    """
+    given a network and protocol, apply every snapshot day newer than its history table
+    (building the table from the oldest snapshot kept if there isn't one yet);
+    return the number of days applied
+    -----
+    a day with a delta only touches the guspecs in it; others are diffed in full
+    (e.g. the first day, or after a gap)
+    """
+    network = format_network(network)
+    dates = list_snapshot_dates(network, protocol)
+    if len(dates) == 0:
+        return 0
+    conn = _connect(history_path(network, protocol))
+    try:
+        last = _last_date(conn)
+        deltas = set(list_delta_dates(network, protocol))
+        n_days = 0
+        for previous, date in zip([None] + dates[:-1], dates):
+            if last is not None and date <= last:
+                continue
+            # a delta is relative to the previous snapshot day, so it can only
+            # be replayed onto the table if that's the day the table is at
+            if last is not None and previous == last and date in deltas:
+                delta = load_delta(network, protocol, date)
+                rows = delta.loc[delta._state == 'new'].drop(columns=['_state', '_change'])
+                closed, opened = _apply_day(conn, rows, date, guspecs=delta.guspec.astype(object).unique())
+            else:
+                closed, opened = _apply_day(conn, load_snapshot(network, protocol, date), date)
+            conn.commit()
+            if verbose:
+                print(f"{network}{protocol} {date}: {closed:,} row versions closed, {opened:,} opened")
+            last = date
+            n_days += 1
+    finally:
+        conn.close()
+    return n_days
+
+## queries ------------------------------------------------------------------ ##
+def _query(network: str, protocol, sql: str, params: tuple = (), guspecs: list = None) -> pd.DataFrame:
+    """
+    run a query against a protocol's history table (with guspecs in the temp table
+    lookup, if given) and return the result with LDMS dtypes
+    """
+    path = history_path(network, protocol)
+    if not os.path.exists(path):
+        raise Exception(f"No LDMS history for {network}{protocol}; run sync_history first")
+    conn = _connect(path)
+    try:
+        if guspecs is not None:
+            _with_lookup(conn, guspecs)
+        result = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    return apply_ldms_dtypes(result)
+
+def as_of(network: str, protocol, date, guspecs: list = None) -> pd.DataFrame:
+    """
+    given a network, protocol and day, return LDMS as it was that day
+    (just the guspecs given, if any)
+    """
+    columns = ", ".join([f"h.{c}" for c in STANDARD_COLS])
+    day = _as_date(date).isoformat()
+    join = "" if guspecs is None else "JOIN lookup l ON h.guspec = l.guspec"
+    return _query(network, protocol,
+        f"SELECT {columns} FROM history h {join} "
+        "WHERE h.valid_from <= ? AND (h.valid_to IS NULL OR h.valid_to > ?)",
+        (day, day), guspecs=guspecs)
+
+def history(network: str, protocol, guspec: str) -> pd.DataFrame:
+    """
+    given a guspec, return every version of its rows, with valid_from / valid_to
+    (valid_to empty while current), oldest first
+    """
+    columns = ", ".join(STANDARD_COLS)
+    return _query(network, protocol,
+        f"SELECT {columns}, valid_from, valid_to FROM history WHERE guspec = ? ORDER BY valid_from, rowid",
+        (str(guspec),))
+
+def value_history(network: str, protocol, guspec: str, column: str) -> pd.DataFrame:
+    """
+    given a guspec and a column, return the values the column took over time:
+    one row per stretch of days with the same value(s), with valid_from / valid_to
+    e.g. value_history('hvtn', 302, '0410-0N6LTG00-001', 'drawdd')
+    """
+    if column not in STANDARD_COLS:
+        raise Exception(f"column must be one of {STANDARD_COLS}. Submitted {column}")
+    versions = history(network, protocol, guspec)
+    if len(versions) == 0:
+        return pd.DataFrame(columns=['valid_from', 'valid_to', column])
+    # the days anything about the guspec changed, and its values in between
+    days = sorted(set(versions.valid_from).union(versions.valid_to.dropna()))
+    stretches = []
+    for start, end in zip(days, days[1:] + [None]):
+        live = versions.loc[(versions.valid_from <= start) & (versions.valid_to.isna() | (versions.valid_to > start))]
+        values = "|".join(sorted(set(live[column].astype(str)))) if len(live) > 0 else None
+        if len(stretches) > 0 and stretches[-1][2] == values:
+            stretches[-1][1] = end
+        else:
+            stretches += [[start, end, values]]
+    return pd.DataFrame(stretches, columns=['valid_from', 'valid_to', column])
+
+if __name__=="__main__":
+    if len(sys.argv) < 4:
+        print("usage: python ldms_history.py <network> <protocol> <guspec> [YYYYMMDD]")
+        sys.exit(1)
+    network, protocol, guspec = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    sync_history(network, protocol, verbose=True)
+    if len(sys.argv) > 4:
+        print(as_of(network, protocol, sys.argv[4], guspecs=[guspec]).to_string(index=False))
+    else:
+        print(history(network, protocol, guspec).to_string(index=False))
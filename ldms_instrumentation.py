@@ -0,0 +1,190 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Lightweight timing of the LDMS monitoring run: `with span(stage, protocol=...)`
+#       records wall / CPU time and, optionally, rows and bytes handled
+#     - Each run writes a JSON report (every span plus totals per protocol / stage)
+#       and appends its totals to a rolling history, so a stage that's getting
+#       slower night over night stands out
+#     - reports go to .monitoring_reports/ next to this file (or $LDMS_REPORT_DIR)
+#     - usage: python ldms_instrumentation.py [n_runs]   (recent history per stage)
+## ---------------------------------------------------------------------------##
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+import contextlib
+
+REPORT_DIR = os.environ.get(
+    "LDMS_REPORT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".monitoring_reports")
+)
+HISTORY_PATH = os.path.join(REPORT_DIR, "history.jsonl")
+
+# runs kept in the rolling history, and per-run reports kept on disk
+HISTORY_RUNS = 180
+# a stage is flagged when it takes this many times its median over the history
+REGRESSION_FACTOR = 1.5
+# ... and at least this many seconds more, so tiny stages don't flag on noise
+REGRESSION_MIN_SECONDS = 5.
+
+# spans finished in this process, oldest first
+_SPANS = []
+_LOCAL = threading.local()
+
+@contextlib.contextmanager
+def span(stage: str, protocol: str = None, **attrs):
+    """
+    time the block as one span of stage (e.g. 'save', 'diff.compare') for protocol;
+    yields a dict the block can add to, e.g. s['rows'] = len(ldms)
+    -----
+    spans opened inside another span record it as their parent
+    """
+    stack = getattr(_LOCAL, 'stack', None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    record = {
+        'stage': stage,
+        'protocol': protocol if protocol is not None else (stack[-1]['protocol'] if len(stack) > 0 else None),
+        'parent': stack[-1]['stage'] if len(stack) > 0 else None,
+        'started': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'pid': os.getpid(),
+    }
+    record.update(attrs)
+    stack.append(record)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    except BaseException:
+        record['error'] = True
+        raise
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall, 4)
+        record['cpu_seconds'] = round(time.thread_time() - cpu, 4)
+        stack.pop()
+        _SPANS.append(record)
+
+def collect_spans() -> list:
+    """
+    return the spans finished in this process so far, and forget them
+    (e.g. to hand them back from a worker process)
+    """
+    spans = list(_SPANS)
+    del _SPANS[:len(spans)]
+    return spans
+
+def add_spans(spans: list) -> None:
+    """
+    add spans recorded elsewhere (e.g. in a worker process) to this process's
+    """
+    _SPANS.extend(spans)
+
+def summarize_spans(spans: list) -> list:
+    """
+    given spans, return totals per (protocol, stage): count, wall / cpu seconds, rows, bytes
+    """
+    totals = {}
+    for s in spans:
+        key = (s.get('protocol'), s['stage'])
+        total = totals.setdefault(key, {'protocol': key[0], 'stage': key[1], 'count': 0,
+                                        'wall_seconds': 0., 'cpu_seconds': 0., 'rows': 0, 'bytes': 0})
+        total['count'] += 1
+        total['wall_seconds'] += s['wall_seconds']
+        total['cpu_seconds'] += s['cpu_seconds']
+        total['rows'] += int(s.get('rows') or 0)
+        total['bytes'] += int(s.get('bytes') or 0)
+    for total in totals.values():
+        total['wall_seconds'] = round(total['wall_seconds'], 3)
+        total['cpu_seconds'] = round(total['cpu_seconds'], 3)
+    return sorted(totals.values(), key=lambda t: (str(t['protocol']), t['stage']))
+
+## reports ------------------------------------------------------------------ ##
+def read_history(n_runs: int = None, history_path: str = HISTORY_PATH) -> list:
+    """
+    return the rolling history (one dict per run, oldest first), the last n_runs of it if given
+    """
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, 'r') as file:
+        runs = [json.loads(line) for line in file if line.strip()]
+    return runs if n_runs is None else runs[-n_runs:]
+
+def find_regressions(summary: list, history: list, factor: float = REGRESSION_FACTOR,
+                     min_seconds: float = REGRESSION_MIN_SECONDS) -> list:
+    """
+    given a run's summary and earlier runs, return the (protocol, stage) totals that
+    took factor times their median wall time over those runs (and min_seconds more)
+    """
+    flagged = []
+    for total in summary:
+        past = sorted([
+            t['wall_seconds'] for run in history for t in run['summary']
+            if t['protocol'] == total['protocol'] and t['stage'] == total['stage']
+        ])
+        if len(past) < 3:
+            continue
+        median = past[len(past) // 2]
+        if total['wall_seconds'] > factor * median and total['wall_seconds'] - median > min_seconds:
+            flagged += [dict(total, median_seconds=median)]
+    return flagged
+
+def write_report(run_id: str, started: float, report_dir: str = REPORT_DIR, **extra) -> str:
+    """
+    write this run's spans as {report_dir}/{run_id}.json, add its totals to the rolling
+    history, print any stage that got markedly slower, and return the report path
+    -----
+    started: time.time() when the run began; extra is saved with the report
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    history_path = os.path.join(report_dir, "history.jsonl")
+    spans = collect_spans()
+    summary = summarize_spans(spans)
+    run = {
+        'run_id': run_id,
+        'started': datetime.datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'wall_seconds': round(time.time() - started, 3),
+        'summary': summary,
+    }
+    run.update(extra)
+
+    path = os.path.join(report_dir, f"{run_id}.json")
+    with open(path, 'w') as file:
+        json.dump(dict(run, spans=spans), file, indent=1)
+
+    history = read_history(history_path=history_path)
+    regressions = find_regressions(summary, history)
+    if len(regressions) > 0:
+        print("\nSTAGES SLOWER THAN USUAL:")
+        for r in regressions:
+            print(f"  {r['protocol']} {r['stage']}: {r['wall_seconds']:.1f}s (median {r['median_seconds']:.1f}s)")
+
+    # rewrite the history with just the last HISTORY_RUNS runs, and drop older reports
+    history = (history + [run])[-HISTORY_RUNS:]
+    tmp_path = f"{history_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        for r in history:
+            file.write(json.dumps(r) + "\n")
+    os.replace(tmp_path, history_path)
+    kept = set([f"{r['run_id']}.json" for r in history])
+    for f in os.listdir(report_dir):
+        if f.endswith(".json") and f not in kept:
+            os.remove(os.path.join(report_dir, f))
+    return path
+
+if __name__=="__main__":
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    runs = read_history(n_runs)
+    if len(runs) == 0:
+        print(f"no monitoring runs recorded in {HISTORY_PATH}")
+        sys.exit(0)
+    stages = sorted(set([(str(t['protocol']), t['stage']) for run in runs for t in run['summary']]))
+    print(f"{'protocol':<12}{'stage':<18}" + "".join([f"{run['run_id'][:8]:>10}" for run in runs]))
+    for protocol, stage in stages:
+        seconds = []
+        for run in runs:
+            match = [t['wall_seconds'] for t in run['summary'] if str(t['protocol']) == protocol and t['stage'] == stage]
+            seconds += [f"{match[0]:>9.1f}s" if len(match) > 0 else f"{'':>10}"]
+        print(f"{protocol:<12}{stage:<18}" + "".join(seconds))
+    print(f"{'total':<30}" + "".join([f"{run['wall_seconds']:>9.1f}s" for run in runs]))
@@ -5,39 +5,205 @@
 #     - Save back-ups of subsets of LDMS
 #     - Check for changes since yesterday
 ## ---------------------------------------------------------------------------##
-import pandas as pd, numpy as np
+import pandas as pd
 import os
-import yaml
 import datetime
+import time
+import argparse
+import contextlib
+import io
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
-import sdmc_tools.constants as constants
 from yaml_handling import *
 from access_ldms import *
-
-def main():
+from ldms_snapshot_store import list_snapshot_dates, list_delta_dates, find_snapshot, load_snapshot, load_delta, save_snapshot, prune_history
+from ldms_snapshot_store import snapshot_num_rows, iter_snapshot_chunks, format_network, PARTITIONED_DIFF_ROWS
+from ldms_diff import diff_ldms, diff_ldms_partitioned, summarize_diff
+from config_loader import load_yaml
+from guspec_index import update_index as update_guspec_index, jobs_using_guspecs
+from old_output_index import load_old_output_index, old_outputs_for_guspecs
+from ldms_history import sync_history
+from ldms_change_feed import diff_records, write_changes, new_run_id
+from rerun_scheduler import queue_jobs, merge_queues, run_pending, add_rerun_arguments, DEFAULT_WINDOW_HOURS
+from ldms_instrumentation import span, collect_spans, add_spans, write_report
+
+# number of protocols downloaded ahead of the one currently being diffed
+FETCH_WORKERS = 4
+
+def main(jobs: int = 1, rerun: bool = False, rerun_options: dict = None) -> list:
+    """
+    save / prune / diff today's ldms for every monitored protocol
+    -----
+    - jobs=1: one process; the next protocols download on threads while the current one is diffed
+      (protocols with PARTITIONED_DIFF_ROWS or more rows are downloaded on their own)
+    - jobs>1: each protocol runs in its own worker process (its own pull, save and diff),
+      so the diffs run in parallel and one protocol's download overlaps another's diff;
+      each protocol's output is collected and printed in constants.yaml order
+    - a protocol that fails is reported and skipped; the rest still run
+    - rerun: afterwards, rerun every (2024+) job affected by the changes, once each;
+      jobs are coalesced with earlier runs' triggers over a window
+      (rerun_options are passed to rerun_scheduler.run_pending)
+    - each stage is timed (see ldms_instrumentation.py); the run's timings are
+      written to a report, and stages much slower than usual are printed
+    return the (network, protocol) pairs that failed
+    """
     protocols = {}
     protocols['hvtn'] = yamldict["hvtn_protocols"]
     protocols['covpn'] = yamldict["covpn_protocols"]
+    network_protocols = [(network, protocol) for network in ['hvtn','covpn'] for protocol in protocols[network]]
+
+    failed = []
+    affected_jobs = {}
+    # tags this run's records in the change feed
+    run_id = new_run_id()
+    started = time.time()
+    if jobs <= 1:
+        # pull protocols concurrently, so downloading the next protocols
+        # overlaps with saving / diffing the current one.
+        # only what changed since the last snapshot is downloaded (see pull_todays_ldms),
+        # and today's copy is left in the shared cache for scripts
+        pulled = _iter_pulls(network_protocols)
+        for (network, protocol), (pull, error) in pulled:
+            if error is None:
+                try:
+                    merge_queues(affected_jobs, monitor_protocol(network, protocol, pull=pull, run_id=run_id))
+                except Exception:
+                    error = traceback.format_exc()
+            if error is not None:
+                print(f"{network.upper()}{protocol}: FAILED\n{error}")
+                failed += [(network, protocol)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(pair, executor.submit(_monitor_isolated, pair, run_id)) for pair in network_protocols]
+            for (network, protocol), future in futures:
+                try:
+                    output, error, affected, spans = future.result()
+                except Exception:
+                    # e.g. the worker process died
+                    output, error, affected, spans = "", traceback.format_exc(), {}, []
+                merge_queues(affected_jobs, affected)
+                add_spans(spans)
+                print(output, end="")
+                if error is not None:
+                    print(f"{network.upper()}{protocol}: FAILED\n{error}")
+                    failed += [(network, protocol)]
+
+    if len(failed) > 0:
+        print(f"\n{len(failed)} OF {len(network_protocols)} PROTOCOLS FAILED: " +
+              ", ".join([f"{network.upper()}{protocol}" for network, protocol in failed]))
+
+    if rerun:
+        with span("rerun"):
+            run_pending(affected_jobs, **(rerun_options or {}))
+    elif len(affected_jobs) > 0:
+        print(f"\n{len(affected_jobs)} AFFECTED JOBS NOT RERUN (run with --rerun to regenerate them)")
+
+    report_path = write_report(run_id, started, jobs=jobs,
+                               failed=[f"{network.upper()}{protocol}" for network, protocol in failed])
+    print(f"\nTIMINGS IN {report_path}")
+    return failed
+
+def monitor_protocol(network: str, protocol: int, pull: tuple = None, run_id: str = None) -> dict:
+    """
+    save today's ldms for one protocol, prune its history and report what changed
+    -----
+    pull: a pull_todays_ldms result, if already downloaded
+    run_id: the monitoring run, for the change feed (see ldms_change_feed.py)
+    return the (2024+) jobs affected by the changes, as a rerun_scheduler queue
+    """
+    AFFECTED_JOBS.clear()
+    label = f"{format_network(network)}{protocol}"
+    if pull is None:
+        pull = pull_todays_ldms(protocol, network)
+    ldms, buckets, changed = pull
+    message = describe_pull(protocol, format_network(network), changed)
+    if message is not None:
+        print(message)
+    with span("save", label, rows=len(ldms)):
+        save_todays_ldms(protocol, network, ldms=ldms, buckets=buckets)
+    with span("prune", label):
+        delete_old_ldms(protocol, network)
+    # bring the time-travel table up to today (see ldms_history.py)
+    with span("history", label) as s:
+        s['days'] = sync_history(network, protocol)
+    if changed == []:
+        # same fingerprint as the last snapshot, so there's nothing to diff
+        return {}
+    with span("diff", label):
+        detect_ldms_diffs(protocol, network, run_id=run_id)
+    reason = f"{network.upper()}{protocol} LDMS changes on {datetime.date.today().isoformat()}"
+    for entry in AFFECTED_JOBS.values():
+        entry['reasons'] = [f"{reason} ({len(entry['guspecs'])} guspecs)"]
+    return dict(AFFECTED_JOBS)
+
+def _pull_isolated(pair: tuple) -> tuple:
+    """
+    given (network, protocol), return (pull_todays_ldms result, None),
+    or (None, traceback) if the pull failed
+    """
+    network, protocol = pair
+    try:
+        return pull_todays_ldms(protocol, network), None
+    except Exception:
+        return None, traceback.format_exc()
 
-    for network in ['hvtn','covpn']:
-        for protocol in protocols[network]:
-            save_todays_ldms(protocol, network)
-            delete_old_ldms(protocol, network)
-            detect_ldms_diffs(protocol, network)
+def _is_large(pair: tuple) -> bool:
+    """
+    given (network, protocol), return whether its last snapshot has PARTITIONED_DIFF_ROWS or more rows
+    """
+    network, protocol = pair
+    dates = list_snapshot_dates(network, protocol)
+    return len(dates) > 0 and (snapshot_num_rows(network, protocol, dates[-1]) or 0) >= PARTITIONED_DIFF_ROWS
+
+def _iter_pulls(network_protocols: list):
+    """
+    given (network, protocol) pairs, pull them and yield (pair, _pull_isolated result) in the order given
+    -----
+    runs of ordinary protocols are pulled FETCH_WORKERS at a time; a large one
+    (see _is_large) is pulled on its own, once the pulls before it are done
+    """
+    group = []
+    for pair in network_protocols + [None]:
+        if pair is not None and not _is_large(pair):
+            group += [pair]
+            continue
+        yield from iter_concurrently(_pull_isolated, group, max_workers=FETCH_WORKERS)
+        group = []
+        if pair is not None:
+            yield pair, _pull_isolated(pair)
+
+def _monitor_isolated(pair: tuple, run_id: str = None) -> tuple:
+    """
+    given (network, protocol), run monitor_protocol in a worker process
+    and return (everything it printed, traceback or None, affected jobs, timing spans)
+    """
+    network, protocol = pair
+    output = io.StringIO()
+    error = None
+    affected = {}
+    with contextlib.redirect_stdout(output):
+        try:
+            affected = monitor_protocol(network, protocol, run_id=run_id)
+        except Exception:
+            error = traceback.format_exc()
+    return output.getvalue(), error, affected, collect_spans()
 
 ## constants and functions -------------------------------------------------- ##
 yamlpath = os.path.dirname(__file__) + "/constants.yaml"
-with open(yamlpath, 'r') as file:
-    yamldict = yaml.safe_load(file)
+yamldict = load_yaml(yamlpath)
 
 protocols = {}
 protocols['hvtn'] = yamldict["hvtn_protocols"]
 protocols['covpn'] = yamldict["covpn_protocols"]
 
 PROTOCOL_DIRNAME_MAP = yamldict["PROTOCOL_DIRNAME_MAP"]
-GUSPEC_TO_OUTPUT_PATH_OLD = yamldict["GUSPEC_TO_OUTPUT_PATH_OLD"]
+# compact index of yamldict["GUSPEC_TO_OUTPUT_PATH_OLD"], loaded on first use
+# from its sidecar (see old_output_index.py)
+GUSPEC_TO_OUTPUT_PATH_OLD = None
 
-def detect_ldms_diffs(PROTOCOL, NETWORK):
+def detect_ldms_diffs(PROTOCOL, NETWORK, run_id: str = None):
     if NETWORK.lower() == 'covpn':
         NETWORK = 'CoVPN'
     elif NETWORK.lower() == 'hvtn':
@@ -47,33 +213,47 @@ def detect_ldms_diffs(PROTOCOL, NETWORK):
 
     ## pull old and new LDMS ------------------------------------------------ ##
     today = datetime.date.today()
-    timestamp = today.strftime("%Y%m%d")
-
-    feed_dir = f"/networks/vtn/lab/SDMC_labscience/studies/{NETWORK}/{PROTOCOL_DIRNAME_MAP[NETWORK.upper()][int(PROTOCOL)]}/specimens/ldms_feed/"
-    fname = f"{NETWORK.lower()}.ldms{PROTOCOL}.{timestamp}.csv"
 
     ## save LDMS for today if it doesn't exist
-    if not os.path.exists(feed_dir + fname):
+    if today not in list_snapshot_dates(NETWORK, PROTOCOL):
         save_todays_ldms(PROTOCOL, NETWORK)
 
-    ## read in todays LDMS
-    new = pd.read_csv(feed_dir + fname, dtype=constants.LDMS_DTYPE_MAP)
-    ## read in previous LDMS
-    files = os.listdir(feed_dir)
-    if len(files) > 1:
-        files = os.listdir(feed_dir)
-        files = [i for i in files if f'{NETWORK.lower()}.ldms{PROTOCOL}' in i]
-        prev_fname = np.sort(files)[-2]
-        old = pd.read_csv(feed_dir + prev_fname, dtype=constants.LDMS_DTYPE_MAP)
-        # print(f"{NETWORK}{PROTOCOL}: Comparing {fname} and {prev_fname}")
-    else:
+    dates = list_snapshot_dates(NETWORK, PROTOCOL)
+    if len(dates) < 2:
         print(f"NO PRIOR LDMS SAVED FOR {NETWORK}{PROTOCOL}")
-        old = pd.DataFrame()
-
-    # if either of these are empty, we have nothing to compare ----------------#
-    if old.empty or new.empty:
         return
 
+    ## today's delta already holds every guspec that changed since the previous
+    ## snapshot (old and new rows), so only those rows need diffing
+    diff = None
+    n_rows = max(snapshot_num_rows(NETWORK, PROTOCOL, today) or 0, snapshot_num_rows(NETWORK, PROTOCOL, dates[-2]) or 0)
+    if today in list_delta_dates(NETWORK, PROTOCOL):
+        with span("diff.load", f"{NETWORK}{PROTOCOL}", source="delta") as s:
+            delta = load_delta(NETWORK, PROTOCOL, today)
+            old = delta.loc[delta._state == 'old'].drop(columns=['_state', '_change'])
+            new = delta.loc[delta._state == 'new'].drop(columns=['_state', '_change'])
+            s['rows'], s['bytes'] = len(delta), int(delta.memory_usage(deep=True).sum())
+    elif n_rows >= PARTITIONED_DIFF_ROWS:
+        ## only reached when today has no delta, i.e. the previous day is a csv from
+        ## before deltas existed (or pyarrow is missing). too big to hold both days:
+        ## diff them in guspec buckets streamed off disk; old / new are then just
+        ## the rows of the guspecs that changed
+        with span("diff.partitioned", f"{NETWORK}{PROTOCOL}", rows=n_rows):
+            diff = diff_ldms_partitioned(iter_snapshot_chunks(NETWORK, PROTOCOL, dates[-2]),
+                                         iter_snapshot_chunks(NETWORK, PROTOCOL, today))
+        if diff['n_old'] == 0 or diff['n_new'] == 0:
+            return
+        old, new = diff['old_touched'], diff['new_touched']
+    else:
+        with span("diff.load", f"{NETWORK}{PROTOCOL}", source="snapshots") as s:
+            new = load_snapshot(NETWORK, PROTOCOL, today)
+            old = load_snapshot(NETWORK, PROTOCOL, dates[-2])
+            s['rows'] = len(old) + len(new)
+            s['bytes'] = int(old.memory_usage(deep=True).sum() + new.memory_usage(deep=True).sum())
+        # if either of these are empty, we have nothing to compare ------------#
+        if old.empty or new.empty:
+            return
+
     # the columns have to match -- otherwise have big problems ----------------#
     # print(f"{NETWORK}{PROTOCOL}: Checking for col diff")
     COL_DIFF = set(old.columns).symmetric_difference(new.columns)
@@ -81,121 +261,93 @@ def detect_ldms_diffs(PROTOCOL, NETWORK):
         print(f"{NETWORK}{PROTOCOL}: COLUMNS DON'T MATCH. THE FOLLOWING NOT SHARED: {COL_DIFF}")
         return
 
-    # ensure column types / sorting match -------------------------------------#
-    col_sort_order = ['guspec', 'txtpid', 'drawdm', 'drawdd', 'drawdy', 'vidval', 'lstudy',
-       'primstr', 'addstr', 'dervstr']
-
-    for df in [old, new]:
-        for col in ['drawdm','drawdd','drawdy']:
-            df[col] = df[col].astype(int)
-        for col in ['vidval','lstudy']:
-            df[col] = df[col].astype(float)
-        df['txtpid'] = df.txtpid.astype(str)
-        df = df.sort_values(by=col_sort_order, ignore_index=True).drop_duplicates()
+    # hash-based row diff (see ldms_diff.py) ----------------------------------#
+    if diff is None:
+        with span("diff.compare", f"{NETWORK}{PROTOCOL}", rows=len(old) + len(new)):
+            diff = diff_ldms(old, new)
+    # print(f"{NETWORK}{PROTOCOL}: {summarize_diff(diff)}")
+
+    # every change, down to the column, goes to the change feed ---------------#
+    # (see ldms_change_feed.py); the log just gets counts
+    with span("diff.feed", f"{NETWORK}{PROTOCOL}") as s:
+        records = diff_records(diff, old, new)
+        feed_path = write_changes(NETWORK, PROTOCOL, records, run_id=run_id)
+        s['rows'] = len(records)
+    if feed_path is not None:
+        print(f"{NETWORK}{PROTOCOL}: {summarize_diff(diff)}; details in {feed_path}")
 
     # were any guspecs removed ------------------------------------------------#
-    guspecs_removed = set(old.guspec).difference(new.guspec)
+    guspecs_removed = list(diff['deleted'])
     if guspecs_removed:
-        print(f"{NETWORK}{PROTOCOL}: THE FOLLOWING GUSPECS HAVE BEEN REMOVED FROM LDMS: {guspecs_removed}")
+        print(f"{NETWORK}{PROTOCOL}: {len(guspecs_removed)} GUSPECS HAVE BEEN REMOVED FROM LDMS")
         handle_affected_jobs(guspecs_removed)
 
     # report on any added
-    guspecs_added = set(new.guspec).difference(old.guspec)
+    guspecs_added = set(diff['inserted'])
     if guspecs_added:
-        print(f"{NETWORK}{PROTOCOL}: THE FOLLOWING GUSPECS WERE ADDED TO LDMS: {guspecs_added}")
-
-    # of the guspecs in both, is there still the name number of rows per guspec
-    shared_guspecs = set(old.guspec).intersection(new.guspec)
-
-    new = new.loc[new.guspec.isin(shared_guspecs)].drop_duplicates()
-    old = old.loc[old.guspec.isin(shared_guspecs)].drop_duplicates()
+        print(f"{NETWORK}{PROTOCOL}: {len(guspecs_added)} GUSPECS WERE ADDED TO LDMS")
 
-    new_guspec_count = new.guspec.value_counts().to_frame()
-    old_guspec_count = old.guspec.value_counts().to_frame()
-
-    comp = new_guspec_count.merge(
-        old_guspec_count,
-        how='outer',
-        left_index=True,
-        right_index=True
-    )
-
-    GUSPEC_DIFFS = list(comp.loc[comp.count_x!=comp.count_y].index)
+    # of the guspecs in both, is there still the same number of rows per guspec
+    rows_added = diff['added'].guspec.astype(object).value_counts()
+    rows_removed = diff['removed'].guspec.astype(object).value_counts()
+    count_change = rows_added.sub(rows_removed, fill_value=0)
+    GUSPEC_DIFFS = [g for g in diff['changed'] if count_change.get(g, 0) != 0]
 
     # report on any guspecs corresponding to different row counts -------------#
     if GUSPEC_DIFFS:
-        print(f"{NETWORK}{PROTOCOL}: DIFFERENT NUMBER OF ROWS PER SHARED GUSPEC")
-        print(f"DIFFERENCES WITH THE FOLLOWING GUSPECS: {GUSPEC_DIFFS}")
+        print(f"{NETWORK}{PROTOCOL}: DIFFERENT NUMBER OF ROWS FOR {len(GUSPEC_DIFFS)} SHARED GUSPECS")
         handle_affected_jobs(GUSPEC_DIFFS)
 
-        print("Comparing matching rows:")
-        GUSPEC_MATCHES = list(comp.loc[comp.count_x==comp.count_y].index)
-        new = new.loc[new.guspec.isin(GUSPEC_MATCHES)]
-        old = old.loc[old.guspec.isin(GUSPEC_MATCHES)]
-
     # did anything change among the guspecs that are in both ------------------#
-    # sort for comparison
-    new = new.sort_values(by=col_sort_order, ignore_index=True)
-    old = old.sort_values(by=col_sort_order, ignore_index=True)
-
-    # compare
-    diff = new.replace("N/A", np.nan).compare(old.replace("N/A", np.nan))
-    if len(diff) > 0:
-        print(f"CHANGES DETECTED IN SHARED GUSPECS")
-        AFFECTED_GUSPECS = list(new.iloc[diff.index].guspec.unique())
-        print(f"AFFECTED GUSPECS: {AFFECTED_GUSPECS}")
+    AFFECTED_GUSPECS = [g for g in diff['changed'] if count_change.get(g, 0) == 0]
+    if AFFECTED_GUSPECS:
+        print(f"{NETWORK}{PROTOCOL}: CHANGES DETECTED IN {len(AFFECTED_GUSPECS)} SHARED GUSPECS")
         handle_affected_jobs(AFFECTED_GUSPECS)
 
 def handle_affected_jobs(guspecs: list) -> None:
-    handle_affected_jobs_old(guspecs)
-    handle_affected_jobs_new(guspecs)
+    with span("affected.old", rows=len(guspecs)):
+        handle_affected_jobs_old(guspecs)
+    with span("affected.new", rows=len(guspecs)):
+        handle_affected_jobs_new(guspecs)
 
 def handle_affected_jobs_old(guspecs: list) -> None: #report_outputs_corresponding_to_guspecs
     """
     given a list of guspecs with changes in ldms,
     report on any that are used by older (non-auto rerunnable) jobs
     """
-    affected_outputs = set()
-    for guspec in guspecs:
-        if guspec in GUSPEC_TO_OUTPUT_PATH_OLD.keys():
-            affected_outputs.update(GUSPEC_TO_OUTPUT_PATH_OLD[guspec])
+    global GUSPEC_TO_OUTPUT_PATH_OLD
+    if GUSPEC_TO_OUTPUT_PATH_OLD is None:
+        GUSPEC_TO_OUTPUT_PATH_OLD = load_old_output_index()
+    affected_outputs = old_outputs_for_guspecs(guspecs, GUSPEC_TO_OUTPUT_PATH_OLD)
     if len(affected_outputs) > 0:
-        print(f"AFFECTED OUTPUTS: {list(AFFECTED_OUTPUTS)}")
+        print(f"AFFECTED OUTPUTS: {affected_outputs}")
     else:
         print("\nNO PRE-2024 OUTPUTS AFFECTED")
 
+# whether this process has brought the guspec index up to date yet
+_GUSPEC_INDEX_UPDATED = False
+
+# jobs affected by the protocol being monitored, as a rerun_scheduler queue
+AFFECTED_JOBS = {}
+
 def handle_affected_jobs_new(guspecs: list) -> None:
     """
     given a list guspecs with changes in ldms,
-    return a list of yaml dicts corresponding to jobs that used that guspec
+    report the output files of jobs that used any of them
+    (looked up in the guspec index, see guspec_index.py)
     """
-    # pull all yaml_dicts associated with jobs
-    # print("Checking to see if new (2024+) outputs affected\n")
-    # print("Finding yamls")
-    yamls = [
-        f for f in find_endpoints('/home/bhaddock/repos/sdmc-adhoc/processing_scripts', l=[]) if f.split("/")[-1]=="paths.yaml"
-    ]
-    # print("yamls obtained")
-    yamls = [read_yaml(p, add_path=True) for p in yamls]
-    affected_job_yamls = []
-    # print("looping through guspecs, checking if in yamls")
-    # print(f"guspecs to loop through: {guspecs}\n")
-    # print(f"yamls to loop through: {yamls}")
-    for guspec in guspecs:
-        for y in yamls:
-            if "guspecs" not in y.keys():
-                print("adding guspecs to yaml\n")
-                save_guspecs_to_yaml(y["yaml_path"])
-                y = read_yaml(y["yaml_path"], add_path=True)
-            if guspec in y["guspecs"]:
-                print(f"found guspec in an output: {guspec}")
-                affected_job_yamls += [y]
-    if len(affected_job_yamls) > 0:
+    global _GUSPEC_INDEX_UPDATED
+    if not _GUSPEC_INDEX_UPDATED:
+        # outputs don't change during a run, so once per process is enough
+        update_guspec_index()
+        _GUSPEC_INDEX_UPDATED = True
+    affected = jobs_using_guspecs(guspecs)
+    if len(affected) > 0:
+        print(f"found {affected.guspec.nunique()} of the guspecs in an output")
         print("\nNEW OUTPUTS AFFECTED")
-        for y in affected_job_yamls:
-            output_path = get_output_path_from_yaml(y)
-            print(f"! The following output file affected: {output_path}")
-            # rerun_affected_job(y)
+        for (yaml_path, output_path), rows in affected.groupby(['yaml_path', 'output_path'], sort=False):
+            print(f"! The following output file affected: {output_path} ({len(rows)} guspecs)")
+            queue_jobs(AFFECTED_JOBS, yaml_path, rows.guspec.tolist())
     else:
         print("\nNO NEW (2024+) OUTPUTS AFFECTED")
 
@@ -207,23 +359,69 @@ def delete_old_ldms(PROTOCOL: str, NETWORK: str) -> None:
         NETWORK = 'HVTN'
     else:
         raise Exception(f"NETWORK must be one of 'HVTN' or 'CoVPN' (case insensitive). Submitted {NETWORK}")
-    PROTOCOL = int(PROTOCOL)
-    N = len(NETWORK) + len(".ldms") + len(str(PROTOCOL))
-    feed_dir = f"/networks/vtn/lab/SDMC_labscience/studies/{NETWORK}/{PROTOCOL_DIRNAME_MAP[NETWORK.upper()][int(PROTOCOL)]}/specimens/ldms_feed/"
-    things_in_dir = os.listdir(feed_dir)
-    # sort from oldest to most recent, and only take the ones that look like hvtn.ldmsPROTOCOL
-    applicable_things_in_dir = np.sort([i for i in things_in_dir if i[:N] == f'{NETWORK.lower()}.ldms{PROTOCOL}'])[::-1]
-
-    # delete all but the thirty most recent
-    for file in applicable_things_in_dir[30:]:
-        # print(f"DELETING THE FOLLOWING: {file}\n")
-        os.remove(feed_dir + file)
-
-def save_todays_ldms(PROTOCOL: str, NETWORK: str) -> None:
+    # keep a year of history (periodic full snapshots + daily deltas)
+    prune_history(NETWORK, PROTOCOL)
+
+## change fingerprints ----------------------------------------------------- ##
+# each snapshot gets a hidden sidecar with datamart's per-bucket fingerprints of it
+# (see access_ldms.bucket_fingerprints), e.g. .hvtn.ldms302.20261017.buckets.csv,
+# so tomorrow's run can tell what changed without downloading the protocol
+def fingerprint_path(snapshot_path: str) -> str:
+    """
+    given a snapshot path, return the path of its bucket fingerprints
+    """
+    dirname, fname = os.path.split(snapshot_path)
+    return os.path.join(dirname, "." + os.path.splitext(fname)[0] + ".buckets.csv")
+
+def pull_todays_ldms(PROTOCOL, NETWORK) -> tuple:
+    """
+    given a protocol and network, return (ldms, buckets, changed) for today,
+    re-downloading only the guspec buckets that changed since the latest
+    snapshot (see access_ldms.pull_protocol_changes)
+    """
+    if NETWORK.lower() == 'covpn':
+        NETWORK = 'CoVPN'
+    elif NETWORK.lower() == 'hvtn':
+        NETWORK = 'HVTN'
+    else:
+        raise Exception(f"NETWORK must be one of 'HVTN' or 'CoVPN' (case insensitive). Submitted {NETWORK}")
+
+    previous, previous_buckets = None, None
+    if len(list_snapshot_dates(NETWORK, PROTOCOL)) > 0:
+        prev_path = find_snapshot(NETWORK, PROTOCOL)
+        if os.path.exists(fingerprint_path(prev_path)):
+            # streamed: only the unchanged buckets of the last snapshot are kept in memory
+            previous = iter_snapshot_chunks(NETWORK, PROTOCOL)
+            previous_buckets = pd.read_csv(fingerprint_path(prev_path))
+
+    with span("pull", f"{NETWORK}{PROTOCOL}") as s:
+        ldms, buckets, changed = pull_protocol_changes(
+            NETWORK, PROTOCOL, previous=previous, previous_buckets=previous_buckets, engine='copy'
+        )
+        s['rows'], s['bytes'] = len(ldms), int(ldms.memory_usage(deep=True).sum())
+        s['buckets_pulled'] = None if changed is None else len(changed)
+    return ldms, buckets, changed
+
+def describe_pull(PROTOCOL, NETWORK, changed) -> str:
+    """
+    given a protocol, network and the changed buckets of its pull_todays_ldms result,
+    return a line saying what was re-pulled (None if everything was)
+    -----
+    pulls run on threads, so they don't print; the caller prints this in order
+    """
+    if changed == []:
+        return f"{NETWORK}{PROTOCOL}: NO CHANGES SINCE LAST SNAPSHOT"
+    elif changed is not None:
+        return f"{NETWORK}{PROTOCOL}: RE-PULLED {len(changed)} OF {FINGERPRINT_BUCKETS} GUSPEC BUCKETS"
+    return None
+
+def save_todays_ldms(PROTOCOL: str, NETWORK: str, ldms: pd.DataFrame = None, buckets: pd.DataFrame = None) -> None:
     """
     INPUTS
      - PROTOCOLS: list of PROTOCOLS (numeric) from one network
      - NETWORK: string ("HVTN" or "CoVPN") corresponding to above PROTOCOLS
+     - ldms: today's ldms for the protocol, if already pulled; otherwise pulled here
+     - buckets: bucket fingerprints for ldms, saved alongside it; otherwise computed here
     """
     if NETWORK.lower() == 'covpn':
         NETWORK = 'CoVPN'
@@ -232,33 +430,41 @@ def save_todays_ldms(PROTOCOL: str, NETWORK: str) -> None:
     else:
         raise Exception(f"NETWORK must be one of 'HVTN' or 'CoVPN' (case insensitive). Submitted {NETWORK}")
 
-    # read in ldms
-    ldms = pull_one_protocol(NETWORK, PROTOCOL)
+    # read in ldms (fingerprint first, so changes made mid-pull are caught tomorrow)
+    if ldms is None:
+        buckets = bucket_fingerprints(NETWORK, PROTOCOL)
+        ldms = pull_one_protocol(NETWORK, PROTOCOL, engine='copy', refresh=True)
 
     # save ldms
-    timestamp = datetime.date.today().strftime("%Y%m%d")
-    network_path = f"/networks/vtn/lab/SDMC_labscience/studies/{NETWORK}/"
-    protocol_path = network_path + PROTOCOL_DIRNAME_MAP[NETWORK.upper()][int(PROTOCOL)]
-    if not os.path.exists(protocol_path):
-        print(f"creating protocol dir for {int(PROTOCOL)}")
-        os.mkdir(protocol_path)
-    specimen_path = protocol_path + "/specimens"
-    if not os.path.exists(specimen_path):
-        print(f"creating specimens dir for {int(PROTOCOL)}")
-        os.mkdir(specimen_path)
-    ldms_feed_path = specimen_path + "/ldms_feed"
-    if not os.path.exists(ldms_feed_path):
-        print(f"creating ldms_feed dir for {int(PROTOCOL)}")
-        print(ldms_feed_path)
-        os.mkdir(ldms_feed_path)
-
-    savepath = ldms_feed_path + f"/{NETWORK.lower()}.ldms{int(PROTOCOL)}.{timestamp}.csv"
-    if not os.path.exists(savepath):
-        # print(f"CREATING THE FOLLOWING: {savepath}")
-        ldms.to_csv(savepath, index=False)
-    else:
-        print(f"{savepath} already exists")
+    if datetime.date.today() in list_snapshot_dates(NETWORK, PROTOCOL):
+        print(f"{find_snapshot(NETWORK, PROTOCOL, datetime.date.today())} already exists")
+        return
+    savepath = save_snapshot(NETWORK, PROTOCOL, ldms)
 
+    # keep fingerprints for the latest snapshot only
+    ldms_feed_path = os.path.dirname(savepath)
+    for f in os.listdir(ldms_feed_path):
+        if f.startswith(f".{NETWORK.lower()}.ldms{int(PROTOCOL)}.") and f.endswith(".buckets.csv"):
+            os.remove(ldms_feed_path + "/" + f)
+    if buckets is not None:
+        buckets.to_csv(fingerprint_path(savepath), index=False)
 
 if __name__=="__main__":
-    main()
+    parser = argparse.ArgumentParser(description="save, prune and diff today's LDMS for every monitored protocol")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of protocols processed in parallel, each in its own process (default: 1)")
+    parser.add_argument("--rerun", action="store_true",
+                        help="rerun the (2024+) jobs affected by today's changes")
+    add_rerun_arguments(parser, prefix="rerun-")
+    parser.add_argument("--rerun-window", type=float, default=DEFAULT_WINDOW_HOURS,
+                        help="hours a triggered job waits, collecting more triggers, before it's rerun "
+                             f"(default: {DEFAULT_WINDOW_HOURS}, i.e. at the end of this run)")
+    args = parser.parse_args()
+    failed = main(jobs=args.jobs, rerun=args.rerun, rerun_options={
+        'max_workers': args.rerun_jobs,
+        'timeout': args.rerun_timeout,
+        'memory_mb': args.rerun_memory_mb,
+        'retries': args.rerun_retries,
+        'window_hours': args.rerun_window,
+    })
+    sys.exit(1 if len(failed) > 0 else 0)
@@ -6,6 +6,8 @@ from typing import List
 
 import sdmc_tools.constants as constants
 from yaml_handling import find_endpoints, read_yaml, get_output_path_from_yaml
+from old_output_index import load_old_output_index, old_outputs_for_guspecs
+from rerun_scheduler import run_job, script_for_job
 
 ## check if ldms has been updated today ------------------------------------- ##
 def was_ldms_updated(NETWORK: str) -> bool:
@@ -230,12 +232,12 @@ def handle_affected_jobs_old(guspecs: list) -> None: #report_outputs_correspondi
     given a list of guspecs with changes in ldms,
     report on any that are used by older (non-auto rerunnable) jobs
     """
-    affected_outputs = set()
-    for guspec in guspecs:
-        if guspec in GUSPEC_TO_OUTPUT_PATH_OLD.keys():
-            affected_outputs.update(GUSPEC_TO_OUTPUT_PATH_OLD[guspec])
+    global GUSPEC_TO_OUTPUT_PATH_OLD
+    if GUSPEC_TO_OUTPUT_PATH_OLD is None:
+        GUSPEC_TO_OUTPUT_PATH_OLD = load_old_output_index()
+    affected_outputs = old_outputs_for_guspecs(guspecs, GUSPEC_TO_OUTPUT_PATH_OLD)
     if len(affected_outputs) > 0:
-        print(f"AFFECTED OUTPUTS: {list(AFFECTED_OUTPUTS)}")
+        print(f"AFFECTED OUTPUTS: {affected_outputs}")
     else:
         print("\nNO PRE-2024 OUTPUTS AFFECTED")
 
@@ -307,22 +309,20 @@ def rerun_affected_job(affected_job_yaml: str) -> None:
     the corresponding output and rerun the corresponding script
     """
     yaml_path = affected_job_yaml["yaml_path"]
-    # yaml = '/home/bhaddock/repos/sdmc-adhoc/processing_scripts/HVTN128/PKSMC/paths.yaml'
-    script_path = yaml_path[len("/home/bhaddock/repos/sdmc-adhoc/"):-len("/paths.yaml")] + "/process_data.py"
-    print(f"Rerunning {script_path}")
-    package = script_path[:-3].replace("/",".")
-    try:
-        rerun = getattr(__import__(package, fromlist=["main"]), "main")
-        rerun()
-    except:
-        print(f"ERROR trying to run {script_path}")
+    print(f"Rerunning {script_for_job(yaml_path)}")
+    # in its own process, with rerun_scheduler's timeout / memory cap / retries
+    result = run_job(yaml_path)
+    if result['status'] != 'ok':
+        print(f"ERROR trying to run {result['script']}: {result['status']} (see {result.get('log')})")
 
 ## pull in constants -------------------------------------------------------- ##
 yamlpath = os.path.dirname(__file__) + "/constants.yaml"
 yamldict = read_yaml(yamlpath)
 
 PROTOCOL_DIRNAME_MAP = yamldict["PROTOCOL_DIRNAME_MAP"]
-GUSPEC_TO_OUTPUT_PATH_OLD = yamldict["GUSPEC_TO_OUTPUT_PATH_OLD"]
+# compact index of yamldict["GUSPEC_TO_OUTPUT_PATH_OLD"], loaded on first use
+# from its sidecar (see old_output_index.py)
+GUSPEC_TO_OUTPUT_PATH_OLD = None
 
 
 # def read_in_output(path):
@@ -0,0 +1,572 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Read / write the daily LDMS snapshots kept in each protocol's ldms_feed dir
+#     - Snapshots are parquet (zstd) with the LDMS dtypes and some provenance
+#       embedded in the file, replacing {network}.ldms{protocol}.{YYYYMMDD}.csv
+#     - History is kept as periodic full snapshots plus small daily deltas,
+#       so a year of history costs about as much disk as a handful of snapshots
+#     - Older csv snapshots stay readable; migrate_csv_history converts them
+#     - usage: python ldms_snapshot_store.py migrate [--remove-csv]
+#              python ldms_snapshot_store.py compact
+## ---------------------------------------------------------------------------##
+import pandas as pd
+import os
+import sys
+import json
+import datetime
+import importlib.util
+import sdmc_tools.constants as constants
+from access_ldms import apply_ldms_dtypes
+from ldms_diff import diff_ldms, diff_ldms_partitioned, iter_frame_chunks, chunk_rows_for, CHUNK_ROWS
+from config_loader import load_yaml
+
+## constants ---------------------------------------------------------------- ##
+yamlpath = os.path.dirname(__file__) + "/constants.yaml"
+yamldict = load_yaml(yamlpath)
+
+PROTOCOL_DIRNAME_MAP = yamldict["PROTOCOL_DIRNAME_MAP"]
+
+STUDIES_DIR = "/networks/vtn/lab/SDMC_labscience/studies/"
+
+# snapshots are written as parquet when pyarrow is available, csv otherwise
+_PARQUET_ENABLED = importlib.util.find_spec("pyarrow") is not None
+SNAPSHOT_COMPRESSION = "zstd"
+# key for our provenance in the parquet schema metadata
+METADATA_KEY = b"sdmc_ldms_snapshot"
+
+# preferred format first, when both exist for a day
+SNAPSHOT_EXTENSIONS = [".parquet", ".csv"]
+
+## history layout ----------------------------------------------------------- ##
+# in each ldms_feed dir:
+#   {network}.ldms{P}.{YYYYMMDD}.parquet               full snapshots: one every
+#                                                      BASE_INTERVAL ("bases"), plus the latest day
+#   deltas/{network}.ldms{P}.{YYYYMMDD}.delta.parquet  that day's changes since the previous saved day
+# a delta holds, for every guspec that was inserted / deleted / changed, all of its
+# rows before (_state='old') and after (_state='new'), so it can be replayed forwards
+# from an earlier full snapshot or backwards from a later one.
+# the latest day is always a full snapshot, so scripts reading the newest file still work
+BASE_INTERVAL = datetime.timedelta(days=60)
+# deltas / bases older than this are deleted
+HISTORY_DAYS = 365
+# without pyarrow there are no deltas, so only this many full (csv) days are kept
+CSV_HISTORY_DAYS = 30
+DELTA_DIR = "deltas/"
+DELTA_COLUMNS = ['_change', '_state']
+
+# protocols with at least this many rows are diffed in guspec buckets on disk
+# (see ldms_diff.diff_ldms_partitioned) rather than with both days in memory
+PARTITIONED_DIFF_ROWS = 2000000
+
+## paths -------------------------------------------------------------------- ##
+def format_network(network: str) -> str:
+    """
+    given a network (any case), return it as used in study paths: 'HVTN' or 'CoVPN'
+    """
+    if network.lower() == 'covpn':
+        return 'CoVPN'
+    elif network.lower() == 'hvtn':
+        return 'HVTN'
+    raise Exception(f"NETWORK must be one of 'HVTN' or 'CoVPN' (case insensitive). Submitted {network}")
+
+def feed_dir(network: str, protocol) -> str:
+    """
+    given a network and protocol, return its ldms_feed directory (with trailing /)
+    """
+    network = format_network(network)
+    return STUDIES_DIR + f"{network}/{PROTOCOL_DIRNAME_MAP[network.upper()][int(protocol)]}/specimens/ldms_feed/"
+
+def _as_date(date) -> datetime.date:
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    if isinstance(date, datetime.date):
+        return date
+    return datetime.datetime.strptime(str(date), "%Y%m%d").date()
+
+def snapshot_prefix(network: str, protocol) -> str:
+    return f"{network.lower()}.ldms{int(protocol)}."
+
+def snapshot_path(network: str, protocol, date=None, extension: str = None) -> str:
+    """
+    given a network, protocol and date (default today), return where its full snapshot is written
+    """
+    date = _as_date(date or datetime.date.today())
+    if extension is None:
+        extension = ".parquet" if _PARQUET_ENABLED else ".csv"
+    return feed_dir(network, protocol) + f"{snapshot_prefix(network, protocol)}{date.strftime('%Y%m%d')}{extension}"
+
+def delta_path(network: str, protocol, date) -> str:
+    """
+    given a network, protocol and date, return where that day's delta is written
+    """
+    datestr = _as_date(date).strftime('%Y%m%d')
+    return feed_dir(network, protocol) + DELTA_DIR + f"{snapshot_prefix(network, protocol)}{datestr}.delta.parquet"
+
+def _dated_files(directory: str, prefix: str, extensions: list) -> dict:
+    """
+    return {date: [paths]} for files in directory named {prefix}{YYYYMMDD}{extension}
+    """
+    if not os.path.exists(directory):
+        return {}
+    found = {}
+    for fname in os.listdir(directory):
+        extension = [e for e in extensions if fname.endswith(e)]
+        if not fname.startswith(prefix) or len(extension) == 0:
+            continue
+        datestr = fname[len(prefix):-len(extension[0])]
+        if len(datestr) != 8 or not datestr.isdigit():
+            continue
+        found.setdefault(_as_date(datestr), []).append(directory + fname)
+    return found
+
+def _snapshot_files(network: str, protocol) -> dict:
+    """
+    return {date: [paths, preferred format first]} for every full snapshot of the protocol
+    """
+    found = _dated_files(feed_dir(network, protocol), snapshot_prefix(network, protocol), SNAPSHOT_EXTENSIONS)
+    for date in found:
+        found[date] = sorted(found[date], key=lambda p: SNAPSHOT_EXTENSIONS.index(os.path.splitext(p)[1]))
+    return found
+
+def _delta_files(network: str, protocol) -> dict:
+    """
+    return {date: path} for every delta of the protocol
+    """
+    found = _dated_files(feed_dir(network, protocol) + DELTA_DIR, snapshot_prefix(network, protocol), [".delta.parquet"])
+    return {date: paths[0] for (date, paths) in found.items()}
+
+def list_snapshot_dates(network: str, protocol) -> list:
+    """
+    given a network and protocol, return every date its ldms can be loaded for, oldest first
+    """
+    return sorted(set(_snapshot_files(network, protocol)).union(_delta_files(network, protocol)))
+
+def list_delta_dates(network: str, protocol) -> list:
+    """
+    given a network and protocol, return the dates it has deltas for, oldest first
+    """
+    return sorted(_delta_files(network, protocol))
+
+def find_snapshot(network: str, protocol, date=None) -> str:
+    """
+    given a network, protocol and date (default: the latest snapshot),
+    return the path of that day's full snapshot, preferring parquet over csv
+    (days only kept as deltas have no file of their own; use load_snapshot)
+    """
+    files = _snapshot_files(network, protocol)
+    if len(files) == 0:
+        raise Exception(f"No LDMS snapshots saved for {network}{protocol} in {feed_dir(network, protocol)}")
+    date = max(files) if date is None else _as_date(date)
+    if date not in files:
+        raise Exception(f"No full LDMS snapshot for {network}{protocol} on {date}")
+    return files[date][0]
+
+## read / write ------------------------------------------------------------- ##
+def _write_parquet(path: str, ldms: pd.DataFrame, metadata: dict) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(ldms, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp_path, compression=SNAPSHOT_COMPRESSION)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _metadata(network: str, protocol, date: datetime.date, data: pd.DataFrame, **extra) -> dict:
+    metadata = {
+        'network': format_network(network),
+        'protocol': int(protocol),
+        'date': date.strftime("%Y%m%d"),
+        'n_rows': int(len(data)),
+        'dtypes': {col: str(dtype) for (col, dtype) in data.dtypes.items()},
+        'written': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    metadata.update(extra)
+    return metadata
+
+def _write_full(network: str, protocol, ldms: pd.DataFrame, date: datetime.date) -> str:
+    path = snapshot_path(network, protocol, date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.endswith(".parquet"):
+        _write_parquet(path, ldms, _metadata(network, protocol, date, ldms))
+    else:
+        ldms.to_csv(path, index=False)
+    return path
+
+def _write_delta(network: str, protocol, delta: pd.DataFrame, date: datetime.date, previous: datetime.date) -> str:
+    path = delta_path(network, protocol, date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_parquet(path, delta, _metadata(network, protocol, date, delta, previous=previous.strftime("%Y%m%d")))
+    return path
+
+def _remove_full(network: str, protocol, date: datetime.date) -> None:
+    for path in _snapshot_files(network, protocol).get(date, []):
+        os.remove(path)
+
+def _is_base(date: datetime.date, full_dates: list) -> bool:
+    """
+    a full snapshot is kept as a base if it's the first one,
+    or at least BASE_INTERVAL after the base before it
+    """
+    earlier = [d for d in full_dates if d < date]
+    return len(earlier) == 0 or date - max(earlier) >= BASE_INTERVAL
+
+def save_snapshot(network: str, protocol, ldms: pd.DataFrame, date=None, overwrite: bool = False) -> str:
+    """
+    given a network, protocol and that protocol's ldms, save it as the snapshot
+    for date (default today), creating the ldms_feed dir if needed
+    -----
+    - the day is written in full, along with its delta from the previous saved day;
+      the previous day's full copy is then dropped unless it's a base, a csv, or
+      has no delta of its own to rebuild it from
+    - days have to be saved in order (no backfilling before the latest saved day)
+    return the path of the full snapshot (the existing one if overwrite=False)
+    """
+    date = _as_date(date or datetime.date.today())
+    saved = list_snapshot_dates(network, protocol)
+    if date in saved and not overwrite:
+        return find_snapshot(network, protocol, date)
+    if len(saved) > 0 and date < max(saved):
+        raise Exception(f"LDMS snapshots are saved in date order: {network}{protocol} already has {max(saved)}, can't save {date}")
+
+    previous = max([d for d in saved if d < date], default=None)
+    if previous is None or not _PARQUET_ENABLED:
+        return _write_full(network, protocol, ldms, date)
+
+    if max(snapshot_num_rows(network, protocol, previous) or 0, len(ldms)) >= PARTITIONED_DIFF_ROWS:
+        # stream the previous day off disk rather than loading it next to today's
+        delta = compute_delta_partitioned(iter_snapshot_chunks(network, protocol, previous), iter_frame_chunks(ldms))
+    else:
+        delta = compute_delta(load_snapshot(network, protocol, previous), ldms)
+    _write_delta(network, protocol, delta, date, previous)
+    path = _write_full(network, protocol, ldms, date)
+    # only drop a full copy that a delta chain leads up to: csv days saved before
+    # deltas existed have nothing behind them (compact_history turns those into deltas)
+    fulls = _snapshot_files(network, protocol)
+    if (previous in fulls and previous in _delta_files(network, protocol)
+            and not any(p.endswith(".csv") for p in fulls[previous])
+            and not _is_base(previous, list(fulls))):
+        _remove_full(network, protocol, previous)
+    return path
+
+def read_snapshot_metadata(path: str) -> dict:
+    """
+    given a parquet snapshot / delta path, return the provenance saved with it (empty for csv)
+    """
+    if not path.endswith(".parquet"):
+        return {}
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata.get(METADATA_KEY, b"{}"))
+
+def read_snapshot(path: str, columns: list = None) -> pd.DataFrame:
+    """
+    given a snapshot path (parquet or csv), return its contents as LDMS dtypes,
+    reading only the columns given
+    """
+    if path.endswith(".parquet"):
+        ldms = pd.read_parquet(path, columns=columns)
+    else:
+        ldms = pd.read_csv(path, usecols=columns, dtype=constants.LDMS_DTYPE_MAP)
+    return apply_ldms_dtypes(ldms)
+
+def snapshot_num_rows(network: str, protocol, date) -> int:
+    """
+    given a network, protocol and date, return the number of rows in that day's
+    full parquet snapshot without reading it (None if there isn't one)
+    """
+    files = _snapshot_files(network, protocol).get(_as_date(date), [])
+    if len(files) == 0 or not files[0].endswith(".parquet"):
+        return None
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(files[0]).metadata.num_rows
+
+def iter_snapshot_chunks(network: str, protocol, date=None, columns: list = None, chunk_rows: int = None):
+    """
+    given a network, protocol and date (default: the latest snapshot),
+    yield that day's ldms chunk_rows rows at a time, as LDMS dtypes
+    -----
+    - chunk_rows defaults to about one diff bucket's worth of the day (see ldms_diff.chunk_rows_for),
+      or CHUNK_ROWS for csv snapshots
+    - days without a full snapshot are rebuilt in memory (see load_snapshot) and yielded whole
+    """
+    fulls = _snapshot_files(network, protocol)
+    date = max(list_snapshot_dates(network, protocol), default=None) if date is None else _as_date(date)
+    if date not in fulls:
+        yield load_snapshot(network, protocol, date, columns=columns)
+        return
+    path = fulls[date][0]
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        if chunk_rows is None:
+            chunk_rows = chunk_rows_for(parquet.metadata.num_rows)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield apply_ldms_dtypes(batch.to_pandas())
+    else:
+        if chunk_rows is None:
+            chunk_rows = CHUNK_ROWS
+        for chunk in pd.read_csv(path, usecols=columns, dtype=constants.LDMS_DTYPE_MAP, chunksize=chunk_rows):
+            yield apply_ldms_dtypes(chunk)
+
+def load_delta(network: str, protocol, date, columns: list = None) -> pd.DataFrame:
+    """
+    given a network, protocol and date, return the rows that day's delta replaced,
+    with _change ('inserted' / 'deleted' / 'changed') and _state ('old' / 'new')
+    """
+    path = _delta_files(network, protocol).get(_as_date(date))
+    if path is None:
+        raise Exception(f"No LDMS delta for {network}{protocol} on {date}")
+    if columns is not None:
+        columns = list(dict.fromkeys(['guspec'] + list(columns) + DELTA_COLUMNS))
+    return read_snapshot(path, columns=columns)
+
+def load_snapshot(network: str, protocol, date=None, columns: list = None) -> pd.DataFrame:
+    """
+    given a network, protocol and date (default: the latest snapshot),
+    return that day's ldms. only the columns given are read off disk
+    e.g. load_snapshot('hvtn', 302, columns=['guspec', 'txtpid'])
+    -----
+    days without a full snapshot are rebuilt from the nearest full snapshot
+    (before or after) and the deltas in between
+    """
+    fulls = _snapshot_files(network, protocol)
+    date = max(list_snapshot_dates(network, protocol), default=None) if date is None else _as_date(date)
+    if date in fulls:
+        return read_snapshot(fulls[date][0], columns=columns)
+    if date not in _delta_files(network, protocol):
+        raise Exception(f"No LDMS snapshot for {network}{protocol} on {date}")
+    ldms = materialize(network, protocol, date, columns=columns)
+    return ldms if columns is None else ldms[columns]
+
+## deltas ------------------------------------------------------------------- ##
+def compute_delta(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    given two days of a protocol's ldms, return all rows of every guspec that differs
+    (see ldms_diff.diff_ldms), as they were (_state='old') and as they are (_state='new'),
+    labelled by _change:
+    - 'inserted': guspec only in new
+    - 'deleted': guspec only in old
+    - 'changed': guspec in both, but with different rows
+    """
+    # exact diff: a delta has to replay to exactly the day it was taken from
+    return _delta_from_diff(diff_ldms(old, new, na_strings=[]), old, new)
+
+def compute_delta_partitioned(old_chunks, new_chunks) -> pd.DataFrame:
+    """
+    compute_delta for protocols too big to hold both days in memory:
+    old_chunks / new_chunks are iterables of frames (e.g. iter_snapshot_chunks),
+    diffed in guspec buckets (see ldms_diff.diff_ldms_partitioned)
+    """
+    diff = diff_ldms_partitioned(old_chunks, new_chunks, na_strings=[])
+    return _delta_from_diff(diff, diff['old_touched'], diff['new_touched'])
+
+def _delta_from_diff(diff: dict, old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    given an exact diff and (at least) the rows of the guspecs it touched on each side,
+    return the delta (see compute_delta)
+    """
+    inserted, deleted = diff['inserted'], diff['deleted']
+    old_rows = old.loc[old.guspec.isin(deleted + diff['changed'])].assign(_state='old')
+    new_rows = new.loc[new.guspec.isin(inserted + diff['changed'])].assign(_state='new')
+    delta = pd.concat([old_rows, new_rows], ignore_index=True)
+    delta['_change'] = 'changed'
+    delta.loc[delta.guspec.isin(inserted), '_change'] = 'inserted'
+    delta.loc[delta.guspec.isin(deleted), '_change'] = 'deleted'
+    return delta
+
+def apply_delta(ldms: pd.DataFrame, delta: pd.DataFrame, reverse: bool = False) -> pd.DataFrame:
+    """
+    given a day's ldms and the next day's delta, return the next day's ldms;
+    with reverse=True, given a day's ldms and its own delta, return the previous day's
+    """
+    rows = delta.loc[delta._state == ('old' if reverse else 'new')]
+    kept = ldms.loc[~ldms.guspec.isin(delta.guspec.unique())]
+    return apply_ldms_dtypes(pd.concat([kept, rows[list(ldms.columns)]], ignore_index=True))
+
+def materialize(network: str, protocol, date, columns: list = None) -> pd.DataFrame:
+    """
+    given a network, protocol and date, rebuild that day's ldms from the nearest
+    full snapshot, replaying deltas forwards from an earlier one or backwards from
+    a later one, whichever takes fewer deltas
+    """
+    date = _as_date(date)
+    fulls, deltas = _snapshot_files(network, protocol), _delta_files(network, protocol)
+    if columns is not None:
+        columns = list(dict.fromkeys(['guspec'] + list(columns)))
+
+    plans = []
+    before = [d for d in fulls if d <= date]
+    if len(before) > 0:
+        start = max(before)
+        plans.append((start, sorted([d for d in deltas if start < d <= date]), False))
+    after = [d for d in fulls if d >= date]
+    if len(after) > 0:
+        start = min(after)
+        plans.append((start, sorted([d for d in deltas if date < d <= start], reverse=True), True))
+    if len(plans) == 0:
+        raise Exception(f"No full LDMS snapshot to rebuild {network}{protocol} on {date} from")
+
+    start, steps, reverse = min(plans, key=lambda plan: len(plan[1]))
+    ldms = read_snapshot(fulls[start][0], columns=columns)
+    for step in steps:
+        ldms = apply_delta(ldms, load_delta(network, protocol, step, columns=columns), reverse=reverse)
+    return ldms
+
+def changed_guspecs(network: str, protocol, start, end=None) -> pd.DataFrame:
+    """
+    given a network, protocol and date range, return (date, guspec, _change) for
+    every guspec a delta touched after start, up to and including end (default: latest)
+    -----
+    only the guspec / _change columns of the deltas are read; nothing is rebuilt.
+    a guspec changed and then changed back still shows up
+    """
+    start = _as_date(start)
+    end = None if end is None else _as_date(end)
+    touched = []
+    for date, path in sorted(_delta_files(network, protocol).items()):
+        if date <= start or (end is not None and date > end):
+            continue
+        delta = pd.read_parquet(path, columns=['guspec', '_change']).drop_duplicates()
+        touched.append(delta.assign(date=date))
+    if len(touched) == 0:
+        return pd.DataFrame(columns=['date', 'guspec', '_change'])
+    return pd.concat(touched, ignore_index=True)[['date', 'guspec', '_change']]
+
+def diff_snapshots(network: str, protocol, start, end=None) -> pd.DataFrame:
+    """
+    given a network, protocol and two dates, return the net delta between them
+    (see compute_delta); only guspecs some delta in between touched are compared
+    """
+    end = max(list_snapshot_dates(network, protocol)) if end is None else _as_date(end)
+    touched = changed_guspecs(network, protocol, start, end).guspec.unique()
+    old = load_snapshot(network, protocol, start)
+    new = load_snapshot(network, protocol, end)
+    return compute_delta(old.loc[old.guspec.isin(touched)], new.loc[new.guspec.isin(touched)])
+
+## retention ---------------------------------------------------------------- ##
+def prune_history(network: str, protocol, days: int = None) -> None:
+    """
+    given a network and protocol, delete full snapshots and deltas older than days
+    (default HISTORY_DAYS, or CSV_HISTORY_DAYS without pyarrow). the latest
+    snapshot is always kept
+    """
+    if days is None:
+        days = HISTORY_DAYS if _PARQUET_ENABLED else CSV_HISTORY_DAYS
+    cutoff = datetime.date.today() - datetime.timedelta(days=days)
+    saved = list_snapshot_dates(network, protocol)
+    if len(saved) == 0:
+        return
+    latest = max(saved)
+    for date in _snapshot_files(network, protocol):
+        if date < cutoff and date != latest:
+            _remove_full(network, protocol, date)
+    # a delta is only needed to step back to the day before it
+    for date, path in _delta_files(network, protocol).items():
+        if date <= cutoff and date != latest:
+            os.remove(path)
+
+def compact_history(network: str, protocol) -> int:
+    """
+    given a network and protocol, turn full snapshots that aren't bases (e.g. the
+    daily copies saved before deltas existed) into deltas
+    return the number of full snapshots dropped
+    """
+    if not _PARQUET_ENABLED:
+        raise Exception("pyarrow is needed to compact LDMS snapshot history")
+    saved = list_snapshot_dates(network, protocol)
+    fulls, deltas = _snapshot_files(network, protocol), _delta_files(network, protocol)
+    bases, previous, state, dropped = [], None, None, 0
+    for date in saved:
+        if date in fulls:
+            current = read_snapshot(fulls[date][0])
+            if previous is not None and date not in deltas:
+                _write_delta(network, protocol, compute_delta(state, current), date, previous)
+        elif state is None:
+            current = load_snapshot(network, protocol, date)
+        else:
+            current = apply_delta(state, load_delta(network, protocol, date))
+        if date in fulls:
+            if _is_base(date, bases):
+                bases.append(date)
+            elif date != saved[-1]:
+                _remove_full(network, protocol, date)
+                dropped += 1
+        previous, state = date, current
+    return dropped
+
+## migration ---------------------------------------------------------------- ##
+def migrate_csv_history(network: str, protocol, remove_csv: bool = False) -> int:
+    """
+    given a network and protocol, write a parquet copy of every csv snapshot
+    that doesn't have one yet; csvs are kept unless remove_csv=True
+    return the number of snapshots converted
+    -----
+    a csv is only removed once its parquet copy is on disk with the same number of rows
+    """
+    if not _PARQUET_ENABLED:
+        raise Exception("pyarrow is needed to migrate LDMS snapshots to parquet")
+    import pyarrow.parquet as pq
+    converted = 0
+    for date, paths in _snapshot_files(network, protocol).items():
+        csvs = [p for p in paths if p.endswith(".csv")]
+        if len(csvs) == 0:
+            continue
+        parquet_path = snapshot_path(network, protocol, date, extension=".parquet")
+        n_rows = None
+        if not os.path.exists(parquet_path):
+            # written directly: save_snapshot would return the day's existing csv
+            ldms = read_snapshot(csvs[0])
+            _write_parquet(parquet_path, ldms, _metadata(network, protocol, date, ldms))
+            n_rows = len(ldms)
+            converted += 1
+        if remove_csv:
+            if n_rows is None:
+                n_rows = len(read_snapshot(csvs[0], columns=['guspec']))
+            if not os.path.exists(parquet_path) or pq.ParquetFile(parquet_path).metadata.num_rows != n_rows:
+                raise Exception(f"parquet copy of {csvs[0]} is missing or incomplete; csv not removed")
+            os.remove(csvs[0])
+    return converted
+
+def _monitored_protocols() -> list:
+    monitored = []
+    for network in ['hvtn', 'covpn']:
+        for protocol in yamldict[f"{network}_protocols"]:
+            if int(protocol) in PROTOCOL_DIRNAME_MAP[format_network(network).upper()]:
+                monitored.append((network, protocol))
+    return monitored
+
+def migrate_all(remove_csv: bool = False) -> None:
+    """
+    migrate the csv history of every monitored protocol in constants.yaml
+    """
+    for network, protocol in _monitored_protocols():
+        converted = migrate_csv_history(network, protocol, remove_csv=remove_csv)
+        if converted > 0:
+            print(f"{format_network(network)}{protocol}: converted {converted} csv snapshots")
+
+def compact_all() -> None:
+    """
+    compact the snapshot history of every monitored protocol in constants.yaml
+    (removes the csv and parquet copies of every day that becomes a delta)
+    """
+    for network, protocol in _monitored_protocols():
+        dropped = compact_history(network, protocol)
+        if dropped > 0:
+            print(f"{format_network(network)}{protocol}: replaced {dropped} full snapshots with deltas")
+
+if __name__=="__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ["migrate", "compact"]:
+        print("usage: python ldms_snapshot_store.py migrate [--remove-csv]")
+        print("       python ldms_snapshot_store.py compact")
+        sys.exit(1)
+    if sys.argv[1] == "migrate":
+        migrate_all(remove_csv="--remove-csv" in sys.argv[2:])
+    else:
+        compact_all()
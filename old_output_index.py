@@ -0,0 +1,108 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Compile constants.yaml's GUSPEC_TO_OUTPUT_PATH_OLD (guspec -> pre-2024
+#       output paths) into a compact index: one table of distinct paths plus,
+#       per guspec, the integer ids of its paths
+#     - The index is kept in a binary .npz sidecar next to constants.yaml that
+#       loads in milliseconds; it's rebuilt whenever constants.yaml changes
+#     - Looking up many guspecs at once is a vectorized set intersection
+#     - usage: python old_output_index.py [guspec ...]
+## ---------------------------------------------------------------------------##
+import numpy as np
+import os
+import sys
+from config_loader import load_yaml
+
+YAML_PATH = os.path.dirname(os.path.abspath(__file__)) + "/constants.yaml"
+INDEX_PATH = os.path.dirname(os.path.abspath(__file__)) + "/.constants.old_outputs.npz"
+
+YAML_KEY = "GUSPEC_TO_OUTPUT_PATH_OLD"
+
+def compile_old_output_index(guspec_to_paths: dict) -> dict:
+    """
+    given {guspec: [output path, ...]}, return the compact index as arrays:
+    - 'guspecs': sorted guspecs
+    - 'paths': sorted distinct output paths
+    - 'path_ids': ids (into paths) of each guspec's paths, guspec after guspec
+    - 'offsets': guspec i's ids are path_ids[offsets[i]:offsets[i+1]]
+    """
+    # skip keys that aren't guspecs (e.g. a .nan that slipped into the yaml)
+    guspecs = sorted([g for g in guspec_to_paths.keys() if isinstance(g, str)])
+    paths = sorted(set(p for ps in guspec_to_paths.values() for p in (ps or [])))
+    path_id = {p: i for i, p in enumerate(paths)}
+    ids = [sorted(set(path_id[p] for p in (guspec_to_paths[g] or []))) for g in guspecs]
+    return {
+        'guspecs': np.array(guspecs, dtype=str),
+        'paths': np.array(paths, dtype=str),
+        'path_ids': np.array([i for gids in ids for i in gids], dtype=np.int32),
+        'offsets': np.concatenate([[0], np.cumsum([len(gids) for gids in ids])]).astype(np.int64),
+    }
+
+def _source_signature(yaml_path: str) -> np.ndarray:
+    """
+    given a yaml path, return (size, mtime in ns), to tell whether it changed
+    """
+    stat = os.stat(yaml_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+def build_old_output_index(yaml_path: str = YAML_PATH, index_path: str = INDEX_PATH) -> dict:
+    """
+    parse GUSPEC_TO_OUTPUT_PATH_OLD out of yaml_path, write its index to index_path
+    and return it
+    """
+    signature = _source_signature(yaml_path)
+    yamldict = load_yaml(yaml_path)
+    index = compile_old_output_index(yamldict.get(YAML_KEY) or {})
+    index['source'] = signature
+
+    # write next to the final file, then move it into place,
+    # so a concurrent reader never sees half an index
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **index)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        # e.g. a read-only checkout; the index still works for this process
+        print(f"couldn't save {index_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return index
+
+def load_old_output_index(yaml_path: str = YAML_PATH, index_path: str = INDEX_PATH) -> dict:
+    """
+    return the index of yaml_path's GUSPEC_TO_OUTPUT_PATH_OLD,
+    from its sidecar if that's current, rebuilding it otherwise
+    """
+    if os.path.exists(index_path):
+        try:
+            with np.load(index_path, allow_pickle=False) as npz:
+                index = {k: npz[k] for k in npz.files}
+            if np.array_equal(index['source'], _source_signature(yaml_path)):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    return build_old_output_index(yaml_path, index_path)
+
+def old_outputs_for_guspecs(guspecs: list, index: dict) -> list:
+    """
+    given a list of guspecs and an index, return the sorted distinct
+    pre-2024 output paths that used any of them
+    """
+    query = np.unique(np.asarray(list(guspecs), dtype=str))
+    if len(query) == 0 or len(index['guspecs']) == 0:
+        return []
+    _, hits, _ = np.intersect1d(index['guspecs'], query, assume_unique=True, return_indices=True)
+    starts, ends = index['offsets'][hits], index['offsets'][hits + 1]
+    lengths = ends - starts
+    # positions starts[i] .. ends[i]-1 of every hit, flattened
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return index['paths'][np.unique(index['path_ids'][positions])].tolist()
+
+if __name__=="__main__":
+    index = build_old_output_index()
+    print(f"{len(index['guspecs']):,} guspecs, {len(index['paths']):,} distinct outputs -> {INDEX_PATH}")
+    if len(sys.argv) > 1:
+        for path in old_outputs_for_guspecs(sys.argv[1:], index):
+            print(path)
@@ -186,13 +186,17 @@ def main():
 
     # merge on ldms / standard processing ------------------------------------##
     ldms_feeddir = '/networks/vtn/lab/SDMC_labscience/studies/HVTN/HVTN135/specimens/ldms_feed/'
-    ldms_path = ldms_feeddir + np.sort(os.listdir(ldms_feeddir))[-1]
-
-    ldms = pd.read_csv(
-        ldms_path,
-        usecols=constants.STANDARD_COLS,
-        dtype=constants.LDMS_DTYPE_MAP
-    )
+    # latest snapshot: parquet (saved with its dtypes), or csv from before the switch
+    ldms_path = ldms_feeddir + np.sort([f for f in os.listdir(ldms_feeddir) if f.endswith(('.parquet', '.csv')) and not f.startswith('.')])[-1]
+
+    if ldms_path.endswith('.parquet'):
+        ldms = pd.read_parquet(ldms_path, columns=constants.STANDARD_COLS)
+    else:
+        ldms = pd.read_csv(
+            ldms_path,
+            usecols=constants.STANDARD_COLS,
+            dtype=constants.LDMS_DTYPE_MAP
+        )
 
     ldms = ldms.loc[ldms.guspec.isin(data.guspec)]
 
@@ -41,7 +41,12 @@ def main():
 
     ## ldms
     ldms_dir = '/networks/vtn/lab/SDMC_labscience/studies/HVTN/HVTN302/specimens/ldms_feed/'
-    ldms = pd.read_csv(ldms_dir + np.sort(os.listdir(ldms_dir))[-1], usecols=constants.STANDARD_COLS, dtype=constants.LDMS_DTYPE_MAP)
+    # latest snapshot: parquet (saved with its dtypes), or csv from before the switch
+    ldms_path = ldms_dir + np.sort([f for f in os.listdir(ldms_dir) if f.endswith(('.parquet', '.csv')) and not f.startswith('.')])[-1]
+    if ldms_path.endswith('.parquet'):
+        ldms = pd.read_parquet(ldms_path, columns=constants.STANDARD_COLS)
+    else:
+        ldms = pd.read_csv(ldms_path, usecols=constants.STANDARD_COLS, dtype=constants.LDMS_DTYPE_MAP)
     ldms = ldms.loc[ldms.guspec.isin(data.guspec)]
 
     ## standard processing
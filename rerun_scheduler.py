@@ -0,0 +1,310 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Rerun the (2024+) processing_scripts jobs affected by LDMS changes
+#     - Affected jobs are de-duplicated into a queue; each job's process_data.py
+#       runs in its own process, with at most max_workers at a time, a
+#       per-job timeout and memory cap, and retries on failure
+#     - Every attempt is logged (stdout / stderr) and its result (status,
+#       duration, peak RSS, output files written) appended to a jsonl file
+#     - usage: python rerun_scheduler.py [--jobs N] [--timeout S]
+#              [--memory-mb M] [--retries R] <paths.yaml> ...
+## ---------------------------------------------------------------------------##
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import datetime
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from yaml_handling import read_yaml, get_output_path_from_yaml
+
+RERUN_DIR = os.path.dirname(os.path.abspath(__file__)) + "/.reruns"
+RESULTS_PATH = RERUN_DIR + "/results.jsonl"
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 2 * 60 * 60  # seconds
+DEFAULT_MEMORY_MB = 16000
+DEFAULT_RETRIES = 1
+
+# seconds between checks on a running job
+_POLL_INTERVAL = 0.5
+
+## queue -------------------------------------------------------------------- ##
+# a queue is {paths.yaml: entry}, each entry holding
+# - 'guspecs': every changed guspec that triggered the job
+# - 'reasons': why it was triggered, e.g. "HVTN302 LDMS changes on 2026-10-17 (12 guspecs)"
+# - 'first_seen' / 'last_seen': when it was first / last triggered (iso timestamps)
+# jobs waiting for their window are kept in QUEUE_PATH between runs
+QUEUE_PATH = RERUN_DIR + "/queue.json"
+
+# hours a job waits after its first trigger before it's rerun, so triggers
+# from the following runs are merged into the same rerun (0: rerun at the end of this run)
+DEFAULT_WINDOW_HOURS = 0
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+def queue_jobs(queue: dict, yaml_path: str, guspecs: list = None, reason: str = None, seen: str = None) -> dict:
+    """
+    given a queue, add a job to it (merging guspecs and reasons
+    if it's already queued) and return the queue
+    """
+    seen = _now() if seen is None else seen
+    entry = queue.setdefault(yaml_path, {'guspecs': set(), 'reasons': [], 'first_seen': seen, 'last_seen': seen})
+    entry['guspecs'].update(guspecs or [])
+    if reason is not None and reason not in entry['reasons']:
+        entry['reasons'] += [reason]
+    entry['first_seen'] = min(entry['first_seen'], seen)
+    entry['last_seen'] = max(entry['last_seen'], seen)
+    return queue
+
+def merge_queues(queue: dict, other: dict) -> dict:
+    """
+    given two queues, merge other into queue and return it
+    """
+    for yaml_path, entry in other.items():
+        queue_jobs(queue, yaml_path, entry['guspecs'], seen=entry['first_seen'])
+        merged = queue[yaml_path]
+        merged['reasons'] += [r for r in entry['reasons'] if r not in merged['reasons']]
+        merged['last_seen'] = max(merged['last_seen'], entry['last_seen'])
+    return queue
+
+def load_queue(queue_path: str = QUEUE_PATH) -> dict:
+    """
+    return the queue of jobs waiting to be rerun ({} if there isn't one)
+    """
+    if not os.path.exists(queue_path):
+        return {}
+    with open(queue_path, 'r') as file:
+        queue = json.load(file)
+    for entry in queue.values():
+        entry['guspecs'] = set(entry['guspecs'])
+    return queue
+
+def save_queue(queue: dict, queue_path: str = QUEUE_PATH) -> None:
+    """
+    save the queue of jobs waiting to be rerun
+    """
+    os.makedirs(os.path.dirname(queue_path), exist_ok=True)
+    saved = {
+        yaml_path: dict(entry, guspecs=sorted(entry['guspecs']))
+        for yaml_path, entry in queue.items()
+    }
+    tmp_path = f"{queue_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(saved, file, indent=1)
+    os.replace(tmp_path, queue_path)
+
+def split_due(queue: dict, window_hours: float = DEFAULT_WINDOW_HOURS, now: str = None) -> tuple:
+    """
+    given a queue, return (jobs whose window has passed, jobs still waiting), as queues
+    """
+    now = datetime.datetime.fromisoformat(_now() if now is None else now)
+    window = datetime.timedelta(hours=window_hours)
+    due, waiting = {}, {}
+    for yaml_path, entry in queue.items():
+        if now - datetime.datetime.fromisoformat(entry['first_seen']) >= window:
+            due[yaml_path] = entry
+        else:
+            waiting[yaml_path] = entry
+    return due, waiting
+
+def script_for_job(yaml_path: str) -> str:
+    """
+    given a job's paths.yaml, return the process_data.py next to it
+    """
+    return os.path.join(os.path.dirname(yaml_path), "process_data.py")
+
+## running one job ---------------------------------------------------------- ##
+# jobs are started through this, which caps its own address space and then execs the
+# job's script (argv: limit in bytes, script); preexec_fn isn't safe to use while
+# run_queue's threads are running
+_CAPPED_EXEC = (
+    "import os, sys, resource\n"
+    "limit = int(sys.argv[1])\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (limit, limit))\n"
+    "os.execv(sys.executable, [sys.executable] + sys.argv[2:])\n"
+)
+
+def _capped_command(script: str, memory_mb: int) -> list:
+    """
+    return the command running script with its address space capped at memory_mb
+    """
+    return [sys.executable, "-c", _CAPPED_EXEC, str(int(memory_mb) * 1024 * 1024), script]
+
+def _current_outputs(yaml_path: str) -> dict:
+    """
+    given a job's paths.yaml, return {output path: mtime} of its current outputs
+    ({} if they can't be found)
+    """
+    try:
+        paths = get_output_path_from_yaml(read_yaml(yaml_path))
+    except (OSError, KeyError, IndexError, TypeError):
+        return {}
+    return {p: os.path.getmtime(p) for p in paths if os.path.exists(p)}
+
+def _attempt(yaml_path: str, log_path: str, timeout: float, memory_mb: int) -> dict:
+    """
+    run a job's script once in its own process, return status, exit code, duration and peak RSS
+    """
+    script = script_for_job(yaml_path)
+    start = time.monotonic()
+    timed_out = False
+    with open(log_path, 'w') as log:
+        # own session, so a timeout also kills anything the job started
+        proc = subprocess.Popen(_capped_command(script, memory_mb), cwd=os.path.dirname(script),
+                                stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        # wait4 (rather than proc.wait) to get this child's own resource usage
+        while True:
+            pid, exit_status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid != 0:
+                break
+            if time.monotonic() - start >= timeout:
+                os.killpg(proc.pid, signal.SIGKILL)
+                pid, exit_status, usage = os.wait4(proc.pid, 0)
+                timed_out = True
+                break
+            time.sleep(_POLL_INTERVAL)
+    proc.returncode = os.waitstatus_to_exitcode(exit_status)
+
+    if timed_out:
+        status = 'timeout'
+    elif proc.returncode == 0:
+        status = 'ok'
+    else:
+        status = 'failed'
+    return {
+        'status': status,
+        'exit_code': proc.returncode,
+        'seconds': round(time.monotonic() - start, 1),
+        # ru_maxrss is in KB on linux
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+    }
+
+def run_job(yaml_path: str, guspecs: list = None, reasons: list = None, timeout: float = DEFAULT_TIMEOUT,
+            memory_mb: int = DEFAULT_MEMORY_MB, retries: int = DEFAULT_RETRIES,
+            results_path: str = None) -> dict:
+    """
+    given a job's paths.yaml, rerun its process_data.py (retrying up to retries times
+    if it fails or times out), record the result in results_path and return it
+    -----
+    seconds is the total over every attempt; attempt_seconds has each attempt's
+    """
+    guspecs = [] if guspecs is None else guspecs
+    reasons = [] if reasons is None else reasons
+    results_path = RESULTS_PATH if results_path is None else results_path
+    os.makedirs(RERUN_DIR, exist_ok=True)
+    script = script_for_job(yaml_path)
+    # e.g. HVTN135_Fouda_PVMA
+    job_name = "_".join(os.path.dirname(yaml_path).split("/")[-2:])
+    result = {
+        'yaml_path': yaml_path,
+        'script': script,
+        'n_guspecs': len(guspecs),
+        'reasons': list(reasons),
+        'started': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    if not os.path.exists(script):
+        result.update({'status': 'no script', 'attempts': 0})
+        _record(result, results_path)
+        return result
+
+    before = _current_outputs(yaml_path)
+    attempt_seconds = []
+    for attempt in range(1, retries + 2):
+        log_path = os.path.join(RERUN_DIR, f"{job_name}.{datetime.date.today().strftime('%Y%m%d')}.{attempt}.log")
+        result.update(_attempt(yaml_path, log_path, timeout, memory_mb))
+        attempt_seconds += [result['seconds']]
+        result.update({'attempts': attempt, 'log': log_path,
+                       'seconds': round(sum(attempt_seconds), 1), 'attempt_seconds': attempt_seconds})
+        if result['status'] == 'ok':
+            break
+
+    after = _current_outputs(yaml_path)
+    result['new_outputs'] = sorted([p for p, mtime in after.items() if before.get(p) != mtime])
+    _record(result, results_path)
+    return result
+
+def _record(result: dict, results_path: str = RESULTS_PATH) -> None:
+    """
+    append a job result to the results jsonl
+    """
+    with open(results_path, 'a') as file:
+        file.write(json.dumps(result) + "\n")
+
+## running the queue -------------------------------------------------------- ##
+def run_queue(queue: dict, max_workers: int = DEFAULT_WORKERS, timeout: float = DEFAULT_TIMEOUT,
+              memory_mb: int = DEFAULT_MEMORY_MB, retries: int = DEFAULT_RETRIES) -> list:
+    """
+    given a queue, rerun every job in it,
+    max_workers at a time, print a line per job and return the results
+    """
+    if len(queue) == 0:
+        return []
+    print(f"\nRERUNNING {len(queue)} AFFECTED JOBS ({max_workers} at a time)")
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(run_job, yaml_path, sorted(entry['guspecs']), entry['reasons'],
+                            timeout=timeout, memory_mb=memory_mb, retries=retries)
+            for yaml_path, entry in queue.items()
+        ]
+        for future in futures:
+            result = future.result()
+            results += [result]
+            print(f"{result['status'].upper():<10}{result['script']} "
+                  f"({result.get('seconds', 0)}s, {result.get('peak_rss_mb', 0)} MB, "
+                  f"{result['attempts']} attempts, {len(result.get('new_outputs', []))} new outputs)")
+            for reason in result['reasons']:
+                print(f"{'':<10}- {reason}")
+    failed = [r for r in results if r['status'] != 'ok']
+    if len(failed) > 0:
+        print(f"{len(failed)} OF {len(results)} RERUNS FAILED; see the logs in {RERUN_DIR}")
+    return results
+
+def run_pending(queue: dict, window_hours: float = DEFAULT_WINDOW_HOURS,
+                queue_path: str = QUEUE_PATH, **options) -> list:
+    """
+    given newly affected jobs (a queue), merge them into the saved queue,
+    rerun the jobs whose window has passed and keep the rest for a later run
+    -----
+    options are passed to run_queue; return the rerun results
+    """
+    queue = merge_queues(load_queue(queue_path), queue)
+    # saved before running, so an interrupted run leaves the due jobs queued
+    save_queue(queue, queue_path)
+    due, waiting = split_due(queue, window_hours)
+    results = run_queue(due, **options)
+    save_queue(waiting, queue_path)
+    if len(waiting) > 0:
+        print(f"\n{len(waiting)} AFFECTED JOBS WAITING FOR THEIR {window_hours:g} HOUR RERUN WINDOW")
+    return results
+
+def add_rerun_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    """
+    add the scheduler's --jobs / --timeout / --memory-mb / --retries options to parser
+    (as --{prefix}jobs etc.)
+    """
+    parser.add_argument(f"--{prefix}jobs", type=int, default=DEFAULT_WORKERS,
+                        help=f"reruns at a time (default: {DEFAULT_WORKERS})")
+    parser.add_argument(f"--{prefix}timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds before a rerun is killed (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument(f"--{prefix}memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help=f"memory cap per rerun in MB (default: {DEFAULT_MEMORY_MB})")
+    parser.add_argument(f"--{prefix}retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"retries for a failed rerun (default: {DEFAULT_RETRIES})")
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="rerun processing_scripts jobs")
+    parser.add_argument("yaml_paths", nargs="+", help="paths.yaml of each job to rerun")
+    add_rerun_arguments(parser)
+    args = parser.parse_args()
+    queue = {}
+    for yaml_path in args.yaml_paths:
+        queue_jobs(queue, os.path.abspath(yaml_path), reason="rerun by hand")
+    results = run_queue(queue, max_workers=args.jobs, timeout=args.timeout,
+                        memory_mb=args.memory_mb, retries=args.retries)
+    sys.exit(0 if all([r['status'] == 'ok' for r in results]) else 1)
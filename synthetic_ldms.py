@@ -0,0 +1,203 @@
+## ---------------------------------------------------------------------------##
+# Date: 10/17/2026
+# Purpose:
+#     - Generate synthetic LDMS (imported_fstrf_specimen_aliquot) data with
+#       realistic guspec / ptid / visit structure
+#     - Build a local SQLite stand-in for datamart out of it, so access_ldms,
+#       ldms_monitoring and check_outputs_against_ldms can be profiled off-site
+#     - usage: python synthetic_ldms.py <directory> [scale]
+#       then point access_ldms at it with LDMS_SQLITE_DIR=<directory>
+## ---------------------------------------------------------------------------##
+import os
+import sys
+import sqlite3
+import string
+import numpy as np
+import pandas as pd
+
+from access_ldms import STANDARD_COLS
+
+# (primstr, addstr, dervstr, how often it's collected at a visit)
+SPECIMEN_TYPES = [
+    ('BLD', 'EDT', 'PLS', 0.30),
+    ('BLD', 'EDT', 'CEL', 0.10),
+    ('BLD', 'ACD', 'PBM', 0.20),
+    ('BLD', 'NON', 'SER', 0.20),
+    ('SAL', 'N/A', 'N/A', 0.05),
+    ('REC', 'N/A', 'SWB', 0.05),
+    ('CER', 'N/A', 'SWB', 0.05),
+    ('URN', 'N/A', 'N/A', 0.05),
+]
+
+# protocols in a default synthetic datamart
+DEFAULT_PROTOCOLS = {'hvtn': [302, 305, 805], 'covpn': [3008, 5001]}
+
+# participants per protocol at scale=1
+DEFAULT_PTIDS = 500
+
+# column types for the sqlite tables, mirroring datamart
+SQLITE_COLUMN_TYPES = {
+    'txtpid': 'TEXT',
+    'drawdm': 'INTEGER',
+    'drawdd': 'INTEGER',
+    'drawdy': 'INTEGER',
+    'vidval': 'REAL',
+    'lstudy': 'REAL',
+    'guspec': 'TEXT',
+    'primstr': 'TEXT',
+    'addstr': 'TEXT',
+    'dervstr': 'TEXT',
+}
+
+_ALPHANUMERIC = np.array(list(string.ascii_uppercase + string.digits))
+
+def _random_codes(rng, n: int, length: int) -> np.ndarray:
+    """
+    return n random uppercase alphanumeric strings of the given length
+    """
+    chars = rng.choice(_ALPHANUMERIC, size=(n, length))
+    return np.array(["".join(row) for row in chars])
+
+def generate_protocol(protocol: int, n_ptids: int = DEFAULT_PTIDS, n_visits: int = 12,
+                      aliquots_per_draw: float = 4., n_sites: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+    given a protocol number, return a synthetic imported_fstrf_specimen_aliquot
+    table with STANDARD_COLS
+    -----
+    - n_ptids participants spread over n_sites sites; each completes between
+      half and all of n_visits visits, roughly 4 weeks apart
+    - a few visits are unscheduled (e.g. 3.1)
+    - each visit collects 1-3 specimen types; every draw gets its own guspec core
+      ({site}-{8 random characters}) and a poisson number of aliquots
+      (mean aliquots_per_draw), suffixed -001, -002, ...
+    """
+    rng = np.random.default_rng(seed + int(protocol))
+
+    # participants -----------------------------------------------------------#
+    ptids = 100000000 + (int(protocol) % 1000) * 100000 + np.arange(n_ptids)
+    sites = rng.choice([f"{i:04d}" for i in rng.choice(np.arange(100, 1000), n_sites, replace=False)], n_ptids)
+    enrolled = rng.integers(0, 730, n_ptids)
+    n_done = rng.integers(max(1, n_visits // 2), n_visits + 1, n_ptids)
+
+    # visits -----------------------------------------------------------------#
+    visit_ptid = np.repeat(np.arange(n_ptids), n_done)
+    visit_starts = np.repeat(np.cumsum(n_done) - n_done, n_done)
+    visitno = np.arange(len(visit_ptid)) - visit_starts + 1
+    jitter = rng.integers(-3, 4, len(visit_ptid)) * (visitno > 1)
+    days = enrolled[visit_ptid] + (visitno - 1) * 28 + jitter
+    vidval = visitno.astype(float)
+    unscheduled = rng.random(len(vidval)) < 0.02
+    vidval[unscheduled] += 0.1
+
+    # draws: one per specimen type collected at a visit ----------------------#
+    n_types = rng.integers(1, 4, len(visit_ptid))
+    draw_visit = np.repeat(np.arange(len(visit_ptid)), n_types)
+    weights = np.array([t[3] for t in SPECIMEN_TYPES])
+    draw_type = rng.choice(len(SPECIMEN_TYPES), len(draw_visit), p=weights / weights.sum())
+    draw_core = np.char.add(np.char.add(sites[visit_ptid[draw_visit]], "-"), _random_codes(rng, len(draw_visit), 8))
+
+    # aliquots ---------------------------------------------------------------#
+    n_aliquots = 1 + rng.poisson(max(aliquots_per_draw - 1, 0), len(draw_visit))
+    row_draw = np.repeat(np.arange(len(draw_visit)), n_aliquots)
+    row_starts = np.repeat(np.cumsum(n_aliquots) - n_aliquots, n_aliquots)
+    suffix = np.char.zfill((np.arange(len(row_draw)) - row_starts + 1).astype(str), 3)
+
+    row_visit = draw_visit[row_draw]
+    drawdt = pd.Timestamp("2020-01-01") + pd.to_timedelta(days[row_visit], unit="D")
+    types = np.array([t[:3] for t in SPECIMEN_TYPES])[draw_type[row_draw]]
+
+    data = pd.DataFrame({
+        'txtpid': ptids[visit_ptid[row_visit]].astype(str),
+        'drawdm': drawdt.month,
+        'drawdd': drawdt.day,
+        'drawdy': drawdt.year,
+        'vidval': vidval[row_visit],
+        'lstudy': float(protocol),
+        'guspec': np.char.add(np.char.add(draw_core[row_draw], "-"), suffix),
+        'primstr': types[:, 0],
+        'addstr': types[:, 1],
+        'dervstr': types[:, 2],
+    })
+    return data[STANDARD_COLS]
+
+def generate_n_rows(n_rows: int, protocol: int = 302, seed: int = 0) -> pd.DataFrame:
+    """
+    return a synthetic protocol with (about) n_rows rows, e.g. for benchmarks
+    """
+    # at the defaults each participant contributes ~70 aliquots (9 visits x 2 draws x 4)
+    n_ptids = max(1, int(np.ceil(n_rows / 60)))
+    return generate_protocol(protocol, n_ptids=n_ptids, seed=seed).head(n_rows).reset_index(drop=True)
+
+def mutate_ldms(data: pd.DataFrame, n_changed: int = 10, n_added: int = 10,
+                n_removed: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+    given a synthetic protocol, return a copy with a day's worth of LDMS corrections:
+    - n_removed guspecs dropped
+    - n_changed guspecs with a corrected visit, draw day or specimen type
+    - n_added new aliquots appended to existing draws
+    """
+    rng = np.random.default_rng(seed)
+    data = data.copy()
+    guspecs = data.guspec.unique()
+    picked = rng.choice(guspecs, min(len(guspecs), n_removed + n_changed), replace=False)
+    removed, changed = picked[:n_removed], picked[n_removed:]
+
+    data = data.loc[~data.guspec.isin(removed)]
+    changed_rows = data.guspec.isin(changed)
+    column = rng.choice(['vidval', 'drawdd', 'dervstr'], changed_rows.sum())
+    idx = data.index[changed_rows]
+    data.loc[idx[column == 'vidval'], 'vidval'] += 1
+    data.loc[idx[column == 'drawdd'], 'drawdd'] = (data.loc[idx[column == 'drawdd'], 'drawdd'] % 28) + 1
+    data.loc[idx[column == 'dervstr'], 'dervstr'] = 'CEL'
+
+    added = data.sample(n=min(n_added, len(data)), random_state=seed).copy()
+    added['guspec'] = added.guspec.str.rpartition("-")[0] + "-" + rng.integers(900, 1000, len(added)).astype(str)
+    return pd.concat([data, added], ignore_index=True)
+
+def build_sqlite_ldms(directory: str, protocols: dict = DEFAULT_PROTOCOLS,
+                      scale: float = 1., seed: int = 0) -> dict:
+    """
+    write a local datamart stand-in to directory: one {schema}.sqlite file per protocol,
+    each holding a synthetic imported_fstrf_specimen_aliquot table
+    -----
+    - protocols: {network: [protocol, ...]}
+    - scale: multiplies the number of participants per protocol
+    return {schema: number of rows written}
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for network, network_protocols in protocols.items():
+        for protocol in network_protocols:
+            schema = f"{network.lower()}{int(protocol):03d}"
+            data = generate_protocol(protocol, n_ptids=max(1, int(DEFAULT_PTIDS * scale)), seed=seed)
+            write_sqlite_protocol(directory, schema, data)
+            written[schema] = len(data)
+    return written
+
+def write_sqlite_protocol(directory: str, schema: str, data: pd.DataFrame) -> str:
+    """
+    given a local datamart stand-in directory, a schema and its ldms, (re)write
+    {directory}/{schema}.sqlite to hold it, e.g. with a mutate_ldms day of corrections
+    return the path written
+    """
+    path = os.path.join(directory, f"{schema}.sqlite")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        data.to_sql('imported_fstrf_specimen_aliquot', conn, index=False, dtype=SQLITE_COLUMN_TYPES)
+        conn.execute("CREATE INDEX guspec_idx ON imported_fstrf_specimen_aliquot (guspec)")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+if __name__=="__main__":
+    if len(sys.argv) < 2:
+        print("usage: python synthetic_ldms.py <directory> [scale]")
+        sys.exit(1)
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.
+    written = build_sqlite_ldms(sys.argv[1], scale=scale)
+    for schema, n in written.items():
+        print(f"{schema}: {n:,} rows")
+    print(f"\nexport LDMS_SQLITE_DIR={os.path.abspath(sys.argv[1])}")
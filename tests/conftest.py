@@ -0,0 +1,70 @@
+import os
+import sys
+import datetime
+import pytest
+import pandas as pd
+# C extensions check datetime.date when first imported, so load them before clock patches it
+import pyarrow.parquet
+
+# the modules under test are top-level scripts in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import access_ldms
+import ldms_snapshot_store
+import synthetic_ldms
+
+@pytest.fixture
+def studies_dir(tmp_path, monkeypatch):
+    """
+    point the ldms_feed dirs at a temporary studies dir
+    """
+    directory = str(tmp_path / "studies") + "/"
+    monkeypatch.setattr(ldms_snapshot_store, "STUDIES_DIR", directory)
+    return directory
+
+@pytest.fixture
+def sqlite_ldms(tmp_path):
+    """
+    a local datamart stand-in holding hvtn302,
+    set as the access_ldms backend for the test
+    """
+    directory = str(tmp_path / "ldms")
+    synthetic_ldms.build_sqlite_ldms(directory, protocols={'hvtn': [302]}, scale=0.2)
+    previous = access_ldms.get_backend()
+    access_ldms.set_backend(access_ldms.SQLiteBackend(directory))
+    yield directory
+    access_ldms.set_backend(previous)
+
+def same_rows(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    """
+    given two ldms frames, return whether they hold the same rows (in any order)
+    """
+    if sorted(left.columns) != sorted(right.columns):
+        return False
+    columns = sorted(left.columns)
+    left = left[columns].astype(str).sort_values(columns).reset_index(drop=True)
+    right = right[columns].astype(str).sort_values(columns).reset_index(drop=True)
+    return left.equals(right)
+
+class _DateMeta(type):
+    # real dates still count as dates while the fake is installed
+    def __instancecheck__(cls, obj):
+        return isinstance(obj, _REAL_DATE)
+
+_REAL_DATE = datetime.date
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    replace datetime.date with one whose today() returns clock.today (set by the test),
+    e.g. to run the monitoring on several days in a row
+    """
+    class FakeDate(_REAL_DATE, metaclass=_DateMeta):
+        today_is = _REAL_DATE.today()
+
+        @classmethod
+        def today(cls):
+            return cls(cls.today_is.year, cls.today_is.month, cls.today_is.day)
+
+    monkeypatch.setattr(datetime, "date", FakeDate)
+    return FakeDate
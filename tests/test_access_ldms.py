@@ -0,0 +1,56 @@
+import numpy as np
+import access_ldms
+import ldms_snapshot_store as store
+import synthetic_ldms
+from conftest import same_rows
+
+def test_pull_all_protocols_on_sqlite(sqlite_ldms):
+    schema_map = access_ldms.get_schema_map(refresh=True)
+    assert schema_map['hvtn302'] == 'hvtn302'
+    # schemas datamart has but the stand-in doesn't are left out of the map
+    assert 'hvtn_unmapped' not in schema_map.values()
+    ldms = access_ldms.pull_multiple_protocols('hvtn', 'all')
+    assert len(ldms) > 0
+
+def test_pull_protocol_changes_streams_previous(sqlite_ldms, studies_dir):
+    previous = access_ldms.pull_one_protocol('hvtn', 302, refresh=True)
+    buckets = access_ldms.bucket_fingerprints('hvtn', 302)
+    store.save_snapshot('hvtn', 302, previous)
+
+    # unchanged: everything comes from the snapshot
+    ldms, _, changed = access_ldms.pull_protocol_changes(
+        'hvtn', 302, previous=store.iter_snapshot_chunks('hvtn', 302, chunk_rows=500), previous_buckets=buckets)
+    assert changed == []
+    assert same_rows(ldms, previous)
+
+    # a day of corrections: only the changed buckets are re-pulled
+    mutated = synthetic_ldms.mutate_ldms(previous, n_changed=3, n_added=2, n_removed=2)
+    synthetic_ldms.write_sqlite_protocol(sqlite_ldms, 'hvtn302', mutated)
+    # pooled connections still have the old file attached
+    access_ldms.close_pool()
+    ldms, _, changed = access_ldms.pull_protocol_changes(
+        'hvtn', 302, previous=store.iter_snapshot_chunks('hvtn', 302, chunk_rows=500), previous_buckets=buckets)
+    assert 0 < len(changed) < access_ldms.FINGERPRINT_BUCKETS
+    assert same_rows(ldms, access_ldms.pull_one_protocol('hvtn', 302, refresh=True))
+    assert np.isin(mutated.guspec, ldms.guspec).all()
+
+def test_warm_cache_needs_no_connection(sqlite_ldms, monkeypatch):
+    pulled = access_ldms.pull_one_protocol('hvtn', 302)
+    # a new process: nothing in memory, today's cache on disk
+    access_ldms.close_pool()
+    access_ldms.invalidate_schema_map()
+
+    def refuse():
+        raise Exception("connected")
+    monkeypatch.setattr(access_ldms.get_backend(), "connect", refuse)
+    assert same_rows(access_ldms.pull_one_protocol('hvtn', 302), pulled)
+
+def test_get_cursor_and_pooled_cursor(sqlite_ldms):
+    cursor = access_ldms.get_cursor()
+    assert cursor.execute("SELECT 1").fetchone() == (1,)
+    cursor.connection.close()
+
+    before = access_ldms.get_pool_stats()['checkouts']
+    with access_ldms.pooled_cursor() as cursor:
+        assert cursor.execute("SELECT 1").fetchone() == (1,)
+    assert access_ldms.get_pool_stats()['checkouts'] == before + 1
@@ -0,0 +1,35 @@
+import pandas as pd
+import ldms_diff
+import synthetic_ldms
+from access_ldms import apply_ldms_dtypes
+
+def _pair(seed: int = 0) -> tuple:
+    old = apply_ldms_dtypes(synthetic_ldms.generate_n_rows(5000, seed=seed))
+    new = apply_ldms_dtypes(synthetic_ldms.mutate_ldms(old, n_changed=40, n_added=25, n_removed=30, seed=seed))
+    # a repeated row on each side, which has to be counted rather than matched away
+    old = apply_ldms_dtypes(pd.concat([old, old.iloc[[7]]], ignore_index=True))
+    new = apply_ldms_dtypes(pd.concat([new, new.iloc[[7, 7]]], ignore_index=True))
+    return old, new
+
+def test_partitioned_diff_matches_diff(tmp_path):
+    old, new = _pair()
+    expected = ldms_diff.diff_ldms(old, new)
+    for n_partitions, chunk_rows in [(1, 5000), (4, 700), (16, 333)]:
+        diff = ldms_diff.diff_ldms_partitioned(
+            ldms_diff.iter_frame_chunks(old, chunk_rows), ldms_diff.iter_frame_chunks(new, chunk_rows),
+            n_partitions=n_partitions, tmp_dir=str(tmp_path))
+        for key in ['inserted', 'deleted', 'changed']:
+            assert diff[key] == expected[key]
+        for key in ['added', 'removed']:
+            pd.testing.assert_frame_equal(diff[key], expected[key])
+        assert (diff['n_old'], diff['n_new']) == (len(old), len(new))
+        touched = expected['inserted'] + expected['deleted'] + expected['changed']
+        assert set(diff['old_touched'].guspec) == set(old.guspec[old.guspec.isin(touched)])
+        assert len(diff['new_touched']) == new.guspec.isin(touched).sum()
+
+def test_partitioned_diff_of_identical_days(tmp_path):
+    old, _ = _pair(seed=2)
+    diff = ldms_diff.diff_ldms_partitioned(ldms_diff.iter_frame_chunks(old), ldms_diff.iter_frame_chunks(old),
+                                           tmp_dir=str(tmp_path))
+    assert diff['inserted'] == diff['deleted'] == diff['changed'] == []
+    assert len(diff['added']) == len(diff['removed']) == 0
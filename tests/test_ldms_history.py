@@ -0,0 +1,32 @@
+import sqlite3
+import datetime
+import numpy as np
+import ldms_history
+import ldms_snapshot_store as store
+import synthetic_ldms
+from access_ldms import STANDARD_COLS, apply_ldms_dtypes
+from conftest import same_rows
+
+DAY = datetime.date(2026, 3, 2)
+
+def test_as_of_matches_snapshots(studies_dir):
+    days = [apply_ldms_dtypes(synthetic_ldms.generate_n_rows(2000, seed=4))]
+    for i in range(1, 4):
+        days.append(apply_ldms_dtypes(synthetic_ldms.mutate_ldms(days[-1], seed=i)))
+    for i, ldms in enumerate(days):
+        store.save_snapshot('hvtn', 302, ldms, date=DAY + datetime.timedelta(days=i))
+        # synced day by day, as the monitoring run does, so deltas are replayed
+        assert ldms_history.sync_history('hvtn', 302) == 1
+    assert ldms_history.sync_history('hvtn', 302) == 0
+
+    for i, ldms in enumerate(days):
+        date = DAY + datetime.timedelta(days=i)
+        assert same_rows(ldms_history.as_of('hvtn', 302, date), ldms[STANDARD_COLS])
+        assert same_rows(ldms_history.as_of('hvtn', 302, date), store.load_snapshot('hvtn', 302, date)[STANDARD_COLS])
+
+    changed = store.changed_guspecs('hvtn', 302, DAY).guspec.astype(object).unique()[:5]
+    subset = ldms_history.as_of('hvtn', 302, DAY, guspecs=list(changed))
+    assert same_rows(subset, days[0].loc[days[0].guspec.isin(changed), STANDARD_COLS])
+
+def test_history_leaves_sqlite_adapters_alone():
+    assert (np.int64, sqlite3.PrepareProtocol) not in sqlite3.adapters
@@ -0,0 +1,104 @@
+import os
+import time
+import datetime
+import threading
+import pytest
+import access_ldms
+import ldms_change_feed
+import ldms_history
+import ldms_monitoring
+import ldms_snapshot_store
+import synthetic_ldms
+from access_ldms import STANDARD_COLS
+from ldms_diff import diff_ldms
+from ldms_instrumentation import write_report
+from rerun_scheduler import queue_jobs
+from conftest import same_rows
+
+def test_large_protocols_are_pulled_on_their_own(monkeypatch):
+    pairs = [('hvtn', p) for p in [1, 2, 3, 4, 5, 6]]
+    large = {('hvtn', 3), ('hvtn', 4)}
+    lock, active, seen = threading.Lock(), set(), {}
+
+    def pull(pair):
+        with lock:
+            active.add(pair)
+        time.sleep(0.05)
+        with lock:
+            seen[pair] = set(active)
+            active.discard(pair)
+        return pair, None
+
+    monkeypatch.setattr(ldms_monitoring, "_pull_isolated", pull)
+    monkeypatch.setattr(ldms_monitoring, "_is_large", lambda pair: pair in large)
+    pulled = list(ldms_monitoring._iter_pulls(pairs))
+    assert [pair for pair, _ in pulled] == pairs
+    for pair in large:
+        assert seen[pair] == {pair}
+    assert len(seen[('hvtn', 1)]) > 1
+
+def test_pulls_leave_printing_to_the_main_thread(sqlite_ldms, studies_dir, capsys):
+    ldms_monitoring.save_todays_ldms(302, 'hvtn')
+    capsys.readouterr()
+    pull = ldms_monitoring.pull_todays_ldms(302, 'hvtn')
+    assert capsys.readouterr().out == ""
+    assert ldms_monitoring.describe_pull(302, 'HVTN', pull[2]) == "HVTN302: NO CHANGES SINCE LAST SNAPSHOT"
+
+SIMULATED = {'hvtn': [302, 305], 'covpn': [3008]}
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_monitoring_round_trip(jobs, tmp_path, studies_dir, clock, monkeypatch, capsys):
+    """
+    four nightly runs against a sqlite stand-in that gets a day of corrections each night:
+    every day's snapshot, history and change feed has to match what the stand-in held
+    """
+    directory = str(tmp_path / "ldms")
+    feed = str(tmp_path / "feed")
+    os.makedirs(directory)
+    monkeypatch.setitem(ldms_monitoring.yamldict, "hvtn_protocols", SIMULATED['hvtn'])
+    monkeypatch.setitem(ldms_monitoring.yamldict, "covpn_protocols", SIMULATED['covpn'])
+    monkeypatch.setattr(ldms_change_feed, "FEED_DIR", feed)
+    monkeypatch.setattr(ldms_monitoring, "write_report",
+                        lambda run_id, started, **extra: write_report(run_id, started, str(tmp_path / "reports"), **extra))
+    # affected jobs are looked up in the guspec index of the real outputs; queue a stand-in instead
+    monkeypatch.setattr(ldms_monitoring, "handle_affected_jobs",
+                        lambda guspecs: queue_jobs(ldms_monitoring.AFFECTED_JOBS, "sim/paths.yaml", guspecs))
+    previous_backend = access_ldms.get_backend()
+    access_ldms.set_backend(access_ldms.SQLiteBackend(directory))
+
+    pairs = [(network, protocol) for network in SIMULATED for protocol in SIMULATED[network]]
+    start = datetime.date.today() - datetime.timedelta(days=3)
+    held = {pair: [] for pair in pairs}
+    try:
+        for day in range(4):
+            clock.today_is = start + datetime.timedelta(days=day)
+            for i, (network, protocol) in enumerate(pairs):
+                if day == 0:
+                    data = synthetic_ldms.generate_n_rows(2500, protocol=protocol, seed=i)
+                else:
+                    data = synthetic_ldms.mutate_ldms(held[(network, protocol)][-1], seed=10 * day + i)
+                synthetic_ldms.write_sqlite_protocol(directory, f"{network}{protocol:03d}", data)
+                held[(network, protocol)].append(data)
+            # pooled connections still have yesterday's files attached
+            access_ldms.close_pool()
+            assert ldms_monitoring.main(jobs=jobs) == []
+        output = capsys.readouterr().out
+    finally:
+        access_ldms.set_backend(previous_backend)
+
+    assert output.count("NO PRIOR LDMS SAVED") == len(pairs)
+    assert output.count("AFFECTED JOBS NOT RERUN") == 3
+    for network, protocol in pairs:
+        days = held[(network, protocol)]
+        for day, data in enumerate(days):
+            date = start + datetime.timedelta(days=day)
+            assert same_rows(ldms_snapshot_store.load_snapshot(network, protocol, date), data)
+            assert same_rows(ldms_history.as_of(network, protocol, date), data[STANDARD_COLS])
+        assert ldms_snapshot_store.list_delta_dates(network, protocol) == [start + datetime.timedelta(days=d) for d in range(1, 4)]
+
+        changes = ldms_change_feed.changes_since(start, protocol, network)
+        for day in range(1, 4):
+            diff = diff_ldms(days[day - 1], days[day])
+            expected = set(diff['inserted'] + diff['deleted'] + diff['changed'])
+            run_date = (start + datetime.timedelta(days=day)).isoformat()
+            assert set(changes.loc[changes.run_date == run_date].guspec) == expected
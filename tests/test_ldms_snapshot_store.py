@@ -0,0 +1,64 @@
+import os
+import datetime
+import ldms_snapshot_store as store
+import synthetic_ldms
+from conftest import same_rows
+
+DAY = datetime.date(2026, 1, 5)
+
+def _days(n: int, seed: int = 0) -> list:
+    """
+    return n consecutive days of a synthetic protocol, each a day of corrections on the last
+    """
+    days = [synthetic_ldms.generate_n_rows(3000, seed=seed)]
+    for i in range(1, n):
+        days.append(synthetic_ldms.mutate_ldms(days[-1], seed=seed + i))
+    return days
+
+def test_delta_reconstructed_days_match_saved(studies_dir):
+    days = _days(5)
+    for i, ldms in enumerate(days):
+        store.save_snapshot('hvtn', 302, ldms, date=DAY + datetime.timedelta(days=i))
+    # only the first (base) and latest days are kept in full
+    assert sorted(store._snapshot_files('hvtn', 302)) == [DAY, DAY + datetime.timedelta(days=4)]
+    assert store.list_delta_dates('hvtn', 302) == [DAY + datetime.timedelta(days=i) for i in range(1, 5)]
+    for i, ldms in enumerate(days):
+        assert same_rows(store.load_snapshot('hvtn', 302, DAY + datetime.timedelta(days=i)), ldms)
+
+def test_partitioned_delta_matches_in_memory_delta(studies_dir, monkeypatch):
+    days = _days(3, seed=7)
+    monkeypatch.setattr(store, "PARTITIONED_DIFF_ROWS", 1)
+    for i, ldms in enumerate(days):
+        store.save_snapshot('hvtn', 302, ldms, date=DAY + datetime.timedelta(days=i))
+    for i in range(1, 3):
+        date = DAY + datetime.timedelta(days=i)
+        expected = store.compute_delta(days[i - 1], days[i])
+        assert same_rows(store.load_delta('hvtn', 302, date), expected)
+        assert same_rows(store.load_snapshot('hvtn', 302, date), days[i])
+
+def test_csv_history_is_kept_until_compacted(studies_dir):
+    days = _days(4, seed=3)
+    for i in range(2):
+        path = store.snapshot_path('hvtn', 302, DAY + datetime.timedelta(days=i), extension=".csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        days[i].to_csv(path, index=False)
+        # a csv doesn't round trip every value (e.g. 'N/A'), so expect what's read back
+        days[i] = store.read_snapshot(path)
+    for i in range(2, 4):
+        store.save_snapshot('hvtn', 302, days[i], date=DAY + datetime.timedelta(days=i))
+    # the csv days have no delta behind them, so neither is dropped
+    assert DAY + datetime.timedelta(days=1) in store._snapshot_files('hvtn', 302)
+    for i, ldms in enumerate(days):
+        assert same_rows(store.load_snapshot('hvtn', 302, DAY + datetime.timedelta(days=i)), ldms)
+
+    assert store.compact_history('hvtn', 302) > 0
+    for i, ldms in enumerate(days):
+        assert same_rows(store.load_snapshot('hvtn', 302, DAY + datetime.timedelta(days=i)), ldms)
+
+def test_load_snapshot_columns(studies_dir):
+    days = _days(2)
+    for i, ldms in enumerate(days):
+        store.save_snapshot('hvtn', 302, ldms, date=DAY + datetime.timedelta(days=i))
+    loaded = store.load_snapshot('hvtn', 302, DAY, columns=['guspec', 'vidval'])
+    assert list(loaded.columns) == ['guspec', 'vidval']
+    assert same_rows(loaded, days[0][['guspec', 'vidval']])
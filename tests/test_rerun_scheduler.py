@@ -0,0 +1,73 @@
+import os
+import json
+import datetime
+import pytest
+import rerun_scheduler
+
+# fails on its first run, succeeds after that
+FLAKY_SCRIPT = """
+import os
+if not os.path.exists("ran_once"):
+    open("ran_once", "w").close()
+    raise SystemExit(1)
+"""
+
+@pytest.fixture
+def rerun_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "reruns")
+    monkeypatch.setattr(rerun_scheduler, "RERUN_DIR", directory)
+    monkeypatch.setattr(rerun_scheduler, "RESULTS_PATH", directory + "/results.jsonl")
+    monkeypatch.setattr(rerun_scheduler, "_POLL_INTERVAL", 0.01)
+    return directory
+
+def _job(tmp_path, name: str, script: str = "") -> str:
+    """
+    write a job dir holding paths.yaml and process_data.py, return the yaml path
+    """
+    job_dir = tmp_path / "jobs" / name
+    job_dir.mkdir(parents=True)
+    (job_dir / "process_data.py").write_text(script)
+    (job_dir / "paths.yaml").write_text("")
+    return str(job_dir / "paths.yaml")
+
+def test_queue_jobs_merges_triggers():
+    queue = rerun_scheduler.queue_jobs({}, 'a/paths.yaml', ['g1'], reason='day 1', seen='2026-10-01T00:00:00')
+    rerun_scheduler.queue_jobs(queue, 'a/paths.yaml', ['g1', 'g2'], reason='day 2', seen='2026-10-02T00:00:00')
+    assert queue['a/paths.yaml'] == {'guspecs': {'g1', 'g2'}, 'reasons': ['day 1', 'day 2'],
+                                     'first_seen': '2026-10-01T00:00:00', 'last_seen': '2026-10-02T00:00:00'}
+    # no guspecs given: nothing carried over between calls
+    assert rerun_scheduler.queue_jobs({}, 'b/paths.yaml')['b/paths.yaml']['guspecs'] == set()
+    assert rerun_scheduler.queue_jobs({}, 'c/paths.yaml')['c/paths.yaml']['guspecs'] == set()
+
+def test_split_due_respects_the_window():
+    queue = rerun_scheduler.queue_jobs({}, 'old/paths.yaml', seen='2026-10-01T00:00:00')
+    rerun_scheduler.queue_jobs(queue, 'new/paths.yaml', seen='2026-10-01T20:00:00')
+    due, waiting = rerun_scheduler.split_due(queue, window_hours=12, now='2026-10-01T22:00:00')
+    assert list(due) == ['old/paths.yaml']
+    assert list(waiting) == ['new/paths.yaml']
+
+def test_run_pending_retries_and_keeps_waiting_jobs(tmp_path, rerun_dir):
+    queue_path = rerun_dir + "/queue.json"
+    flaky = _job(tmp_path, "flaky", FLAKY_SCRIPT)
+    later = _job(tmp_path, "later")
+    an_hour_ago = (datetime.datetime.now() - datetime.timedelta(hours=1)).isoformat(timespec='seconds')
+    queue = rerun_scheduler.queue_jobs({}, flaky, ['g1'], reason='changed', seen=an_hour_ago)
+    rerun_scheduler.queue_jobs(queue, later, ['g2'], reason='changed')
+
+    results = rerun_scheduler.run_pending(queue, window_hours=0.5, queue_path=queue_path, max_workers=2)
+    assert [(r['yaml_path'], r['status'], r['attempts']) for r in results] == [(flaky, 'ok', 2)]
+    assert len(results[0]['attempt_seconds']) == 2
+    assert list(rerun_scheduler.load_queue(queue_path)) == [later]
+    with open(rerun_dir + "/results.jsonl") as file:
+        assert [json.loads(line)['yaml_path'] for line in file] == [flaky]
+
+    # once its window has passed, the waiting job runs (with nothing new queued)
+    results = rerun_scheduler.run_pending({}, window_hours=0, queue_path=queue_path)
+    assert [(r['yaml_path'], r['status'], r['attempts']) for r in results] == [(later, 'ok', 1)]
+    assert rerun_scheduler.load_queue(queue_path) == {}
+
+def test_run_job_gives_up_after_retries(tmp_path, rerun_dir):
+    failing = _job(tmp_path, "failing", "raise SystemExit(3)")
+    result = rerun_scheduler.run_job(failing, retries=2)
+    assert (result['status'], result['exit_code'], result['attempts']) == ('failed', 3, 3)
+    assert os.path.exists(result['log'])
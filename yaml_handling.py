@@ -2,6 +2,7 @@ import yaml
 import pandas as pd
 import numpy as np
 import os
+from config_loader import load_yaml
 
 def find_endpoints(d: str, l: list) -> list:
     """
@@ -22,8 +23,7 @@ def read_yaml(yaml_path: str, add_path:bool = False) -> dict:
     optionally add yaml_path to yaml dict
     return yaml dict
     """
-    with open(yaml_path, 'r') as file:
-        yaml_dict = yaml.safe_load(file)
+    yaml_dict = load_yaml(yaml_path)
     if yaml_dict is None:
         print(f"{yaml_path} is currently empty; please fill in")
         return {"yaml_path": yaml_path}
@@ -54,8 +54,7 @@ def overwrite_yaml_protocols(network: str, protocols: list) -> None:
     protocols = np.unique(protocols).tolist()
 
     yamlpath = os.path.dirname(__file__) + "/constants.yaml"
-    with open(yamlpath, 'r') as file:
-        yamldict = yaml.safe_load(file)
+    yamldict = load_yaml(yamlpath)
 
     yamldict[f"{network.lower()}_protocols"] = protocols
 
@@ -71,8 +70,7 @@ def add_to_yaml_protocols(network: str, new_protocols: list) -> None:
     """
     # read in yaml
     yamlpath = os.path.dirname(__file__) + "/constants.yaml"
-    with open(yamlpath, 'r') as file:
-        yamldict = yaml.safe_load(file)
+    yamldict = load_yaml(yamlpath)
 
     # add new protocols to list
     protocols = yamldict[f"{network.lower()}_protocols"]